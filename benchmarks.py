@@ -0,0 +1,348 @@
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from csv_import_lib import TELEMETRY_COLUMNS, import_csv, normalize_linestring_wkt, verify_csv_uploaded
+from linestring_to_earth import linestring_wkt_to_kml, parse_wkt_linestring
+from stage_metrics import RunMetrics
+from synthetic_telemetry import TelemetryGenerator
+
+BASELINE_PATH = "bench_baseline.json"
+NO_BASELINE_STATUS = 2  # exit status when a case had no comparable baseline
+OUTPUT_PATH = "bench_output.txt"
+IMPORT_BATCH_SIZES = (500, 2000, 10000)
+
+
+class SqliteStandIn:
+    """
+    Local stand-in for the MariaDB connection used by import_csv and
+    verify_csv_uploaded: a sqlite file, with the MariaDB-only SQL they use
+    (%s placeholders, INSERT IGNORE) translated on the fly.
+    """
+
+    def __init__(self, path: str, table_name: str = "vehicle_telemetry"):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        columns = ", ".join(c for c in TELEMETRY_COLUMNS if c != "point_id")
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS `{table_name}` (point_id TEXT PRIMARY KEY, {columns}, metadata_id INTEGER)")
+        self.table_name = table_name
+
+    @staticmethod
+    def translate(sql: str) -> str:
+        return re.sub(r"\bINSERT\s+IGNORE\b", "INSERT OR IGNORE", sql.replace("%s", "?"), flags=re.IGNORECASE)
+
+    def cursor(self):
+        conn = self
+
+        class Cursor:
+            def __init__(self):
+                self._cur = conn.conn.cursor()
+
+            def execute(self, sql, params=()):
+                return self._cur.execute(conn.translate(sql), params)
+
+            def executemany(self, sql, rows):
+                return self._cur.executemany(conn.translate(sql), rows)
+
+            def fetchall(self):
+                return self._cur.fetchall()
+
+            def fetchone(self):
+                return self._cur.fetchone()
+
+        return Cursor()
+
+    def commit(self):
+        self.conn.commit()
+
+    def clear(self):
+        self.conn.execute(f"DELETE FROM `{self.table_name}`")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def synthetic_linestring(points: int) -> str:
+    """
+    A deterministic LINESTRING WKT with the given number of vertices (~20 m apart).
+    """
+    coords = [(-81.6259 + 0.0001 * math.sin(i / 50.0), 41.2126 - 0.00018 * i) for i in range(points)]
+    return "LINESTRING(" + ", ".join(f"{lon} {lat}" for lon, lat in coords) + ")"
+
+
+class BenchData:
+    """
+    Inputs shared by the cases: synthetic telemetry rows as protobuf messages,
+    flattened rows and a CSV, plus a long corridor WKT.
+    """
+
+    def __init__(self, workdir: str, rows: int, wkt_points: int, seed: int = 0):
+        self.workdir = workdir
+        self.rows = rows
+        self.wkt = synthetic_linestring(wkt_points)
+        self.wkt_points = wkt_points
+        gen = TelemetryGenerator(self.wkt, seed=seed)
+        self.messages = list(gen.messages(rows))
+        self.flat_rows = gen.frame(rows).to_dict("records")
+        self.csv_path = os.path.join(workdir, "bench_telemetry.csv")
+        gen.to_csv(self.csv_path, rows)
+        self.csv_bytes = os.path.getsize(self.csv_path)
+
+
+# name -> factory(data) returning run() -> (items, bytes), optionally with a reset() before each run
+CASES: Dict[str, Callable[[BenchData], Tuple[Callable[[], Tuple[int, int]], Optional[Callable[[], None]]]]] = {}
+
+
+def case(name: str):
+    def register(factory):
+        CASES[name] = factory
+        return factory
+
+    return register
+
+
+@case("pull_rows_flatten_dataframe")
+def bench_pull_rows(data: BenchData):
+    from processed_point_by_geometry import flatten_dict, processed_point_to_dict
+
+    def run():
+        dataset = [flatten_dict(processed_point_to_dict(response)) for response in data.messages]
+        df = pd.DataFrame(dataset)
+        return len(df), 0
+
+    return run, None
+
+
+@case("decode_processed_point_columns")
+def bench_decode_columns(data: BenchData):
+    from wire_decode import processed_point_columns
+
+    raws = [message.SerializeToString() for message in data.messages]
+    size = sum(map(len, raws))
+
+    def run():
+        processed_point_columns(raws)
+        return len(raws), size
+
+    return run, None
+
+
+@case("store_datapull_serialize")
+def bench_store_datapull(data: BenchData):
+    from processed_point_by_geometry import save_datapull
+
+    prefix = os.path.join(data.workdir, "bench_store")
+
+    def run():
+        save_datapull(data.flat_rows, prefix, RunMetrics("bench"))
+        return len(data.flat_rows), os.path.getsize(f"{prefix}.pkl") + os.path.getsize(f"{prefix}.csv")
+
+    return run, None
+
+
+def _import_case(batch_size: int):
+    def factory(data: BenchData):
+        db = SqliteStandIn(os.path.join(data.workdir, f"bench_import_{batch_size}.sqlite"))
+
+        def run():
+            result = import_csv(db, data.csv_path, metadata_id=1, batch_size=batch_size, metrics=RunMetrics("bench"))
+            return result["processed_rows"], data.csv_bytes
+
+        return run, db.clear
+
+    return factory
+
+
+for _batch_size in IMPORT_BATCH_SIZES:
+    case(f"import_csv_batch_{_batch_size}")(_import_case(_batch_size))
+
+
+@case("verify_csv_uploaded")
+def bench_verify(data: BenchData):
+    db = SqliteStandIn(os.path.join(data.workdir, "bench_verify.sqlite"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        import_csv(db, data.csv_path, metadata_id=1, metrics=RunMetrics("bench"))
+
+    def run():
+        result = verify_csv_uploaded(db, data.csv_path)
+        if not result["ok"]:
+            raise RuntimeError(f"verify_csv_uploaded found missing rows: {result}")
+        return result["csv_rows_total"], data.csv_bytes
+
+    return run, None
+
+
+@case("parse_wkt_linestring")
+def bench_parse_wkt(data: BenchData):
+    def run():
+        for _ in range(10):
+            parse_wkt_linestring(data.wkt)
+        return 10 * data.wkt_points, 10 * len(data.wkt)
+
+    return run, None
+
+
+@case("normalize_linestring_wkt")
+def bench_normalize_wkt(data: BenchData):
+    def run():
+        for _ in range(10):
+            normalize_linestring_wkt(data.wkt)
+        return 10 * data.wkt_points, 10 * len(data.wkt)
+
+    return run, None
+
+
+@case("linestring_wkt_to_kml")
+def bench_kml(data: BenchData):
+    path = os.path.join(data.workdir, "bench_route.kml")
+
+    def run():
+        linestring_wkt_to_kml(data.wkt, path)
+        return data.wkt_points, os.path.getsize(path)
+
+    return run, None
+
+
+def run_case(name: str, data: BenchData, repeat: int) -> Dict[str, Any]:
+    """
+    Best-of-repeat wall time, then one more run under tracemalloc for the peak
+    Python heap (numpy and pandas buffers included).
+    """
+    run, reset = CASES[name](data)
+    best = math.inf
+    items = size = 0
+    for _ in range(repeat):
+        if reset is not None:
+            reset()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            items, size = run()
+            best = min(best, time.perf_counter() - start)
+    if reset is not None:
+        reset()
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "wall_s": best,
+        "items": items,
+        "items_per_s": items / best if best > 0 else None,
+        "mb_per_s": size / 1e6 / best if best > 0 and size else None,
+        "peak_mem_bytes": peak,
+    }
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], *, tolerance: float, mem_tolerance: float) -> List[str]:
+    """
+    Regressions against the baseline: throughput more than tolerance below it,
+    or peak memory more than mem_tolerance above it.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("cases", {}).get(name)
+        if base is None:
+            continue
+        if base.get("items_per_s") and result["items_per_s"] < base["items_per_s"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['items_per_s']:,.0f} items/s vs baseline {base['items_per_s']:,.0f}")
+        if base.get("peak_mem_bytes") and result["peak_mem_bytes"] > base["peak_mem_bytes"] * (1 + mem_tolerance):
+            regressions.append(f"{name}: peak {result['peak_mem_bytes'] / 2**20:,.1f} MiB vs baseline {base['peak_mem_bytes'] / 2**20:,.1f} MiB")
+    return regressions
+
+
+def format_results(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any]) -> str:
+    lines = [f"{'case':<30}{'wall s':>9}{'items/s':>14}{'MB/s':>9}{'peak MiB':>10}{'vs base':>9}"]
+    for name, r in results.items():
+        base = baseline.get("cases", {}).get(name, {})
+        change = f"{100 * (r['items_per_s'] / base['items_per_s'] - 1):+.0f}%" if base.get("items_per_s") else "-"
+        mb = f"{r['mb_per_s']:,.1f}" if r["mb_per_s"] else "-"
+        lines.append(f"{name:<30}{r['wall_s']:>9.3f}{r['items_per_s']:>14,.0f}{mb:>9}{r['peak_mem_bytes'] / 2**20:>10.1f}{change:>9}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the pull, convert, import and verify hot paths.")
+    parser.add_argument("cases", nargs="*", help=f"cases to run (default all): {', '.join(CASES)}")
+    parser.add_argument("--rows", type=int, default=50_000, help="synthetic telemetry rows")
+    parser.add_argument("--wkt-points", type=int, default=20_000, help="vertices of the WKT/KML corridor")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case (best is kept)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed throughput drop (fraction)")
+    parser.add_argument("--mem-tolerance", type=float, default=0.3, help="allowed peak memory growth (fraction)")
+    args = parser.parse_args(argv)
+
+    names = args.cases or list(CASES)
+    unknown = [n for n in names if n not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {unknown}")
+
+    baseline: Dict[str, Any] = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("rows") != args.rows or baseline.get("wkt_points") != args.wkt_points:
+            print(f"Baseline was recorded with rows={baseline.get('rows')} wkt_points={baseline.get('wkt_points')}; not comparing")
+            baseline = {}
+    missing = [name for name in names if name not in baseline.get("cases", {})]
+
+    results: Dict[str, Dict[str, Any]] = {}
+    with tempfile.TemporaryDirectory(prefix="compass_bench_") as workdir:
+        print(f"Preparing {args.rows:,} synthetic rows...")
+        data = BenchData(workdir, args.rows, args.wkt_points)
+        for name in names:
+            print(f"  {name}", flush=True)
+            results[name] = run_case(name, data, args.repeat)
+
+    report = format_results(results, baseline)
+    regressions = compare(results, baseline, tolerance=args.tolerance, mem_tolerance=args.mem_tolerance) if baseline else []
+    print(report)
+    with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
+        f.write(report + "\n")
+        f.writelines(f"REGRESSION {r}\n" for r in regressions)
+
+    if args.save_baseline:
+        cases = dict(baseline.get("cases", {}), **results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "rows": args.rows,
+                "wkt_points": args.wkt_points,
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "cases": cases,
+            }, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    if regressions:
+        print("Regressions:")
+        for r in regressions:
+            print(f"  {r}")
+        return 1
+    if missing and not args.save_baseline:
+        # not a pass: nothing was checked for these cases
+        print(f"No baseline for {', '.join(missing)} (record one with --save-baseline)")
+        return NO_BASELINE_STATUS
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
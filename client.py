@@ -1,15 +1,23 @@
-import asyncio
+import concurrent.futures
 import inspect
+import os
+import random
+import time
 import requests
-from typing import Any
-from collections.abc import AsyncGenerator, Callable
+from requests.adapters import HTTPAdapter
+from typing import Any, Optional
+from collections.abc import AsyncGenerator, Callable, Iterable, Iterator
 
 import grpc
-from grpc import ClientCallDetails, RpcError, intercept_channel, secure_channel, ssl_channel_credentials
+from grpc import ClientCallDetails, RpcError, insecure_channel, intercept_channel, secure_channel, ssl_channel_credentials
 from grpc_interceptor.client import ClientInterceptor, ClientCallDetails
 
+from compassiot.gateway.v1 import gateway_pb2
 from compassiot.gateway.v1.gateway_pb2 import AuthenticateRequest
 from compassiot.gateway.v1.gateway_pb2_grpc import ServiceStub
+from gateway_metrics import GatewayMetrics, MetricsInterceptor
+from gateway_scheduler import GatewayScheduler, SchedulerInterceptor, default_scheduler
+from response_cache import ResponseCache
 
 from pathlib import Path
 
@@ -25,25 +33,125 @@ def load_api_key(path: str = "api_key.txt") -> str:
 
     return key
 
-HOST = "api.compassiot.cloud"
-SECRET = load_api_key("api_key.txt")
+# Point these at a local stand-in (mock_gateway.py) to run offline, e.g.
+#   COMPASS_HOST=localhost:50051 COMPASS_REST_HOST=localhost:8080 COMPASS_INSECURE=1
+HOST = os.environ.get("COMPASS_HOST", "api.compassiot.cloud")  # gRPC streams
+REST_HOST = os.environ.get("COMPASS_REST_HOST", HOST)  # unary calls via UnaryRestInterceptor
+INSECURE = os.environ.get("COMPASS_INSECURE", "") not in ("", "0", "false")  # plaintext gRPC and http://
+SECRET = os.environ.get("COMPASS_API_KEY")  # else read from api_key.txt by api_secret() on first use
+
+
+def api_secret() -> str:
+	# Loaded lazily so importing client (mock gateway runs, job_runner --example) needs no key
+	global SECRET
+	if not SECRET:
+		SECRET = os.environ.get("COMPASS_API_KEY") or load_api_key("api_key.txt")
+	return SECRET
+
+
+def _channel(host: str):
+	return insecure_channel(host) if INSECURE else secure_channel(host, ssl_channel_credentials())
 
 TIMEOUT_SEC = 60 * 25  # used by retryStream
 SHORT_TIMEOUT_SEC = 60 * 5
 
 
-def create_gateway_client() -> ServiceStub:
+def create_gateway_client(
+	scheduler: Optional[GatewayScheduler] = None,
+	cache: Optional[ResponseCache] = None,
+	metrics: Optional[GatewayMetrics] = None,
+	raw: bool = False,
+) -> ServiceStub:
+	"""
+	Gateway client whose calls are throttled by a GatewayScheduler: unless one is
+	passed in, default_scheduler() allows each RPC 5 calls/s and 8 concurrently
+	open streams for the whole process (set COMPASS_RATE, COMPASS_RATES and
+	COMPASS_MAX_STREAMS to change that). A 429 / RESOURCE_EXHAUSTED unary call
+	is not retried; it raises as before and slows the calls after it down.
+	"""
+	# raw=True returns a RawServiceStub (streams yield serialized bytes, e.g. for wire_archive capture).
 	# UnaryRestInterceptor must be last as it's the layer which makes the API call,
-	# unlike AccessTokenInterceptor which just populates the header
+	# unlike AccessTokenInterceptor which just populates the header.
+	# Every client in the process shares default_scheduler() for rate limits and stream slots;
+	# cache hits skip the scheduler since they never reach the API.
+	# MetricsInterceptor sits after the scheduler so latencies exclude local queueing.
 	interceptors = [
-		AccessTokenInterceptor(HOST, SECRET), 
-		UnaryRestInterceptor(HOST)
+		AccessTokenInterceptor(REST_HOST, api_secret(), on_refresh=metrics.record_auth_refresh if metrics is not None else None), 
+		SchedulerInterceptor(scheduler or default_scheduler(), skip=cache.contains if cache is not None else None),
+		*([MetricsInterceptor(metrics)] if metrics is not None else []),
+		UnaryRestInterceptor(REST_HOST, cache=cache)
 	]
-	channel = secure_channel(HOST, ssl_channel_credentials())
+	channel = _channel(HOST)
 	channel = intercept_channel(channel, *interceptors)
+	stub = RawServiceStub(channel) if raw else ServiceStub(channel)
+	stub.metrics = metrics  # lets resumable callers (paginate_processed_point) report stream retries
+	return stub
+
+
+class RawServiceStub:
+	"""
+	ServiceStub whose server-streaming methods yield each response as its serialized
+	bytes instead of a decoded message. Unary methods behave as on ServiceStub.
+	"""
+
+	def __init__(self, channel):
+		stub = ServiceStub(channel)
+		service = gateway_pb2.DESCRIPTOR.services_by_name["Service"]
+		for method in service.methods:
+			if method.server_streaming and not method.client_streaming:
+				callable = channel.unary_stream(
+					f"/{service.full_name}/{method.name}",
+					request_serializer=lambda request: request.SerializeToString(),
+					response_deserializer=None,
+				)
+			else:
+				callable = getattr(stub, method.name)
+			setattr(self, method.name, callable)
+
+
+def create_async_gateway_client(auth: "AsyncAccessTokenInterceptor" = None) -> ServiceStub:
+	# grpc.aio channel so many streaming RPCs can share one asyncio event loop.
+	# Unary calls still go through create_gateway_client (REST shim).
+	if auth is None:
+		auth = AsyncAccessTokenInterceptor(REST_HOST, api_secret())
+	if INSECURE:
+		channel = grpc.aio.insecure_channel(HOST, interceptors=[auth])
+	else:
+		channel = grpc.aio.secure_channel(HOST, ssl_channel_credentials(), interceptors=[auth])
 	return ServiceStub(channel)
 
 
+class _RestRpcError(RpcError, grpc.Future):
+	"""
+	Error of a REST unary call. grpc hands an RpcError raised below an interceptor
+	back up the chain as the call itself, so it must also behave as a completed future.
+	"""
+
+	def cancel(self):
+		return False
+
+	def cancelled(self):
+		return False
+
+	def running(self):
+		return False
+
+	def done(self):
+		return True
+
+	def result(self, timeout=None):
+		raise self
+
+	def exception(self, timeout=None):
+		return self
+
+	def traceback(self, timeout=None):
+		return None
+
+	def add_done_callback(self, fn):
+		fn(self)
+
+
 class UnaryRestInterceptor(grpc.UnaryUnaryClientInterceptor):
 	"""
 	Shim to convert unary gRPC calls to pure REST, due to several suspected regressions in
@@ -67,7 +175,7 @@ class UnaryRestInterceptor(grpc.UnaryUnaryClientInterceptor):
 	@staticmethod
 	def _cast_grpc_error(response: requests.Response):
 		has_error = False
-		error = RpcError()
+		error = _RestRpcError()
 		if response.status_code >= 200 and response.status_code < 300:
 			has_error = False
 		if response.status_code == 400:
@@ -98,12 +206,17 @@ class UnaryRestInterceptor(grpc.UnaryUnaryClientInterceptor):
 		else:
 			return None
 
-	def __init__(self, host: str):
+	def __init__(self, host: str, cache: Optional[ResponseCache] = None, pool_size: int = 32, insecure: Optional[bool] = None):
 		self.host = host
+		self.cache = cache
+		self.scheme = "http" if (INSECURE if insecure is None else insecure) else "https"
 		self.deserializer_map = self._build_deserializer_map()
+		# Keep-alive connection pool shared by every thread using this channel
+		self.session = requests.Session()
+		self.session.mount("%s://" % self.scheme, HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
 
 	def _call_rest(self, request: Any, call_details: ClientCallDetails):
-		url = "https://%s/%s" % (self.host, call_details.method.strip("/"))
+		url = "%s://%s/%s" % (self.scheme, self.host, call_details.method.strip("/"))
 
 		# Copy headers
 		headers = self._HTTP_HEADERS.copy()
@@ -111,17 +224,27 @@ class UnaryRestInterceptor(grpc.UnaryUnaryClientInterceptor):
 			for (k, v) in call_details.metadata:
 				headers[k] = v
 
-		# Create future
-		future = asyncio.get_event_loop().create_future()
+		# Create future (not tied to an event loop, so worker threads can call unary RPCs too)
+		future = concurrent.futures.Future()
+		rpc = call_details.method.split("/")[-1]
+		deserializer = self.deserializer_map[rpc]
+
+		# Serve from the on-disk cache when allowed
+		cacheable = self.cache is not None and self.cache.cacheable(rpc, request)
+		if cacheable:
+			content = self.cache.get(rpc, request)
+			if content is not None:
+				future.set_result(deserializer(content))
+				return future
 
 		# Make request & deserialize it
-		response = requests.post(url, data=request.SerializeToString(True), headers=headers)
+		response = self.session.post(url, data=request.SerializeToString(True), headers=headers, timeout=call_details.timeout)
 		error = self._cast_grpc_error(response)
 		if error is not None:
 			future.set_exception(error)
 		else:
-			rpc = call_details.method.split("/")[-1]
-			deserializer = self.deserializer_map[rpc]
+			if cacheable:
+				self.cache.put(rpc, request, response.content)
 			future.set_result(deserializer(response.content))
 		return future
 	
@@ -130,15 +253,16 @@ class UnaryRestInterceptor(grpc.UnaryUnaryClientInterceptor):
 
 
 class AccessTokenInterceptor(ClientInterceptor):
-	def __init__(self, host: str, secret: str) -> None:
+	def __init__(self, host: str, secret: str, on_refresh: Optional[Callable[[], None]] = None) -> None:
 		self.host = host
 		self.secret = secret
+		self.on_refresh = on_refresh
 		self.access_token = self._get_access_token(host, secret)
 
 	@staticmethod
 	def _get_access_token(host: str, secret: str) -> str:
 		interceptors = [UnaryRestInterceptor(host)]
-		with intercept_channel(secure_channel(host, ssl_channel_credentials()), *interceptors) as channel:
+		with intercept_channel(_channel(host), *interceptors) as channel:
 			service = ServiceStub(channel)
 			response = service.Authenticate(AuthenticateRequest(token=secret))
 			return response.access_token
@@ -154,29 +278,124 @@ class AccessTokenInterceptor(ClientInterceptor):
 			call_details.compression,
 		)
 	
+	@staticmethod
+	def _is_unauthenticated(error) -> bool:
+		return isinstance(error, RpcError) and callable(getattr(error, "code", None)) and error.code() == grpc.StatusCode.UNAUTHENTICATED
+
 	def intercept(self, method: Callable[..., Any], request_or_iterator: Any, call_details: ClientCallDetails):
 		try:
-			return method(request_or_iterator, self._create_details_with_auth(call_details, self.access_token))
+			result = method(request_or_iterator, self._create_details_with_auth(call_details, self.access_token))
 		except RpcError as error:
-			if error.code == grpc.StatusCode.UNAUTHENTICATED:
-				self.access_token = self._get_access_token(self.host, self.secret)
-				return method(request_or_iterator, self._create_details_with_auth(call_details, self.access_token))
-			else:
+			if not self._is_unauthenticated(error):
 				raise error
+		else:
+			# Unary errors come back inside the (already completed) future rather than raised
+			if not (hasattr(result, "done") and result.done() and self._is_unauthenticated(result.exception())):
+				return result
+		self.access_token = self._get_access_token(self.host, self.secret)
+		if self.on_refresh is not None:
+			self.on_refresh()
+		return method(request_or_iterator, self._create_details_with_auth(call_details, self.access_token))
 
 
-def retry_stream(stream: Callable[[None], AsyncGenerator]) -> AsyncGenerator:
-	generator = stream()
+class AsyncAccessTokenInterceptor(grpc.aio.UnaryStreamClientInterceptor):
+	"""
+	Populates the authorization header of grpc.aio streaming calls. The token is fetched
+	over the REST shim; call refresh() after an UNAUTHENTICATED error.
+	"""
+
+	def __init__(self, host: str, secret: str) -> None:
+		self.host = host
+		self.secret = secret
+		self.access_token = AccessTokenInterceptor._get_access_token(host, secret)
+
+	def refresh(self) -> None:
+		self.access_token = AccessTokenInterceptor._get_access_token(self.host, self.secret)
+
+	async def intercept_unary_stream(self, continuation, client_call_details, request):
+		details = grpc.aio.ClientCallDetails(
+			client_call_details.method,
+			client_call_details.timeout,
+			[("authorization", "Bearer %s" % (self.access_token))],
+			client_call_details.credentials,
+			client_call_details.wait_for_ready,
+		)
+		return await continuation(details, request)
+
+
+# Stream errors worth reconnecting for. DEADLINE_EXCEEDED is the normal end of a
+# stream opened with TIMEOUT_SEC / SHORT_TIMEOUT_SEC, so it reconnects without delay.
+RETRYABLE_STREAM_CODES = (
+	grpc.StatusCode.DEADLINE_EXCEEDED,
+	grpc.StatusCode.UNAVAILABLE,
+	grpc.StatusCode.INTERNAL,
+	grpc.StatusCode.RESOURCE_EXHAUSTED,
+)
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+	"""
+	"Full jitter" exponential backoff: uniform in [0, min(cap, base * 2**attempt)].
+	"""
+	return random.uniform(0.0, min(cap, base * (2 ** attempt)))
+
+
+def resumable_stream(
+	open_stream: Callable[[Any], Iterable],
+	*,
+	cursor: Optional[Callable[[Any], Any]] = None,
+	retry_codes: Iterable[grpc.StatusCode] = RETRYABLE_STREAM_CODES,
+	max_retries: Optional[int] = None,
+	backoff_base: float = 1.0,
+	backoff_max: float = 60.0,
+	on_retry: Optional[Callable[[grpc.StatusCode], None]] = None,
+) -> Iterator:
+	"""
+	Yield from a streaming RPC, reconnecting on retryable errors.
+
+	open_stream(position) opens the stream; position is None the first time and
+	afterwards cursor(last_response), e.g. cursor=lambda r: r.timestamp to resume via
+	last_received_timestamp. The cursor is only evaluated when reconnecting, so the
+	per-message cost is one reference assignment.
+
+	Reconnects back off exponentially with full jitter; the attempt counter resets
+	whenever a connection delivers data. max_retries counts consecutive failed
+	attempts (None = retry forever). on_retry(code) is called before every reconnect.
+	"""
+	retry_codes = set(retry_codes)
+	last = None
+	attempt = 0
+	position = None
 	while True:
+		received = False
 		try:
-			yield from generator
+			for response in open_stream(position):
+				received = True
+				last = response
+				yield response
+			return
 		except RpcError as error:
-			if error.code() is grpc.StatusCode.DEADLINE_EXCEEDED:
-					print("DeadlineExceeded, retrying stream")
-					generator = stream()
-					continue
-			else:
-					raise error
+			code = error.code()
+			if code not in retry_codes:
+				raise error
+			attempt = 0 if received else attempt + 1
+			if max_retries is not None and attempt > max_retries:
+				raise error
+			if last is not None and cursor is not None:
+				position = cursor(last)
+			if on_retry is not None:
+				on_retry(code)
+			if code is grpc.StatusCode.DEADLINE_EXCEEDED and received:
+				print("DeadlineExceeded, resuming stream")
+				continue
+			delay = backoff_delay(attempt, backoff_base, backoff_max)
+			print(f"{code.name}, retrying stream in {delay:.1f}s")
+			time.sleep(delay)
+
+
+def retry_stream(stream: Callable[[None], AsyncGenerator]) -> AsyncGenerator:
+	# Restarts from scratch; use resumable_stream with a cursor to resume instead
+	return resumable_stream(lambda position: stream())
 
 
 def get_enum_str(response, descriptor_field_number, enum_value):
@@ -0,0 +1,241 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from linestring_to_earth import parse_wkt_linestring
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def expand_ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    Concatenate arange(start, start + count) for every (start, count) pair
+    without a Python loop.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    offsets = np.cumsum(counts) - counts
+    return np.repeat(np.asarray(starts, dtype=np.int64), counts) + np.arange(counts.sum()) - np.repeat(offsets, counts)
+
+
+class CorridorIndex:
+    """
+    Grid index over the segments of a WKT LINESTRING corridor.
+
+    The corridor is projected to a local equirectangular plane (metres) around its
+    centre, which is accurate to well under a metre for corridors of a few hundred km.
+    Every segment is registered in each grid cell its bounding box (grown by buffer_m)
+    touches, so a point only has to be tested against the segments in its own cell.
+
+    Example:
+      index = CorridorIndex(load_linestring_from_textfile("D4_OHGO.txt"), buffer_m=30)
+      distance_m, chainage_m, segment = index.locate(df["road_matched_point_lat"], df["road_matched_point_lon"])
+    """
+
+    def __init__(self, wkt: str, *, buffer_m: float = 25.0, cell_size_m: float = 250.0):
+        if buffer_m < 0:
+            raise ValueError(f"buffer_m must be >= 0, got {buffer_m}")
+        if cell_size_m <= 0:
+            raise ValueError(f"cell_size_m must be > 0, got {cell_size_m}")
+
+        points = np.asarray(parse_wkt_linestring(wkt), dtype=np.float64)
+        self.buffer_m = float(buffer_m)
+        self.cell_size_m = float(cell_size_m)
+
+        self.lon0 = float(points[:, 0].mean())
+        self.lat0 = float(points[:, 1].mean())
+        self._kx = math.radians(1.0) * EARTH_RADIUS_M * math.cos(math.radians(self.lat0))
+        self._ky = math.radians(1.0) * EARTH_RADIUS_M
+
+        x, y = self.project(points[:, 1], points[:, 0])
+        self.ax, self.ay = x[:-1], y[:-1]
+        self.dx, self.dy = x[1:] - x[:-1], y[1:] - y[:-1]
+        self.segment_length_m = np.hypot(self.dx, self.dy)
+        self.segment_start_m = np.concatenate(([0.0], np.cumsum(self.segment_length_m)[:-1]))
+        self.length_m = float(self.segment_length_m.sum())
+
+        self._build_grid(x, y)
+
+    def project(self, lat, lon):
+        """
+        Project lat/lon degrees to local x/y metres.
+        """
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        return (lon - self.lon0) * self._kx, (lat - self.lat0) * self._ky
+
+    def unproject(self, x, y):
+        """
+        Inverse of project(); returns (lat, lon) degrees.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        return y / self._ky + self.lat0, x / self._kx + self.lon0
+
+    def point_at(self, chainage_m):
+        """
+        Return (lat, lon) of the corridor point(s) at the given chainage.
+        """
+        c = np.clip(np.asarray(chainage_m, dtype=np.float64), 0.0, self.length_m)
+        seg = np.clip(np.searchsorted(self.segment_start_m, c, side="right") - 1, 0, len(self.ax) - 1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t = np.where(self.segment_length_m[seg] > 0, (c - self.segment_start_m[seg]) / self.segment_length_m[seg], 0.0)
+        return self.unproject(self.ax[seg] + t * self.dx[seg], self.ay[seg] + t * self.dy[seg])
+
+    def _cell_xy(self, x, y):
+        return (
+            np.floor((x - self._grid_x0) / self.cell_size_m).astype(np.int64),
+            np.floor((y - self._grid_y0) / self.cell_size_m).astype(np.int64),
+        )
+
+    def _build_grid(self, x, y):
+        pad = self.buffer_m
+        self._grid_x0 = float(x.min() - pad)
+        self._grid_y0 = float(y.min() - pad)
+
+        bx0, by0 = self._cell_xy(np.minimum(x[:-1], x[1:]) - pad, np.minimum(y[:-1], y[1:]) - pad)
+        bx1, by1 = self._cell_xy(np.maximum(x[:-1], x[1:]) + pad, np.maximum(y[:-1], y[1:]) + pad)
+        self._grid_ny = int(by1.max()) + 1
+
+        # Expand every segment into the cells of its (padded) bounding box without a Python loop
+        nx = bx1 - bx0 + 1
+        ny = by1 - by0 + 1
+        counts = nx * ny
+        seg_ids = np.repeat(np.arange(len(counts)), counts)
+        local = expand_ranges(np.zeros(len(counts)), counts)
+        cx = bx0[seg_ids] + local // ny[seg_ids]
+        cy = by0[seg_ids] + local % ny[seg_ids]
+        keys = cx * self._grid_ny + cy
+
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        self._cell_segments = seg_ids[order]
+        self._cell_keys, starts = np.unique(keys, return_index=True)
+        self._cell_offsets = np.append(starts, len(keys))
+
+    def locate(self, lat, lon, *, chunk_size: int = 1_000_000):
+        """
+        Distance to the corridor, chainage and nearest segment for every point.
+
+        Points further than buffer_m from every segment get distance inf, chainage NaN
+        and segment -1. Work is done in chunks of chunk_size points to bound the size
+        of the point x candidate-segment arrays.
+
+        Returns:
+          (distance_m, chainage_m, segment_index) numpy arrays
+        """
+        x, y = self.project(lat, lon)
+        n = len(x)
+        distance = np.full(n, np.inf)
+        chainage = np.full(n, np.nan)
+        segment = np.full(n, -1, dtype=np.int64)
+
+        for start in range(0, n, chunk_size):
+            stop = min(start + chunk_size, n)
+            d, c, s = self._locate_chunk(x[start:stop], y[start:stop])
+            distance[start:stop] = d
+            chainage[start:stop] = c
+            segment[start:stop] = s
+
+        return distance, chainage, segment
+
+    def _locate_chunk(self, x, y):
+        n = len(x)
+        distance = np.full(n, np.inf)
+        chainage = np.full(n, np.nan)
+        segment = np.full(n, -1, dtype=np.int64)
+
+        finite = np.isfinite(x) & np.isfinite(y)
+        cx, cy = self._cell_xy(np.where(finite, x, 0.0), np.where(finite, y, 0.0))
+        keys = cx * self._grid_ny + cy
+        pos = np.searchsorted(self._cell_keys, keys)
+        pos_ok = np.minimum(pos, len(self._cell_keys) - 1)
+        hit = finite & (cx >= 0) & (cy >= 0) & (cy < self._grid_ny) & (self._cell_keys[pos_ok] == keys)
+
+        pts = np.flatnonzero(hit)
+        if len(pts) == 0:
+            return distance, chainage, segment
+
+        first = self._cell_offsets[pos_ok[pts]]
+        counts = self._cell_offsets[pos_ok[pts] + 1] - first
+
+        # One row per (point, candidate segment) pair
+        pair_pt = np.repeat(pts, counts)
+        pair_seg = self._cell_segments[expand_ranges(first, counts)]
+
+        px = x[pair_pt] - self.ax[pair_seg]
+        py = y[pair_pt] - self.ay[pair_seg]
+        dx = self.dx[pair_seg]
+        dy = self.dy[pair_seg]
+        seg_len2 = dx * dx + dy * dy
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t = np.where(seg_len2 > 0, (px * dx + py * dy) / seg_len2, 0.0)
+        t = np.clip(t, 0.0, 1.0)
+        d = np.hypot(px - t * dx, py - t * dy)
+
+        # Nearest candidate per point: sort by (point, distance) and keep the first row of each point
+        order = np.lexsort((d, pair_pt))
+        pair_pt = pair_pt[order]
+        keep = np.ones(len(order), dtype=bool)
+        keep[1:] = pair_pt[1:] != pair_pt[:-1]
+        best = order[keep]
+        best_pt = pair_pt[keep]
+
+        within = d[best] <= self.buffer_m
+        best = best[within]
+        best_pt = best_pt[within]
+        best_seg = pair_seg[best]
+
+        distance[best_pt] = d[best]
+        chainage[best_pt] = self.segment_start_m[best_seg] + t[best] * self.segment_length_m[best_seg]
+        segment[best_pt] = best_seg
+        return distance, chainage, segment
+
+
+def clip_points_to_corridor(
+    df: pd.DataFrame,
+    corridor,
+    *,
+    buffer_m: float = 25.0,
+    lat_col: str = "road_matched_point_lat",
+    lon_col: str = "road_matched_point_lon",
+    keep_outside: bool = False,
+) -> pd.DataFrame:
+    """
+    Clip pulled telemetry rows to a corridor in one batched call.
+
+    corridor may be a WKT LINESTRING string or a CorridorIndex (reuse the index when
+    clipping many files against the same corridor).
+
+    Adds columns:
+      - corridor_distance_m : distance from the point to the corridor centreline
+      - chainage_m          : distance along the corridor from its first vertex
+      - corridor_segment    : index of the nearest LINESTRING segment
+
+    Rows further than buffer_m are dropped unless keep_outside=True.
+    """
+    if isinstance(corridor, CorridorIndex):
+        index = corridor
+        if buffer_m > index.buffer_m:
+            raise ValueError(
+                f"buffer_m={buffer_m} exceeds the index buffer ({index.buffer_m}); rebuild the CorridorIndex"
+            )
+    else:
+        index = CorridorIndex(corridor, buffer_m=buffer_m)
+
+    missing = [c for c in (lat_col, lon_col) if c not in df.columns]
+    if missing:
+        raise ValueError(f"DataFrame missing required columns: {missing}")
+
+    distance, chainage, segment = index.locate(df[lat_col].to_numpy(), df[lon_col].to_numpy())
+
+    out = df.copy() if keep_outside else df
+    if not keep_outside:
+        mask = distance <= buffer_m
+        out = df.loc[mask].copy()
+        distance, chainage, segment = distance[mask], chainage[mask], segment[mask]
+
+    out["corridor_distance_m"] = distance
+    out["chainage_m"] = chainage
+    out["corridor_segment"] = segment
+    return out
@@ -1,4 +1,5 @@
 import mariadb
+from typing import Optional
 
 def table_exists(conn, table_name: str) -> bool:
     cur = conn.cursor()
@@ -198,4 +199,26 @@ def metadata_filename_exists(
         """,
         (filename,),
     )
-    return cur.fetchone() is not None
\ No newline at end of file
+    return cur.fetchone() is not None
+
+def metadata_id_for_filename(
+    conn,
+    filename: str,
+    table_name: str = "import_metadata",
+) -> Optional[int]:
+    """
+    Returns the metadata_id of the first import of filename, or None.
+    """
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT metadata_id
+        FROM `{table_name}`
+        WHERE filename = %s
+        ORDER BY metadata_id
+        LIMIT 1
+        """,
+        (filename,),
+    )
+    row = cur.fetchone()
+    return int(row[0]) if row else None
@@ -1,9 +1,12 @@
 import csv
+import itertools
 import mariadb
-from halo import Halo
+import os
+from time import perf_counter
 from typing import Optional,List, Dict, Any
 import sys
 import re
+from stage_metrics import RunMetrics
 
 TELEMETRY_COLUMNS = [
     "vehicle_type",
@@ -32,6 +35,16 @@ TELEMETRY_COLUMNS = [
     "point_id",
 ]
 
+def build_telemetry_insert_sql(table_name: str = "vehicle_telemetry") -> str:
+    """
+    INSERT IGNORE statement for TELEMETRY_COLUMNS + metadata_id (one row of %s placeholders).
+    """
+    columns = TELEMETRY_COLUMNS + ["metadata_id"]
+    return f"""
+    INSERT IGNORE INTO `{table_name}` ({",".join(columns)})
+    VALUES ({",".join(["%s"] * len(columns))})
+    """
+
 def import_csv(
     conn,
     csv_path: str,
@@ -39,42 +52,44 @@ def import_csv(
     table_name: str = "vehicle_telemetry",
     metadata_id: int,
     batch_size: int = 2000,
+    metrics: Optional[RunMetrics] = None,
+    report_prefix: Optional[str] = None,
+    skip_rows: int = 0,
 ):
     """
     Import telemetry CSV into MariaDB, attaching metadata_id to every row.
-    """
+    skip_rows leading data rows (e.g. imported by an earlier run) are passed over.
 
-    columns = TELEMETRY_COLUMNS + ["metadata_id"]
-
-    insert_sql = f"""
-    INSERT IGNORE INTO `{table_name}` ({",".join(columns)})
-    VALUES ({",".join(["%s"] * len(columns))})
+    Time is split into parse (CSV reading + row building), execute (executemany)
+    and commit stages. Unless a shared metrics object is passed in, the summary is
+    printed, and with report_prefix the report is also written to
+    <report_prefix>.json / .prom.
     """
 
-    # Optional Halo spinner
-    spinner = None
-    use_spinner = sys.stderr.isatty()
-    if use_spinner:
-        try:
-            from halo import Halo
-            spinner = Halo(text="Importing CSV…", spinner="dots", stream=sys.stderr)
-            spinner.start()
-        except Exception:
-            spinner = None
-            use_spinner = False
-
-    def set_status(msg: str):
-        if spinner:
-            spinner.text = msg
-
-    def succeed(msg: str):
-        if spinner:
-            spinner.succeed(msg)
+    insert_sql = build_telemetry_insert_sql(table_name)
+    own_metrics = metrics is None
+    if own_metrics:
+        metrics = RunMetrics(f"import {os.path.basename(csv_path)}")
+    parse = metrics.get("parse")
+    execute = metrics.get("execute")
+    commit = metrics.get("commit")
+    parse.bytes += os.path.getsize(csv_path)
+
+    def write_batch(batch):
+        start = perf_counter()
+        cur.executemany(insert_sql, batch)
+        execute.wall_s += perf_counter() - start
+        execute.items += len(batch)
+        start = perf_counter()
+        conn.commit()
+        commit.wall_s += perf_counter() - start
+        commit.items += 1
 
     cur = conn.cursor()
     batch = []
     processed = 0
 
+    parse_started = perf_counter()
     with open(csv_path, newline="", encoding="utf-8") as f:
         sample = f.read(4096)
         f.seek(0)
@@ -85,7 +100,7 @@ def import_csv(
         if missing:
             raise ValueError(f"CSV missing required columns: {missing}")
 
-        for row in reader:
+        for row in itertools.islice(reader, skip_rows, None):
             processed += 1
 
             values = []
@@ -98,25 +113,39 @@ def import_csv(
 
             batch.append(values)
 
-            if processed % 5000 == 0:
-                set_status(f"Processed {processed:,} rows")
-
             if len(batch) >= batch_size:
-                cur.executemany(insert_sql, batch)
-                conn.commit()
+                parse.wall_s += perf_counter() - parse_started
+                parse.items += len(batch)
+                write_batch(batch)
                 batch.clear()
+                metrics.progress("execute")
+                parse_started = perf_counter()
 
         if batch:
-            cur.executemany(insert_sql, batch)
-            conn.commit()
+            parse.wall_s += perf_counter() - parse_started
+            parse.items += len(batch)
+            write_batch(batch)
             batch.clear()
 
-    succeed(f"Import complete: {processed:,} rows (metadata_id={metadata_id})")
-    return {
+    metrics.progress("execute", force=True)
+    metrics.end_progress()
+    print(f"Import complete: {processed:,} rows (metadata_id={metadata_id})")
+    result = {
         "processed_rows": processed,
         "metadata_id": metadata_id,
     }
+    if own_metrics:
+        result["metrics"] = metrics.finish(report_prefix)
+    return result
    
+def count_csv_rows(csv_path: str) -> int:
+    """
+    Number of data rows (header excluded) in a CSV, as import_csv would read them.
+    """
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        return max(sum(1 for row in csv.reader(f) if row) - 1, 0)  # DictReader skips blank lines too
+
+
 def linestring_text_from_points(points_latlon):
     """
     points_latlon: iterable of (lat, lon) tuples
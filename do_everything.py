@@ -1,4 +1,5 @@
 from processed_point_by_geometry import store_datapull
+from pull_manifest import PullManifest
 from linestring_to_earth import load_linestring_from_textfile
 import compassiot.compass.v1.time_pb2 as time
 
@@ -24,12 +25,15 @@ date_range = time.DateTimeRange(
     )
 
 
+# Days already pulled into the same file are skipped; new or failed days are appended
+manifest = PullManifest("pull_manifest.sqlite")
+
 linestring = load_linestring_from_textfile("D4_OHGO.txt")
 filename = "August_2025_SB_D4_OHGO_TEST"
 
-store_datapull(linestring,date_range,filename)
+store_datapull(linestring,date_range,filename,manifest=manifest)
 
 linestring = load_linestring_from_textfile("D7_OHGO.txt")
 filename = "August_2025_SB_D7_OHGO_TEST"
 
-store_datapull(linestring,date_range,filename)
+store_datapull(linestring,date_range,filename,manifest=manifest)
@@ -0,0 +1,452 @@
+import argparse
+import json
+import os
+import pickle
+import re
+import shutil
+import tempfile
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MEMORY_BUDGET = 1 << 30
+CHUNK_ROWS = 100_000
+RUN_BLOCK_ROWS = 16_384
+# sort key shorthands
+KEY_ALIASES = {"timestamp": ("timestamp_seconds", "timestamp_nanos")}
+# read as strings from CSV whatever they look like
+STRING_COLUMNS = ("vehicle_id", "trip_id", "point_id")
+
+_SIZE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([kmgt]?)(i?b?)\s*$", re.IGNORECASE)
+
+
+def parse_bytes(value) -> int:
+    """
+    A byte count from an int or a string like "512MB", "2GiB" or "1.5g" (powers of 1024).
+    """
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = _SIZE.match(str(value))
+    if match is None:
+        raise ValueError(f"not a size: {value!r}")
+    return int(float(match.group(1)) * 1024 ** " kmgt".index(match.group(2).lower() or " "))
+
+
+def sort_keys(by: Iterable[str]) -> List[str]:
+    keys = []
+    for key in [by] if isinstance(by, str) else by:
+        keys.extend(KEY_ALIASES.get(key, (key,)))
+    return keys
+
+
+def _flatten(d: Dict[str, Any], parent_key: str = "", sep: str = "_") -> Dict[str, Any]:
+    # processed_point_by_geometry.flatten_dict, without importing the gRPC stubs
+    items = {}
+    for k, v in d.items():
+        key = parent_key + sep + k if parent_key else k
+        if isinstance(v, dict):
+            items.update(_flatten(v, key, sep))
+        else:
+            items[key] = v
+    return items
+
+
+def _records_chunks(records: Iterable[Dict[str, Any]], chunk_rows: int) -> Iterator[pd.DataFrame]:
+    rows = []
+    for record in records:
+        rows.append(_flatten(record))
+        if len(rows) >= chunk_rows:
+            yield pd.DataFrame(rows)
+            rows = []
+    if rows:
+        yield pd.DataFrame(rows)
+
+
+def _pickle_chunks(path: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """
+    Objects pickled one after another in path (DataFrames or lists of row dicts).
+    A legacy .pkl holds a single DataFrame, which has to be unpickled whole; it is
+    then handed on in slices, so the sort never holds more than one copy of it.
+    """
+    with open(path, "rb") as f:
+        while True:
+            try:
+                obj = pickle.load(f)
+            except EOFError:
+                return
+            if isinstance(obj, pd.DataFrame):
+                for start in range(0, len(obj), chunk_rows):
+                    yield obj.iloc[start:start + chunk_rows]
+            else:
+                yield from _records_chunks(obj, chunk_rows)
+            del obj
+
+
+class _JsonStream:
+    """
+    Incremental reader of one JSON document, a value at a time, reading the file
+    in read_size pieces.
+    """
+
+    def __init__(self, f, read_size: int = 1 << 20):
+        self.f = f
+        self.read_size = read_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        more = self.f.read(self.read_size)
+        if not more:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + more
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, chars: str) -> str:
+        ch = self.peek()
+        if not ch or ch not in chars:
+            raise ValueError(f"expected one of {chars!r} in JSON, got {ch!r}")
+        self.pos += 1
+        return ch
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            if end < len(self.buf) or self.eof or not self._fill():  # a number may continue in the next piece
+                self.pos = end
+                return value
+
+
+def _tinydb_records(path: str, table: str = "_default") -> Iterator[Dict[str, Any]]:
+    """
+    Documents of one table of a TinyDB JSON file ({"_default": {"1": {...}, ...}}),
+    without loading the file.
+    """
+    with open(path, encoding="utf-8") as f:
+        stream = _JsonStream(f)
+        stream.expect("{")
+        if stream.peek() == "}":
+            return
+        while True:
+            name = stream.value()
+            stream.expect(":")
+            if name != table:
+                stream.value()
+            else:
+                stream.expect("{")
+                if stream.peek() != "}":
+                    while True:
+                        stream.value()  # document id
+                        stream.expect(":")
+                        yield stream.value()
+                        if stream.expect(",}") == "}":
+                            break
+                else:
+                    stream.expect("}")
+            if stream.expect(",}") == "}":
+                return
+
+
+def iter_chunks(path: str, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    DataFrames of at most chunk_rows rows from a pulled dataset: .csv, .pkl
+    (pickled DataFrame or row dicts), TinyDB .json (flattened like the pulls) or
+    .parquet (needs pyarrow).
+    """
+    if path.endswith(".csv"):
+        with pd.read_csv(path, chunksize=chunk_rows, dtype={column: str for column in STRING_COLUMNS}) as reader:
+            yield from reader
+    elif path.endswith((".pkl", ".pickle")):
+        yield from _pickle_chunks(path, chunk_rows)
+    elif path.endswith(".json"):
+        yield from _records_chunks(_tinydb_records(path), chunk_rows)
+    elif path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f"unknown dataset format: {path}")
+
+
+def _nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=False, deep=True).sum())
+
+
+def _rows_before(df: pd.DataFrame, keys: Sequence[str], bound: Sequence[Any], inclusive: bool) -> int:
+    """
+    Number of leading rows of df (sorted by keys, missing values last) whose key
+    is < bound, or <= bound when inclusive.
+    """
+    result = None
+    for key, b in reversed(list(zip(keys, bound))):
+        column = df[key].to_numpy()
+        missing = pd.isna(column)
+        if pd.isna(b):
+            lt, eq = ~missing, missing
+        else:
+            lt, eq = np.zeros(len(column), dtype=bool), np.zeros(len(column), dtype=bool)
+            present = ~missing
+            lt[present] = column[present] < b
+            eq[present] = column[present] == b
+        if result is None:
+            result = (lt | eq) if inclusive else lt
+        else:
+            result = lt | (eq & result)
+    return int(result.sum())
+
+
+class _Run:
+    """
+    A sorted spill file: DataFrame blocks pickled one after another.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows = 0
+        self.block_bytes = 0
+
+    def write(self, df: pd.DataFrame, block_rows: int):
+        with open(self.path, "wb") as f:
+            for start in range(0, len(df), block_rows):
+                block = df.iloc[start:start + block_rows]
+                pickle.dump(block, f, protocol=pickle.HIGHEST_PROTOCOL)
+                self.block_bytes = max(self.block_bytes, _nbytes(block))
+        self.rows = len(df)
+
+    def blocks(self) -> Iterator[pd.DataFrame]:
+        with open(self.path, "rb") as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+
+
+class ExternalSorter:
+    """
+    Sort a stream of DataFrame chunks by keys within a memory budget.
+
+    Chunks are buffered until they reach a third of memory_budget (concatenating
+    and sorting each make a copy), then sorted and spilled to a run file under
+    tmp_dir. sorted_chunks() merges the runs, reading each a block at a time, and
+    yields the rows in order in blocks; when more runs than fit in the budget at
+    once exist, groups of them are merged into longer runs first. The sort is
+    stable: rows with equal keys keep their input order. Missing values sort last.
+    With no keys nothing is sorted: the chunks are only spilled, and read back in
+    the order they were added.
+
+    Example:
+      with ExternalSorter(["vehicle_id", "timestamp"], memory_budget="2GB") as sorter:
+          for chunk in iter_chunks("March2025_SB_D4.csv"):
+              sorter.add(chunk)
+          write_chunks(sorter.sorted_chunks(), "March2025_SB_D4.sorted.parquet")
+    """
+
+    def __init__(self, by: Iterable[str], *, memory_budget=DEFAULT_MEMORY_BUDGET, tmp_dir: Optional[str] = None, block_rows: int = RUN_BLOCK_ROWS):
+        self.keys = sort_keys(by)
+        self.memory_budget = parse_bytes(memory_budget)
+        self.block_rows = block_rows
+        self._dir = tempfile.mkdtemp(prefix="external_sort-", dir=tmp_dir)
+        self._buffer: List[pd.DataFrame] = []
+        self._buffered_bytes = 0
+        self.runs: List[_Run] = []
+        self._run_count = 0
+        self.rows = 0
+        self.spills = 0
+        self.spilled_bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _sorted(self, frames: List[pd.DataFrame]) -> pd.DataFrame:
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0].reset_index(drop=True)
+        if not self.keys:
+            return df
+        return df.sort_values(self.keys, kind="stable", na_position="last", ignore_index=True)
+
+    def add(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        missing = [key for key in self.keys if key not in df.columns]
+        if missing:
+            raise KeyError(f"sort keys not in the data: {missing}")
+        self._buffer.append(df)
+        self._buffered_bytes += _nbytes(df)
+        self.rows += len(df)
+        if self._buffered_bytes >= self.memory_budget // 3:
+            self._spill()
+
+    def _new_run(self) -> _Run:
+        self._run_count += 1
+        return _Run(os.path.join(self._dir, f"run-{self._run_count:05d}.pkl"))
+
+    def _spill(self):
+        if not self._buffer:
+            return
+        run = self._new_run()
+        df = self._sorted(self._buffer)
+        # blocks of at most 1/64 of the budget, so the merge can take 16 runs at a time
+        row_bytes = max(self._buffered_bytes // len(df), 1)
+        run.write(df, max(256, min(self.block_rows, self.memory_budget // (64 * row_bytes))))
+        del df
+        self._buffer, self._buffered_bytes = [], 0
+        self.spills += 1
+        self.spilled_bytes += os.path.getsize(run.path)
+        self.runs.append(run)
+
+    def _fan_in(self) -> int:
+        # each merged run holds up to two blocks (leftover + next), then concat + sort copy the output
+        block_bytes = max(max(run.block_bytes for run in self.runs), 1)
+        return max(2, self.memory_budget // (4 * block_bytes))
+
+    def _merge(self, runs: List[_Run]) -> Iterator[pd.DataFrame]:
+        if not self.keys:
+            for run in runs:
+                yield from run.blocks()
+            return
+        sources = [run.blocks() for run in runs]
+        current: List[Optional[pd.DataFrame]] = [next(source, None) for source in sources]
+        while True:
+            live = [i for i, df in enumerate(current) if df is not None]
+            if not live:
+                return
+            # every row up to the smallest last key of the current blocks (run k's)
+            # is in memory now; rows equal to it in later runs wait for the rest of
+            # run k, so equal keys still come out in run order
+            ends = pd.concat([current[i][self.keys].iloc[-1:] for i in live]).set_axis(live)
+            ends = ends.sort_values(self.keys, kind="stable", na_position="last")
+            k, bound = ends.index[0], tuple(ends.iloc[0])
+            taken = []
+            for i in live:
+                n = _rows_before(current[i], self.keys, bound, inclusive=i <= k)
+                if n:
+                    taken.append(current[i].iloc[:n])
+                    current[i] = current[i].iloc[n:]
+                if current[i].empty:
+                    current[i] = next(sources[i], None)
+            if taken:
+                yield self._sorted(taken)
+
+    def _merge_to_run(self, runs: List[_Run]) -> _Run:
+        if len(runs) == 1:
+            return runs[0]
+        merged = self._new_run()
+        with open(merged.path, "wb") as f:
+            for df in self._merge(runs):
+                pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+                merged.rows += len(df)
+                merged.block_bytes = max(merged.block_bytes, _nbytes(df))
+        for run in runs:
+            os.remove(run.path)
+        return merged
+
+    def sorted_chunks(self) -> Iterator[pd.DataFrame]:
+        """
+        The added rows in key order, in blocks of roughly block_rows rows.
+        """
+        if not self.runs:
+            if self._buffer:
+                df = self._sorted(self._buffer)
+                self._buffer, self._buffered_bytes = [], 0
+                for start in range(0, len(df), self.block_rows):
+                    yield df.iloc[start:start + self.block_rows]
+            return
+        self._spill()
+        while self.keys and len(self.runs) > self._fan_in():
+            fan_in = self._fan_in()
+            # merge neighbouring runs so run order stays input order (stability)
+            self.runs = [self._merge_to_run(self.runs[i:i + fan_in]) for i in range(0, len(self.runs), fan_in)]
+        yield from self._merge(self.runs)
+
+    def close(self):
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+
+def write_chunks(chunks: Iterable[pd.DataFrame], output: str) -> int:
+    """
+    Write DataFrame chunks to one .csv or .parquet file (needs pyarrow), in order.
+    Returns the number of rows written.
+    """
+    rows = 0
+    if output.endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for df in chunks:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output, table.schema)
+                writer.write_table(table.cast(writer.schema))
+                rows += len(df)
+        finally:
+            if writer is not None:
+                writer.close()
+        return rows
+    if not output.endswith(".csv"):
+        raise ValueError(f"output must be .csv or .parquet: {output}")
+    header = True
+    for df in chunks:
+        df.to_csv(output, index=False, mode="w" if header else "a", header=header)
+        header = False
+        rows += len(df)
+    return rows
+
+
+def sort_convert(
+    source: str,
+    output: str,
+    by: Iterable[str] = ("vehicle_id",),
+    *,
+    memory_budget=DEFAULT_MEMORY_BUDGET,
+    chunk_rows: int = CHUNK_ROWS,
+    tmp_dir: Optional[str] = None,
+) -> int:
+    """
+    Re-sort a pulled dataset (.pkl, .csv, TinyDB .json or .parquet) by the keys
+    and write it as .csv or .parquet, holding about memory_budget of rows at a
+    time; the rest is spilled to tmp_dir. Returns the number of rows written.
+    """
+    with ExternalSorter(by, memory_budget=memory_budget, tmp_dir=tmp_dir) as sorter:
+        for chunk in iter_chunks(source, chunk_rows):
+            sorter.add(chunk)
+        rows = write_chunks(sorter.sorted_chunks(), output)
+        print(f"Sorted {rows:,} rows by {', '.join(sorter.keys)} into {output} ({sorter.spills} spill run(s), {sorter.spilled_bytes / 1e6:,.1f} MB)")
+    return rows
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Sort a pulled dataset larger than memory and write it as CSV or Parquet.")
+    parser.add_argument("source", help=".pkl, .csv, TinyDB .json or .parquet")
+    parser.add_argument("output", help=".csv or .parquet")
+    parser.add_argument("--by", nargs="+", default=["vehicle_id"], help="sort keys, e.g. vehicle_id trip_id timestamp (default vehicle_id)")
+    parser.add_argument("--memory", default="1GiB", help="memory budget for buffered rows (default 1GiB)")
+    parser.add_argument("--tmp-dir", help="directory for spill files (default the system temp dir)")
+    args = parser.parse_args(argv)
+    sort_convert(args.source, args.output, args.by, memory_budget=args.memory, tmp_dir=args.tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
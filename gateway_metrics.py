@@ -0,0 +1,350 @@
+import bisect
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import grpc
+
+from gateway_scheduler import rpc_name
+
+LATENCY_BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram (Prometheus style: per-bucket counts plus sum and count).
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS_S):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate by linear interpolation inside the bucket holding the q-th value.
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= rank:
+                lo = self.buckets[i - 1] if i > 0 else 0.0
+                hi = self.buckets[i] if i < len(self.buckets) else lo
+                return lo + (hi - lo) * (rank - seen) / c
+            seen += c
+        return self.buckets[-1]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class RpcMetrics:
+    def __init__(self):
+        self.latency = Histogram()  # unary round trip / stream duration
+        self.first_message = Histogram()  # streams: time to first message
+        self.calls = 0
+        self.active = 0
+        self.messages = 0
+        self.bytes = 0
+        self.stream_seconds = 0.0
+        self.retries = 0
+        self.status: Dict[str, int] = {}
+
+
+class GatewayMetrics:
+    """
+    In-process registry of per-RPC gateway metrics, filled by MetricsInterceptor.
+
+    snapshot() returns them as a dict; prometheus() in text exposition format;
+    serve(port) exposes both on a local HTTP endpoint (/metrics, /metrics.json).
+    Auth refreshes come from AccessTokenInterceptor's on_refresh hook and stream
+    retries from paginate_processed_point with a client made with these metrics,
+    or from resumable_stream(on_retry=metrics.retry_hook(rpc)).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rpcs: Dict[str, RpcMetrics] = {}
+        self.auth_refreshes = 0
+        self.started_at = time.time()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def _rpc(self, rpc: str) -> RpcMetrics:
+        metrics = self.rpcs.get(rpc)
+        if metrics is None:
+            metrics = self.rpcs[rpc] = RpcMetrics()
+        return metrics
+
+    def call_started(self, rpc: str):
+        with self._lock:
+            m = self._rpc(rpc)
+            m.calls += 1
+            m.active += 1
+
+    def call_finished(self, rpc: str, code: grpc.StatusCode, duration_s: float, *, messages: int = 0, bytes: int = 0, streaming: bool = False):
+        with self._lock:
+            m = self._rpc(rpc)
+            m.active -= 1
+            m.latency.observe(duration_s)
+            m.status[code.name] = m.status.get(code.name, 0) + 1
+            m.messages += messages
+            m.bytes += bytes
+            if streaming:
+                m.stream_seconds += duration_s
+
+    def stream_traffic(self, rpc: str, *, messages: int = 0, bytes: int = 0):
+        """
+        Messages read from a stream after its call was already recorded as finished.
+        """
+        with self._lock:
+            m = self._rpc(rpc)
+            m.messages += messages
+            m.bytes += bytes
+
+    def first_message(self, rpc: str, delay_s: float):
+        with self._lock:
+            self._rpc(rpc).first_message.observe(delay_s)
+
+    def record_retry(self, rpc: str):
+        with self._lock:
+            self._rpc(rpc).retries += 1
+
+    def retry_hook(self, rpc: str) -> Callable[[Any], None]:
+        return lambda code=None: self.record_retry(rpc)
+
+    def record_auth_refresh(self):
+        with self._lock:
+            self.auth_refreshes += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            rpcs = {}
+            for rpc, m in self.rpcs.items():
+                rpcs[rpc] = {
+                    "calls": m.calls,
+                    "active": m.active,
+                    "status": dict(m.status),
+                    "latency_s": m.latency.summary(),
+                    "first_message_s": m.first_message.summary(),
+                    "messages": m.messages,
+                    "messages_per_s": m.messages / m.stream_seconds if m.stream_seconds > 0 else None,
+                    "bytes": m.bytes,
+                    "retries": m.retries,
+                }
+            return {"uptime_s": time.time() - self.started_at, "auth_refreshes": self.auth_refreshes, "rpcs": rpcs}
+
+    def prometheus(self) -> str:
+        out = []
+
+        def header(name, kind, help_text):
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+
+        def histogram(name, help_text, attr):
+            header(name, "histogram", help_text)
+            for rpc, m in self.rpcs.items():
+                h = getattr(m, attr)
+                cumulative = 0
+                for bound, count in zip(h.buckets + (float("inf"),), h.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    out.append(f'{name}_bucket{{rpc="{_label(rpc)}",le="{le}"}} {cumulative}')
+                out.append(f'{name}_sum{{rpc="{_label(rpc)}"}} {h.sum}')
+                out.append(f'{name}_count{{rpc="{_label(rpc)}"}} {h.count}')
+
+        def counter(name, help_text, attr, kind="counter"):
+            header(name, kind, help_text)
+            for rpc, m in self.rpcs.items():
+                out.append(f'{name}{{rpc="{_label(rpc)}"}} {getattr(m, attr)}')
+
+        with self._lock:
+            histogram("compass_rpc_duration_seconds", "Unary round trip or stream lifetime.", "latency")
+            histogram("compass_rpc_first_message_seconds", "Time to first stream message.", "first_message")
+            counter("compass_rpc_messages_total", "Stream messages received.", "messages")
+            counter("compass_rpc_response_bytes_total", "Serialized response bytes received.", "bytes")
+            counter("compass_rpc_stream_seconds_total", "Total time streams were open.", "stream_seconds")
+            counter("compass_rpc_retries_total", "Stream reconnects.", "retries")
+            counter("compass_rpc_active", "Calls in flight.", "active", kind="gauge")
+            header("compass_rpc_status_total", "counter", "Finished calls by status code.")
+            for rpc, m in self.rpcs.items():
+                for code, count in m.status.items():
+                    out.append(f'compass_rpc_status_total{{rpc="{_label(rpc)}",code="{code}"}} {count}')
+            header("compass_auth_refreshes_total", "counter", "Access token refreshes.")
+            out.append(f"compass_auth_refreshes_total {self.auth_refreshes}")
+        return "\n".join(out) + "\n"
+
+    def serve(self, port: int = 9464, host: str = "127.0.0.1") -> Tuple[str, int]:
+        """
+        Serve /metrics (Prometheus text) and /metrics.json from a daemon thread.
+        Returns the bound (host, port); pass port=0 for any free port.
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, kind = metrics.prometheus().encode(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, kind = json.dumps(metrics.snapshot()).encode(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", kind)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="gateway-metrics", daemon=True).start()
+        return self._server.server_address[:2]
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+
+
+def _label(value: str) -> str:
+    """
+    Prometheus label value escaping (backslash, double quote, newline).
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _code(error) -> grpc.StatusCode:
+    code = getattr(error, "code", None)
+    return (code() if callable(code) else None) or grpc.StatusCode.UNKNOWN
+
+
+def _size(message) -> int:
+    if isinstance(message, (bytes, bytearray)):  # raw (undecoded) responses
+        return len(message)
+    size = getattr(message, "ByteSize", None)
+    return size() if size is not None else 0
+
+
+class _MeteredStream:
+    """
+    Wraps a streaming call to count messages and bytes; everything else
+    (cancel, code, add_done_callback, ...) goes to the wrapped call.
+
+    The call is recorded as finished from its done callback, so a consumer that
+    stops iterating early (break, dropped reference) doesn't leave it counted as
+    active. Messages still read after that are added separately.
+    """
+
+    def __init__(self, call, metrics: GatewayMetrics, rpc: str, started: float):
+        self._call = call
+        self._metrics = metrics
+        self._rpc = rpc
+        self._started = started
+        self._messages = 0
+        self._bytes = 0
+        self._reported = (0, 0)
+        self._finished = False
+        self._lock = threading.Lock()
+        add_done_callback = getattr(call, "add_done_callback", None)
+        if add_done_callback is not None:
+            add_done_callback(lambda c: self._finish(_code(c)))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            message = next(self._call)
+        except StopIteration:
+            self._finish(grpc.StatusCode.OK)
+            raise
+        except grpc.RpcError as error:
+            self._finish(_code(error))
+            raise
+        if self._messages == 0:
+            self._metrics.first_message(self._rpc, time.perf_counter() - self._started)
+        self._messages += 1
+        self._bytes += _size(message)
+        return message
+
+    def _finish(self, code: grpc.StatusCode):
+        with self._lock:
+            messages, bytes = self._messages - self._reported[0], self._bytes - self._reported[1]
+            self._reported = (self._messages, self._bytes)
+            if self._finished:
+                if messages or bytes:
+                    self._metrics.stream_traffic(self._rpc, messages=messages, bytes=bytes)
+                return
+            self._finished = True
+            self._metrics.call_finished(
+                self._rpc, code, time.perf_counter() - self._started,
+                messages=messages, bytes=bytes, streaming=True,
+            )
+
+    def cancel(self):
+        self._finish(grpc.StatusCode.CANCELLED)
+        return self._call.cancel()
+
+    def __getattr__(self, name):
+        return getattr(self._call, name)
+
+
+class MetricsInterceptor(grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor):
+    """
+    Records every call on a channel into a GatewayMetrics registry.
+    """
+
+    def __init__(self, metrics: GatewayMetrics):
+        self.metrics = metrics
+
+    def intercept_unary_unary(self, continuation, call_details, request):
+        rpc = rpc_name(call_details)
+        self.metrics.call_started(rpc)
+        started = time.perf_counter()
+        try:
+            future = continuation(call_details, request)
+        except grpc.RpcError as error:
+            self.metrics.call_finished(rpc, _code(error), time.perf_counter() - started)
+            raise
+
+        def done(f):
+            error = f.exception()
+            if error is None:
+                self.metrics.call_finished(rpc, grpc.StatusCode.OK, time.perf_counter() - started, bytes=_size(f.result()))
+            else:
+                self.metrics.call_finished(rpc, _code(error), time.perf_counter() - started)
+
+        if future.done():
+            done(future)
+        else:
+            future.add_done_callback(done)
+        return future
+
+    def intercept_unary_stream(self, continuation, call_details, request):
+        rpc = rpc_name(call_details)
+        self.metrics.call_started(rpc)
+        started = time.perf_counter()
+        try:
+            call = continuation(call_details, request)
+        except grpc.RpcError as error:
+            self.metrics.call_finished(rpc, _code(error), time.perf_counter() - started, streaming=True)
+            raise
+        return _MeteredStream(call, self.metrics, rpc, started)
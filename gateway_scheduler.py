@@ -0,0 +1,345 @@
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import grpc
+
+# Lower value = served first
+PRIORITY_REALTIME = 0
+PRIORITY_INTERACTIVE = 1
+PRIORITY_BULK = 2
+
+# Historical pulls that can run for minutes and are happy to wait their turn
+BULK_RPCS = {
+    "ProcessedPointByGeometry",
+    "ProcessedPointByGeometryFileExport",
+    "TrajectoryByPath",
+}
+
+
+def rpc_name(call_details) -> str:
+    return call_details.method.split("/")[-1]
+
+
+def default_priority(rpc: str) -> int:
+    if rpc.startswith("Realtime"):
+        return PRIORITY_REALTIME
+    if rpc in BULK_RPCS:
+        return PRIORITY_BULK
+    return PRIORITY_INTERACTIVE
+
+
+class TokenBucket:
+    """
+    Token bucket whose rate adapts AIMD-style: halved on every 429 (plus a jittered
+    cooldown), raised by increase_fraction * max_rate on every success.
+    """
+
+    def __init__(self, rate: float, burst: float, *, min_rate: float = 0.05, increase_fraction: float = 0.05):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = min(min_rate, self.max_rate)
+        self.burst = float(burst)
+        self.increase = increase_fraction * self.max_rate
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.cooldown_until = 0.0
+        self.strikes = 0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        self._refill(now)
+        if now < self.cooldown_until:
+            return self.cooldown_until - now
+        if self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1.0
+
+    def throttled(self, now: float, cooldown: float):
+        self._refill(now)
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = min(self.tokens, 0.0)
+        self.cooldown_until = max(self.cooldown_until, now + cooldown)
+        self.strikes += 1
+
+    def succeeded(self):
+        self.rate = min(self.max_rate, self.rate + self.increase)
+        self.strikes = 0
+
+
+class GatewayScheduler:
+    """
+    Process-wide admission control for gateway calls.
+
+    - Every RPC type has a token bucket (rates overrides default_rate, in calls/s);
+      opening a stream costs a token just like a unary call.
+    - At most max_streams streams are open at once, reserved_realtime_streams of
+      which only realtime RPCs may use.
+    - Waiters are served in (priority, arrival) order per bucket and for stream
+      slots, so realtime work goes ahead of interactive calls, which go ahead of
+      bulk historical pulls.
+    - A RESOURCE_EXHAUSTED (HTTP 429) halves that RPC's rate and starts a jittered
+      cooldown that grows with consecutive 429s. Because the server limits are per
+      account, the cooldown also pauses every non-realtime call; successes bring
+      the rate back up additively.
+
+    Calls are admitted through acquire()/release()/report(); SchedulerInterceptor
+    does that for every call made by create_gateway_client.
+    """
+
+    def __init__(
+        self,
+        *,
+        default_rate: float = 5.0,
+        burst: float = 5.0,
+        rates: Optional[Dict[str, float]] = None,
+        max_streams: int = 8,
+        reserved_realtime_streams: int = 2,
+        priorities: Optional[Dict[str, int]] = None,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+    ):
+        if reserved_realtime_streams >= max_streams:
+            raise ValueError("reserved_realtime_streams must be smaller than max_streams")
+        self.default_rate = default_rate
+        self.burst = burst
+        self.rates = dict(rates or {})
+        self.max_streams = max_streams
+        self.reserved_realtime_streams = reserved_realtime_streams
+        self.priorities = dict(priorities or {})
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._rpc_waiters: Dict[str, List[tuple]] = {}
+        self._stream_waiters: List[tuple] = []
+        self._pause_until = 0.0
+        self.active_streams = 0
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def priority(self, rpc: str) -> int:
+        return self.priorities.get(rpc, default_priority(rpc))
+
+    def _bucket(self, rpc: str) -> TokenBucket:
+        bucket = self._buckets.get(rpc)
+        if bucket is None:
+            rate = self.rates.get(rpc, self.default_rate)
+            bucket = self._buckets[rpc] = TokenBucket(rate, min(self.burst, max(1.0, rate)))
+            self._rpc_waiters[rpc] = []
+            self._stats[rpc] = {"calls": 0, "throttled": 0, "errors": 0, "wait_s": 0.0}
+        return bucket
+
+    def _stream_slots(self, priority: int) -> int:
+        limit = self.max_streams if priority == PRIORITY_REALTIME else self.max_streams - self.reserved_realtime_streams
+        return limit - self.active_streams
+
+    def acquire(self, rpc: str, *, stream: bool = False, priority: Optional[int] = None):
+        """
+        Block until the call may start. A stream keeps its slot until release().
+        """
+        if priority is None:
+            priority = self.priority(rpc)
+        entry = (priority, next(self._seq))
+        started = time.monotonic()
+        with self._cond:
+            bucket = self._bucket(rpc)
+            heapq.heappush(self._rpc_waiters[rpc], entry)
+            if stream:
+                heapq.heappush(self._stream_waiters, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = bucket.wait_time(now)
+                    if priority != PRIORITY_REALTIME:
+                        wait = max(wait, self._pause_until - now)
+                    first = self._rpc_waiters[rpc][0] == entry
+                    if stream:
+                        first = first and self._stream_waiters[0] == entry and self._stream_slots(priority) > 0
+                    if first and wait <= 0:
+                        bucket.take()
+                        if stream:
+                            self.active_streams += 1
+                        break
+                    # Woken early by release()/report(), or when the bucket has refilled
+                    self._cond.wait(wait if first and wait > 0 else None)
+            finally:
+                self._rpc_waiters[rpc].remove(entry)
+                heapq.heapify(self._rpc_waiters[rpc])
+                if stream:
+                    self._stream_waiters.remove(entry)
+                    heapq.heapify(self._stream_waiters)
+                self._cond.notify_all()
+            self._stats[rpc]["calls"] += 1
+            self._stats[rpc]["wait_s"] += time.monotonic() - started
+
+    def release(self):
+        """
+        Give back a stream slot taken by acquire(stream=True).
+        """
+        with self._cond:
+            self.active_streams -= 1
+            self._cond.notify_all()
+
+    def report(self, rpc: str, code: Optional[grpc.StatusCode]):
+        """
+        Feed back the outcome of a call (None or OK for success).
+        """
+        with self._cond:
+            bucket = self._bucket(rpc)
+            if code is grpc.StatusCode.RESOURCE_EXHAUSTED:
+                now = time.monotonic()
+                cooldown = random.uniform(0.0, min(self.backoff_max, self.backoff_base * (2 ** bucket.strikes)))
+                bucket.throttled(now, cooldown)
+                self._pause_until = max(self._pause_until, now + cooldown)
+                self._stats[rpc]["throttled"] += 1
+            elif code in (None, grpc.StatusCode.OK, grpc.StatusCode.DEADLINE_EXCEEDED):
+                bucket.succeeded()
+            else:
+                self._stats[rpc]["errors"] += 1
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "active_streams": self.active_streams,
+                "waiting_streams": len(self._stream_waiters),
+                "rpcs": {
+                    rpc: dict(stats, rate=self._buckets[rpc].rate, waiting=len(self._rpc_waiters[rpc]))
+                    for rpc, stats in self._stats.items()
+                },
+            }
+
+    @classmethod
+    def from_env(cls, environ=os.environ) -> "GatewayScheduler":
+        """
+        Scheduler with the limits set by COMPASS_RATE (calls/s per RPC),
+        COMPASS_RATES (per-RPC overrides, e.g. "RoadMatchPath=10,AggregateByPath=2")
+        and COMPASS_MAX_STREAMS; unset ones keep the constructor defaults.
+        """
+        kwargs: Dict[str, Any] = {}
+        if environ.get("COMPASS_RATE"):
+            kwargs["default_rate"] = float(environ["COMPASS_RATE"])
+            kwargs["burst"] = max(1.0, kwargs["default_rate"])
+        if environ.get("COMPASS_RATES"):
+            pairs = (item.split("=", 1) for item in environ["COMPASS_RATES"].split(",") if item.strip())
+            kwargs["rates"] = {rpc.strip(): float(rate) for rpc, rate in pairs}
+        if environ.get("COMPASS_MAX_STREAMS"):
+            kwargs["max_streams"] = int(environ["COMPASS_MAX_STREAMS"])
+            kwargs["reserved_realtime_streams"] = min(2, kwargs["max_streams"] - 1)
+        return cls(**kwargs)
+
+    def share(self, n: int) -> "GatewayScheduler":
+        """
+        A fresh scheduler with 1/n of these limits, for each of n processes calling
+        the gateway at once (a scheduler only coordinates its own process, while
+        the server limits are per account). Streams are split as well, keeping
+        the realtime reservation only where it still fits.
+        """
+        n = max(1, int(n))
+        max_streams = max(1, self.max_streams // n)
+        return GatewayScheduler(
+            default_rate=self.default_rate / n,
+            burst=max(1.0, self.burst / n),
+            rates={rpc: rate / n for rpc, rate in self.rates.items()},
+            max_streams=max_streams,
+            reserved_realtime_streams=min(self.reserved_realtime_streams // n, max_streams - 1),
+            priorities=self.priorities,
+            backoff_base=self.backoff_base,
+            backoff_max=self.backoff_max,
+        )
+
+
+def _error_code(error: BaseException) -> Optional[grpc.StatusCode]:
+    code = getattr(error, "code", None)
+    return code() if callable(code) else None
+
+
+class SchedulerInterceptor(grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor):
+    """
+    Admits every call on a channel through a GatewayScheduler. Sits between
+    AccessTokenInterceptor and UnaryRestInterceptor.
+
+    A stream's slot is released when the call terminates (completed, failed,
+    cancelled or garbage collected); cancel() a stream you stop reading early to
+    free its slot straight away.
+
+    Unary calls for which skip(rpc, request) is true (e.g. response cache hits)
+    are passed straight through.
+    """
+
+    def __init__(self, scheduler: GatewayScheduler, *, skip: Optional[Callable[[str, Any], bool]] = None):
+        self.scheduler = scheduler
+        self.skip = skip
+
+    def intercept_unary_unary(self, continuation, call_details, request):
+        rpc = rpc_name(call_details)
+        if self.skip is not None and self.skip(rpc, request):
+            return continuation(call_details, request)
+        self.scheduler.acquire(rpc)
+        try:
+            future = continuation(call_details, request)
+        except grpc.RpcError as error:
+            self.scheduler.report(rpc, _error_code(error))
+            raise
+        if future.done():
+            self._report_future(rpc, future)
+        else:
+            future.add_done_callback(lambda f: self._report_future(rpc, f))
+        return future
+
+    def _report_future(self, rpc: str, future):
+        error = future.exception()
+        self.scheduler.report(rpc, None if error is None else _error_code(error))
+
+    def intercept_unary_stream(self, continuation, call_details, request):
+        rpc = rpc_name(call_details)
+        self.scheduler.acquire(rpc, stream=True)
+        try:
+            call = continuation(call_details, request)
+        except BaseException:
+            self.scheduler.release()
+            raise
+        call.add_done_callback(lambda c: self._stream_done(rpc, c))
+        return call
+
+    def _stream_done(self, rpc: str, call):
+        self.scheduler.release()
+        self.scheduler.report(rpc, call.code())
+
+
+_default_scheduler: Optional[GatewayScheduler] = None
+_default_lock = threading.Lock()
+
+
+def default_scheduler() -> GatewayScheduler:
+    """
+    The scheduler shared by every create_gateway_client() in this process, with
+    the limits from the environment (see GatewayScheduler.from_env).
+    """
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            _default_scheduler = GatewayScheduler.from_env()
+        return _default_scheduler
+
+
+def set_default_scheduler(scheduler: GatewayScheduler):
+    """
+    Replace the process-wide scheduler (before creating clients), e.g. with
+    GatewayScheduler.from_env().share(n) in each of n worker processes.
+    """
+    global _default_scheduler
+    with _default_lock:
+        _default_scheduler = scheduler
@@ -0,0 +1,178 @@
+import pickle
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from corridor_clip import CorridorIndex
+
+# IRI histogram edges (m/km); the last bin also holds everything above 20
+IRI_BIN_EDGES = np.append(np.arange(0.0, 20.0, 0.25), np.inf)
+# acceleration_x/y are in m/s^2; harsh_accel_g is in g
+STANDARD_GRAVITY = 9.80665
+
+COUNT_COLUMNS = ["points", "passes", "near_miss_events", "harsh_accel_points", "iri_points", "iri_sum"]
+
+
+class HotspotTable:
+    """
+    Incrementally updatable near-miss / IRI / harsh-acceleration hotspot table.
+
+    Keeps additive state (point and pass counts, near-miss event counts, IRI
+    histograms) per osm_way_id and, when a corridor is given, per fixed-length
+    corridor sub-segment. Each monthly pull is folded in once with update(); the
+    source name is remembered so re-running a refresh skips pulls already counted.
+    A point is a harsh acceleration when its horizontal acceleration (the m/s^2
+    acceleration_x/y, converted to g) is at least harsh_accel_g.
+
+    Example:
+      table = HotspotTable.load("hotspots_D4.pkl", corridor=wkt)
+      table.update(pd.read_csv("September_2025_SB_D4_OHGO_TEST.csv"), source="September_2025_SB_D4_OHGO_TEST.csv")
+      table.save("hotspots_D4.pkl")
+      print(table.table("osm_way_id").head(20))
+    """
+
+    def __init__(
+        self,
+        *,
+        corridor=None,
+        segment_length_m: float = 100.0,
+        buffer_m: float = 25.0,
+        harsh_accel_g: float = 0.3,
+    ):
+        self.corridor_wkt = None
+        self.index = None
+        self.buffer_m = float(buffer_m)
+        self.cell_size_m = None
+        if corridor is not None:
+            self.index = corridor if isinstance(corridor, CorridorIndex) else CorridorIndex(corridor, buffer_m=buffer_m)
+            self.corridor_wkt = corridor if isinstance(corridor, str) else None
+            # kept so the index rebuilt on load clips exactly like this one
+            self.buffer_m, self.cell_size_m = self.index.buffer_m, self.index.cell_size_m
+        self.segment_length_m = float(segment_length_m)
+        self.harsh_accel_g = float(harsh_accel_g)
+        self.sources = set()
+        self.counts = {}      # level -> DataFrame indexed by key, COUNT_COLUMNS
+        self.iri_hist = {}    # level -> DataFrame indexed by key, one column per IRI bin
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "HotspotTable":
+        """
+        Load saved state, or start an empty table (with kwargs) if path doesn't exist.
+        """
+        if not Path(path).exists():
+            return cls(**kwargs)
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            pickle.dump(self, f)
+
+    def __getstate__(self):
+        # The grid index is rebuilt from the WKT on load rather than pickled
+        state = self.__dict__.copy()
+        if self.corridor_wkt is not None:
+            state["index"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.index is None and self.corridor_wkt is not None:
+            kwargs = {"buffer_m": self.__dict__.get("buffer_m", 25.0)}
+            if self.__dict__.get("cell_size_m") is not None:
+                kwargs["cell_size_m"] = self.cell_size_m
+            self.index = CorridorIndex(self.corridor_wkt, **kwargs)
+
+    def update(self, df: pd.DataFrame, *, source: Optional[str] = None) -> bool:
+        """
+        Fold one pull into the table. Returns False (and does nothing) if source
+        has already been folded in.
+        """
+        if source is not None and source in self.sources:
+            return False
+
+        levels = {"osm_way_id": df["osm_way_id"].to_numpy()}
+        if self.index is not None:
+            _, chainage, _ = self.index.locate(df["road_matched_point_lat"].to_numpy(), df["road_matched_point_lon"].to_numpy())
+            segment = np.where(np.isfinite(chainage), chainage // self.segment_length_m, -1).astype(np.int64)
+            levels["segment"] = segment
+
+        for level, keys in levels.items():
+            frame = pd.DataFrame({
+                "key": keys,
+                "trip_id": df["trip_id"].to_numpy(),
+                "iri": df["iri"].to_numpy(dtype=np.float64),
+                "near_miss_type": df["near_miss_type"].to_numpy(),
+                "near_miss_time": df["near_miss_timestamp_seconds"].to_numpy(dtype=np.int64) * 1_000_000_000
+                + df["near_miss_timestamp_nanos"].to_numpy(dtype=np.int64),
+                "harsh": np.hypot(df["acceleration_x"].to_numpy(dtype=np.float64), df["acceleration_y"].to_numpy(dtype=np.float64))
+                >= self.harsh_accel_g * STANDARD_GRAVITY,
+            })
+            if level == "segment":
+                frame = frame.loc[frame["key"] >= 0]
+            counts, hist = self._summarize(frame)
+            self.counts[level] = _add(self.counts.get(level), counts)
+            self.iri_hist[level] = _add(self.iri_hist.get(level), hist)
+
+        if source is not None:
+            self.sources.add(source)
+        return True
+
+    @staticmethod
+    def _summarize(frame: pd.DataFrame):
+        g = frame.groupby("key", sort=False)
+        has_iri = frame["iri"] > 0
+        counts = pd.DataFrame({
+            "points": g.size(),
+            "passes": g["trip_id"].nunique(),
+            "harsh_accel_points": g["harsh"].sum(),
+            "iri_points": has_iri.groupby(frame["key"], sort=False).sum(),
+            "iri_sum": frame["iri"].where(has_iri, 0.0).groupby(frame["key"], sort=False).sum(),
+        })
+
+        # A near-miss event is repeated on every point of the trip that carries it
+        events = frame.loc[frame["near_miss_type"] != 0, ["key", "trip_id", "near_miss_time", "near_miss_type"]].drop_duplicates()
+        counts["near_miss_events"] = events.groupby("key").size()
+        counts["near_miss_events"] = counts["near_miss_events"].fillna(0).astype(np.int64)
+
+        iri = frame.loc[has_iri]
+        bins = np.searchsorted(IRI_BIN_EDGES, iri["iri"].to_numpy(), side="right") - 1
+        hist = pd.crosstab(iri["key"], bins).reindex(columns=range(len(IRI_BIN_EDGES) - 1), fill_value=0)
+        return counts[COUNT_COLUMNS], hist
+
+    def table(self, level: str = "osm_way_id", *, min_passes: int = 0) -> pd.DataFrame:
+        """
+        Hotspot table for one level ("osm_way_id" or "segment"), sorted by near-miss
+        rate per 1,000 passes. IRI percentiles come from the merged histogram, so they
+        are accurate to the 0.25 m/km bin width.
+        """
+        if level not in self.counts:
+            raise ValueError(f"No data for level '{level}'")
+
+        out = self.counts[level].copy()
+        out = out.loc[out["passes"] >= min_passes]
+        out["near_miss_per_1000_passes"] = out["near_miss_events"] / out["passes"] * 1000
+        out["harsh_accel_per_1000_passes"] = out["harsh_accel_points"] / out["passes"] * 1000
+        out["iri_mean"] = out["iri_sum"] / out["iri_points"].where(out["iri_points"] > 0)
+
+        hist = self.iri_hist[level].reindex(out.index, fill_value=0).to_numpy(dtype=np.float64)
+        cum = np.cumsum(hist, axis=1)
+        total = cum[:, -1:]
+        for q in (0.5, 0.9):
+            idx = np.argmax(cum >= q * np.maximum(total, 1), axis=1)
+            value = IRI_BIN_EDGES[idx] + 0.125
+            out[f"iri_p{int(q * 100)}"] = np.where(total[:, 0] > 0, value, np.nan)
+
+        if level == "segment":
+            out["segment_start_m"] = out.index.to_numpy() * self.segment_length_m
+
+        out.index.name = level
+        return out.sort_values("near_miss_per_1000_passes", ascending=False).reset_index()
+
+
+def _add(a: Optional[pd.DataFrame], b: pd.DataFrame) -> pd.DataFrame:
+    if a is None:
+        return b
+    return a.add(b, fill_value=0)
@@ -37,7 +37,8 @@ def ImportDataSet(conn,
                 csvfile: str,
                 linestring: str,
                 district: int,
-                source: str):
+                source: str,
+                report_prefix: str = None):
 
     if metadata_filename_exists(conn, csvfile):
         raise ValueError(f"Metadata for filename '{csvfile}' already exists")
@@ -52,21 +53,25 @@ def ImportDataSet(conn,
     )
 
     print(f"Metadata ID: {metadata_id}")
-    res = import_csv(conn,csv_path=csvfile,metadata_id=metadata_id)
-    print(res)
-    res = verify_csv_uploaded(conn, csvfile, table_name="vehicle_telemetry")
+    res = import_csv(conn,csv_path=csvfile,metadata_id=metadata_id,report_prefix=report_prefix)
     print(res)
+    verify = verify_csv_uploaded(conn, csvfile, table_name="vehicle_telemetry")
+    print(verify)
+    return {"metadata_id": metadata_id, "import": res, "verify": verify}
 
 
-conn = get_db_connection()
-ImportDataSet(conn,
-                csvfile="July_2025_SB_D7_OHGO_TEST.csv",
-                linestring=load_linestring_from_textfile("D7_OHGO.txt"),
-                district=7,
-                source="LS from OHGO")
+if __name__ == "__main__":
+    conn = get_db_connection()
+    ImportDataSet(conn,
+                    csvfile="July_2025_SB_D7_OHGO_TEST.csv",
+                    linestring=load_linestring_from_textfile("D7_OHGO.txt"),
+                    district=7,
+                    source="LS from OHGO",
+                    report_prefix="July_2025_SB_D7_OHGO_TEST.import_metrics")
 
-ImportDataSet(conn,
-                csvfile="July_2025_SB_D4_OHGO_TEST.csv",
-                linestring=load_linestring_from_textfile("D4_OHGO.txt"),
-                district=4,
-                source="LS from OHGO")
\ No newline at end of file
+    ImportDataSet(conn,
+                    csvfile="July_2025_SB_D4_OHGO_TEST.csv",
+                    linestring=load_linestring_from_textfile("D4_OHGO.txt"),
+                    district=4,
+                    source="LS from OHGO",
+                    report_prefix="July_2025_SB_D4_OHGO_TEST.import_metrics")
\ No newline at end of file
@@ -0,0 +1,430 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from client import backoff_delay
+
+DEFAULT_LIMITS = {"pull": 4, "import": 1}
+DEFAULT_RETRIES = {"pull": 2, "import": 1}
+_gateway_shares: Optional[int] = None  # share of the gateway limits this worker process was given
+
+EXAMPLE_JOB = """
+# python job_runner.py august_2025.toml
+[defaults]
+output_dir = "."
+output = "{date_range}_{corridor}"       # file prefix of each pull (.csv/.pkl)
+manifest = "pull_manifest.sqlite"       # incremental pulls; remove to always pull everything
+# memory_budget = "2GiB"                # per pull; spill to disk past it and write CSV only
+# sort_by = ["vehicle_id", "timestamp"] # order of budgeted pulls' rows (default stream order)
+
+[stages.pull]
+workers = 4                             # concurrent pulls (network bound), sharing the gateway limits
+retries = 2
+[stages.import]
+workers = 1                             # concurrent imports (DB bound)
+retries = 1
+
+[[corridors]]
+name = "D4_OHGO"
+linestring_file = "D4_OHGO.txt"
+district = 4
+source = "LS from OHGO"
+
+[[date_ranges]]
+name = "August_2025"
+start = 2025-08-01
+end = 2025-08-31
+# hours = [7, 8, 9]                     # default all 24
+# days_of_week = ["MONDAY", "TUESDAY"]
+# exclude = [2025-08-15]
+
+[[destinations]]
+name = "mariadb"
+config = "db_config.ini"                # see import_to_db.get_db_connection
+
+# [[destinations]]
+# name = "lake"
+# type = "parquet"                      # partitioned dataset, see telemetry_dataset.read_dataset
+# root = "telemetry"
+"""
+
+
+def load_job(path: str) -> Dict[str, Any]:
+    """
+    Read a job file: TOML, or YAML (.yaml/.yml, needs PyYAML) with the same keys.
+    """
+    if path.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError as error:
+            raise ImportError("YAML job files need PyYAML (pip install pyyaml); TOML works without it") from error
+        with open(path, encoding="utf-8") as f:
+            return yaml.safe_load(f) or {}
+    try:
+        import tomllib
+    except ImportError:  # Python < 3.11
+        import tomli as tomllib
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+def _as_date(value) -> date:
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+
+def build_date_range(spec: Dict[str, Any]):
+    """
+    time.DateTimeRange from a [[date_ranges]] entry.
+    """
+    import compassiot.compass.v1.time_pb2 as time_pb2
+
+    def local(value):
+        d = _as_date(value)
+        return time_pb2.LocalDate(year=d.year, month=d.month, day=d.day)
+
+    return time_pb2.DateTimeRange(
+        start=local(spec["start"]),
+        end=local(spec["end"]),
+        hour_of_day=list(spec.get("hours", range(24))),
+        day_of_week=[time_pb2.DayOfWeek.Value(day.upper()) for day in spec.get("days_of_week", [])],
+        exclude_date=[local(d) for d in spec.get("exclude", [])],
+    )
+
+
+def run_pull(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pull task (runs in a worker process): store_datapull of one corridor x date range.
+    When stage_workers (set by JobRunner) pulls run at once, each worker
+    process's gateway scheduler gets 1/stage_workers of the default limits, so
+    together they stay within the account's.
+    """
+    from gateway_scheduler import GatewayScheduler, set_default_scheduler
+    from linestring_to_earth import load_linestring_from_textfile
+    from processed_point_by_geometry import store_datapull
+    from pull_manifest import PullManifest
+
+    global _gateway_shares
+    shares = spec.get("stage_workers", 1)
+    if shares > 1 and _gateway_shares != shares:
+        # once per worker process, so 429 backoff state carries over between its pulls
+        set_default_scheduler(GatewayScheduler.from_env().share(shares))
+        _gateway_shares = shares
+
+    manifest = PullManifest(spec["manifest"]) if spec.get("manifest") else None
+    try:
+        linestring = load_linestring_from_textfile(spec["linestring_file"])
+        rows = store_datapull(
+            linestring, build_date_range(spec["date_range"]), spec["output"], manifest=manifest,
+            memory_budget=spec.get("memory_budget"), sort_by=spec.get("sort_by", ()),
+        )
+    finally:
+        if manifest is not None:
+            manifest.close()
+    return {"output": spec["output"], "rows": rows}
+
+
+def run_import(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Import task (runs in a worker process): ImportDataSet of one pulled CSV.
+
+    A CSV already registered in the metadata table was grown by an incremental
+    pull since: only the rows after those the manifest records as imported are
+    added, under the existing metadata_id, and an import with nothing new is
+    reported as skipped. Without a record the whole CSV is imported again, which
+    is safe because point_id is the primary key and rows go in with INSERT IGNORE.
+    """
+    from create_vehicle_telemetry_table import metadata_id_for_filename
+    from csv_import_lib import count_csv_rows, import_csv, verify_csv_uploaded
+    from import_to_db import ImportDataSet, get_db_connection
+    from linestring_to_earth import load_linestring_from_textfile
+    from pull_manifest import PullManifest
+
+    csvfile = f"{spec['output']}.csv"
+    destination = spec.get("config", "db_config.ini")
+    manifest = PullManifest(spec["manifest"]) if spec.get("manifest") else None
+    conn = get_db_connection(destination)
+    try:
+        metadata_id = metadata_id_for_filename(conn, csvfile)
+        if metadata_id is None:
+            done = 0
+            result = ImportDataSet(
+                conn,
+                csvfile=csvfile,
+                linestring=load_linestring_from_textfile(spec["linestring_file"]),
+                district=spec.get("district", 0),
+                source=spec.get("source", ""),
+            )
+            metadata_id, imported, verify = result["metadata_id"], result["import"], result["verify"]
+        else:
+            total = count_csv_rows(csvfile)
+            done = manifest.imported_rows(spec["output"], destination) if manifest is not None else None
+            if done == total:
+                return {"csv": csvfile, "skipped": "already imported"}
+            if done is None or done > total:  # no record, or the CSV was pulled again from scratch
+                done = 0
+            imported = import_csv(conn, csv_path=csvfile, metadata_id=metadata_id, skip_rows=done)
+            verify = verify_csv_uploaded(conn, csvfile, table_name="vehicle_telemetry")
+        if manifest is not None:
+            manifest.record_import(spec["output"], destination, done + imported["processed_rows"])
+    finally:
+        conn.close()
+        if manifest is not None:
+            manifest.close()
+    return {
+        "csv": csvfile,
+        "metadata_id": metadata_id,
+        "processed_rows": imported.get("processed_rows"),
+        "skipped_rows": done,
+        "verified": verify.get("ok"),
+    }
+
+
+def run_parquet_export(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Export task (runs in a worker process): one pulled .pkl into the partitioned
+    Parquet dataset of a destination with type = "parquet" (see telemetry_dataset).
+    Re-exporting a pull replaces its earlier files. Budgeted pulls (no .pkl) are
+    exported from their CSV in chunks.
+    """
+    import pandas as pd
+
+    from external_sort import iter_chunks
+    from telemetry_dataset import write_dataset
+
+    source = f"{spec['output']}.pkl"
+    if os.path.exists(source):
+        data = pd.read_pickle(source)
+    else:
+        source = f"{spec['output']}.csv"
+        data = iter_chunks(source)
+    rows = write_dataset(data, spec["root"], spec["corridor"], name=os.path.basename(spec["output"]))
+    return {"source": source, "root": spec["root"], "rows": rows}
+
+
+class Task:
+    def __init__(self, name: str, stage: str, fn: Callable[[Dict[str, Any]], Dict[str, Any]], spec: Dict[str, Any], deps: List[str] = ()):
+        self.name = name
+        self.stage = stage
+        self.fn = fn
+        self.spec = spec
+        self.deps = list(deps)
+        self.status = "pending"  # pending -> running -> ok | failed | skipped
+        self.attempts = 0
+        self.not_before = 0.0
+        self.started_at: Optional[float] = None
+        self.wall_s = 0.0
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+
+
+def plan_tasks(job: Dict[str, Any]) -> List[Task]:
+    """
+    One pull per corridor x date range, and one import per pull x destination
+    that depends on it (a database import, or a Parquet export for type = "parquet").
+    """
+    defaults = job.get("defaults", {})
+    template = defaults.get("output", "{date_range}_{corridor}")
+    output_dir = defaults.get("output_dir", ".")
+    tasks = []
+    for corridor in job.get("corridors", []):
+        for date_range in job.get("date_ranges", []):
+            key = f"{date_range['name']}/{corridor['name']}"
+            output = os.path.join(output_dir, template.format(date_range=date_range["name"], corridor=corridor["name"]))
+            pull = Task(f"pull:{key}", "pull", run_pull, {
+                "linestring_file": corridor["linestring_file"],
+                "date_range": date_range,
+                "output": output,
+                "manifest": defaults.get("manifest"),
+                "memory_budget": defaults.get("memory_budget"),
+                "sort_by": defaults.get("sort_by", []),
+            })
+            tasks.append(pull)
+            for destination in job.get("destinations", []):
+                if destination.get("type") == "parquet":
+                    tasks.append(Task(f"import:{key}->{destination['name']}", "import", run_parquet_export, {
+                        "output": output,
+                        "root": destination["root"],
+                        "corridor": corridor["name"],
+                    }, deps=[pull.name]))
+                    continue
+                tasks.append(Task(f"import:{key}->{destination['name']}", "import", run_import, {
+                    "output": output,
+                    "linestring_file": corridor["linestring_file"],
+                    "district": corridor.get("district", 0),
+                    "source": corridor.get("source", ""),
+                    "config": destination.get("config", "db_config.ini"),
+                    "manifest": defaults.get("manifest"),
+                }, deps=[pull.name]))
+    return tasks
+
+
+class JobRunner:
+    """
+    Runs tasks as a DAG on a process pool: a task starts once its dependencies
+    succeeded, with at most limits[stage] tasks of a stage running at a time, so
+    network-bound pulls overlap with DB-bound imports. Failed tasks are retried
+    up to retries[stage] times with backoff; dependents of a task that finally
+    failed are skipped. run() returns the consolidated report.
+
+    Workers are started with "spawn" so no gRPC or DB state is inherited. Every
+    task's spec gets stage_workers = limits[stage]; run_pull uses it to split
+    the gateway rate limits and stream slots between the pull processes, since
+    each process has its own default_scheduler().
+    """
+
+    def __init__(self, tasks: List[Task], limits: Optional[Dict[str, int]] = None, retries: Optional[Dict[str, int]] = None, backoff_base: float = 5.0):
+        self.tasks = {task.name: task for task in tasks}
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self.retries = dict(DEFAULT_RETRIES, **(retries or {}))
+        self.backoff_base = backoff_base
+        missing = {dep for task in tasks for dep in task.deps if dep not in self.tasks}
+        if missing:
+            raise ValueError(f"Unknown dependencies: {sorted(missing)}")
+        if any(limit < 1 for limit in self.limits.values()):
+            raise ValueError(f"Stage limits must be at least 1: {self.limits}")
+
+    def _ready(self, task: Task, running: Dict[str, int], now: float) -> bool:
+        return (
+            task.status == "pending"
+            and task.not_before <= now
+            and running.get(task.stage, 0) < self.limits.get(task.stage, 1)
+            and all(self.tasks[dep].status in ("ok", "skipped") for dep in task.deps)
+        )
+
+    def _skip_dependents(self, failed: Task):
+        for task in self.tasks.values():
+            if task.status == "pending" and failed.name in task.deps:
+                task.status = "skipped"
+                task.error = f"{failed.name} {failed.status}"
+                self._skip_dependents(task)
+
+    def _start(self, task: Task, pool: ProcessPoolExecutor, running: Dict[str, int]):
+        task.status = "running"
+        task.attempts += 1
+        task.started_at = time.time()
+        running[task.stage] = running.get(task.stage, 0) + 1
+        print(f"[{time.strftime('%H:%M:%S')}] start {task.name} (attempt {task.attempts})", flush=True)
+        return pool.submit(task.fn, dict(task.spec, stage_workers=self.limits.get(task.stage, 1)))
+
+    def _finish(self, task: Task, future: Future, running: Dict[str, int]):
+        running[task.stage] -= 1
+        task.wall_s += time.time() - task.started_at
+        error = future.exception()
+        if error is None:
+            task.result = future.result()
+            task.status = "skipped" if task.result and task.result.get("skipped") else "ok"
+            task.error = None
+        else:
+            task.error = "".join(traceback.format_exception_only(type(error), error)).strip()
+            if task.attempts <= self.retries.get(task.stage, 0):
+                delay = backoff_delay(task.attempts, self.backoff_base)
+                task.status = "pending"
+                task.not_before = time.time() + delay
+                print(f"[{time.strftime('%H:%M:%S')}] {task.name} failed ({task.error}), retrying in {delay:.0f}s", flush=True)
+                return
+            task.status = "failed"
+            self._skip_dependents(task)
+        print(f"[{time.strftime('%H:%M:%S')}] {task.status} {task.name} ({task.wall_s:.1f}s)", flush=True)
+
+    def run(self, max_workers: Optional[int] = None) -> Dict[str, Any]:
+        started = time.time()
+        workers = max(max_workers or sum(self.limits.get(stage, 1) for stage in {t.stage for t in self.tasks.values()}), 1)
+        context = multiprocessing.get_context("spawn")
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        futures: Dict[Future, Tuple[Task, ProcessPoolExecutor]] = {}
+        running: Dict[str, int] = {}
+        try:
+            while True:
+                now = time.time()
+                for task in self.tasks.values():
+                    if self._ready(task, running, now):
+                        futures[self._start(task, pool, running)] = (task, pool)
+                pending = [t.not_before - now for t in self.tasks.values() if t.status == "pending"]
+                if not futures:
+                    if not pending:
+                        break
+                    time.sleep(max(min(pending), 0.05))
+                    continue
+                delays = [delay for delay in pending if delay > 0]
+                done, _ = wait(futures, timeout=min(delays) if delays else None, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task, task_pool = futures.pop(future)
+                    self._finish(task, future, running)
+                    if isinstance(future.exception(), BrokenProcessPool) and task_pool is pool:
+                        # a worker died: everything else on that pool fails the same way and is retried on a new one
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        finally:
+            pool.shutdown()
+        return self.report(time.time() - started)
+
+    def report(self, wall_s: float) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for task in self.tasks.values():
+            counts[task.status] = counts.get(task.status, 0) + 1
+        return {
+            "wall_s": wall_s,
+            "counts": counts,
+            "tasks": [
+                {
+                    "name": t.name, "stage": t.stage, "status": t.status, "attempts": t.attempts,
+                    "wall_s": t.wall_s, "result": t.result, "error": t.error,
+                }
+                for t in self.tasks.values()
+            ],
+        }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [f"{'task':<60}{'status':>9}{'tries':>7}{'wall s':>9}  detail"]
+    for t in report["tasks"]:
+        result = t["result"] or {}
+        detail = t["error"] or result.get("skipped") or ", ".join(f"{k}={v}" for k, v in result.items() if k in ("rows", "processed_rows", "metadata_id"))
+        lines.append(f"{t['name']:<60}{t['status']:>9}{t['attempts']:>7}{t['wall_s']:>9.1f}  {detail}")
+    counts = ", ".join(f"{n} {status}" for status, n in sorted(report["counts"].items()))
+    lines.append(f"{len(report['tasks'])} tasks in {report['wall_s']:.1f}s: {counts}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the pulls and imports described in a TOML/YAML job file.")
+    parser.add_argument("job", nargs="?", help="job file (.toml, .yaml)")
+    parser.add_argument("--report", help="JSON report path (default <job>.report.json)")
+    parser.add_argument("--dry-run", action="store_true", help="list the tasks without running them")
+    parser.add_argument("--example", action="store_true", help="print an example job file")
+    args = parser.parse_args(argv)
+    if args.example or not args.job:
+        print(EXAMPLE_JOB.strip())
+        return 0
+
+    job = load_job(args.job)
+    stages = job.get("stages", {})
+    tasks = plan_tasks(job)
+    if args.dry_run:
+        for task in tasks:
+            print(f"{task.name}" + (f"  <- {', '.join(task.deps)}" if task.deps else ""))
+        return 0
+    runner = JobRunner(
+        tasks,
+        limits={stage: conf["workers"] for stage, conf in stages.items() if "workers" in conf},
+        retries={stage: conf["retries"] for stage, conf in stages.items() if "retries" in conf},
+    )
+    report = runner.run()
+    print(format_report(report))
+    report_path = args.report or f"{os.path.splitext(args.job)[0]}.report.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(dict(report, job=args.job, finished_at=time.strftime("%Y-%m-%d %H:%M:%S")), f, indent=2, default=str)
+    print(f"Report written to {report_path}")
+    return 1 if report["counts"].get("failed") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+# Speed histogram bins (km/h); the last bin also holds everything above 200
+SPEED_BIN_WIDTH_KMH = 2.0
+SPEED_BINS = 100
+SPEED_BIN_CENTRES = (np.arange(SPEED_BINS) + 0.5) * SPEED_BIN_WIDTH_KMH
+
+
+def default_extract(name: str, response) -> Optional[Tuple[Hashable, float, float]]:
+    """
+    (segment_key, event_time_s, speed_kmh) from a realtime ProcessedPoint-style
+    message, keyed by osm_way_id. Return None to skip a message.
+    """
+    ts = response.timestamp
+    return response.osm_way_id, ts.seconds + ts.nanos * 1e-9, response.speed
+
+
+def _quantile_kmh(hist: np.ndarray, counts: np.ndarray, q: float) -> np.ndarray:
+    """
+    Per-row speed quantile (bin centre) of histograms with the given row counts.
+    """
+    cum = np.cumsum(hist, axis=1, dtype=np.int32)  # int32 accumulates about twice as fast as int64
+    return SPEED_BIN_CENTRES[np.argmax(cum >= q * np.maximum(counts, 1)[:, None], axis=1)]
+
+
+class LiveSpeedProcessor:
+    """
+    Per-segment sliding-window speed statistics over realtime points.
+
+    Every segment owns a ring of window_s / bucket_s time buckets, each holding a
+    fixed speed histogram, so memory is bounded by segments x buckets x bins no
+    matter how many points arrive. Adding a point is O(1); a bucket is cleared
+    when the ring wraps around to it. The histogram of the whole window is kept
+    up to date as well (buckets are subtracted when they fall out of it), so
+    evaluate() only scans segments x bins. The window end is the newest event time
+    seen (a watermark), so replayed data behaves like live data.
+
+    Congestion events are emitted through on_event when a segment's median speed
+    drops below congestion_kmh (with at least min_count points in the window), and
+    again when it recovers above congestion_kmh * recovery_factor.
+
+    Example:
+      proc = LiveSpeedProcessor(on_event=print, congestion_kmh=40)
+      hub.add_consumer(proc.hub_consumer, overflow="drop_oldest")
+    """
+
+    def __init__(
+        self,
+        *,
+        window_s: float = 300.0,
+        bucket_s: float = 10.0,
+        congestion_kmh: float = 40.0,
+        recovery_factor: float = 1.15,
+        min_count: int = 5,
+        segment_lengths_m: Optional[Dict[Hashable, float]] = None,
+        extract: Callable[[str, Any], Optional[Tuple[Hashable, float, float]]] = default_extract,
+        on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+        initial_segments: int = 1024,
+    ):
+        self.bucket_s = float(bucket_s)
+        self.n_buckets = max(1, int(round(window_s / bucket_s)))
+        self.window_s = self.n_buckets * self.bucket_s
+        self.congestion_kmh = congestion_kmh
+        self.recovery_kmh = congestion_kmh * recovery_factor
+        self.min_count = min_count
+        self.segment_lengths_m = segment_lengths_m or {}
+        self.extract = extract
+        self.on_event = on_event
+
+        self._index: Dict[Hashable, int] = {}
+        self._keys: List[Hashable] = []
+        self._hist = np.zeros((initial_segments, self.n_buckets, SPEED_BINS), dtype=np.int32)
+        self._epoch = np.full((initial_segments, self.n_buckets), -1, dtype=np.int64)
+        self._window = np.zeros((initial_segments, SPEED_BINS), dtype=np.int32)
+        self._congested = np.zeros(initial_segments, dtype=bool)
+        self.watermark_epoch = -1
+        self.points = 0
+        self.late_points = 0
+
+    def _segment(self, key: Hashable) -> int:
+        idx = self._index.get(key)
+        if idx is None:
+            idx = len(self._keys)
+            if idx == len(self._hist):
+                grow = len(self._hist)
+                self._hist = np.concatenate((self._hist, np.zeros_like(self._hist)))
+                self._epoch = np.concatenate((self._epoch, np.full((grow, self.n_buckets), -1, dtype=np.int64)))
+                self._window = np.concatenate((self._window, np.zeros_like(self._window)))
+                self._congested = np.concatenate((self._congested, np.zeros(grow, dtype=bool)))
+            self._index[key] = idx
+            self._keys.append(key)
+        return idx
+
+    def _advance(self, epoch: int):
+        """
+        Move the watermark to epoch, taking the buckets that leave the window out
+        of the window histogram.
+        """
+        old, self.watermark_epoch = self.watermark_epoch, epoch
+        n = len(self._keys)
+        if epoch - old >= self.n_buckets:
+            self._window[:n] = 0
+            return
+        for expired in range(old - self.n_buckets + 1, epoch - self.n_buckets + 1):
+            slot = expired % self.n_buckets
+            rows = np.flatnonzero(self._epoch[:n, slot] == expired)
+            if rows.size:
+                self._window[rows] -= self._hist[rows, slot]
+
+    def add(self, key: Hashable, event_time_s: float, speed_kmh: float):
+        """
+        Add one point. Points older than the window are counted as late and dropped.
+        """
+        epoch = int(event_time_s // self.bucket_s)
+        if epoch > self.watermark_epoch:
+            self._advance(epoch)
+        elif epoch <= self.watermark_epoch - self.n_buckets:
+            self.late_points += 1
+            return
+
+        seg = self._segment(key)
+        slot = epoch % self.n_buckets
+        if self._epoch[seg, slot] != epoch:
+            self._hist[seg, slot] = 0
+            self._epoch[seg, slot] = epoch
+        b = min(SPEED_BINS - 1, max(0, int(speed_kmh // SPEED_BIN_WIDTH_KMH)))
+        self._hist[seg, slot, b] += 1
+        self._window[seg, b] += 1
+        self.points += 1
+
+    def add_points(self, keys, event_times_s, speeds_kmh):
+        """
+        Vectorized add() for a batch of points.
+        """
+        keys = list(keys)
+        epochs = (np.asarray(event_times_s, dtype=np.float64) // self.bucket_s).astype(np.int64)
+        speeds = np.asarray(speeds_kmh, dtype=np.float64)
+        if len(epochs) == 0:
+            return
+        if epochs.max() > self.watermark_epoch:
+            self._advance(int(epochs.max()))
+        fresh = epochs > self.watermark_epoch - self.n_buckets
+        self.late_points += int((~fresh).sum())
+
+        segs = np.fromiter((self._segment(k) for k in keys), dtype=np.int64, count=len(keys))[fresh]
+        epochs = epochs[fresh]
+        slots = epochs % self.n_buckets
+        bins = np.clip((speeds[fresh] // SPEED_BIN_WIDTH_KMH).astype(np.int64), 0, SPEED_BINS - 1)
+
+        # Reset buckets that are being reused for a newer epoch (latest epoch per slot wins)
+        stale = self._epoch[segs, slots] < epochs
+        if stale.any():
+            s, sl, ep = segs[stale], slots[stale], epochs[stale]
+            self._hist[s, sl] = 0
+            np.maximum.at(self._epoch, (s, sl), ep)
+        current = self._epoch[segs, slots] == epochs
+        np.add.at(self._hist, (segs[current], slots[current], bins[current]), 1)
+        np.add.at(self._window, (segs[current], bins[current]), 1)
+        self.points += int(current.sum())
+
+    def _window_hist(self) -> np.ndarray:
+        return self._window[:len(self._keys)]
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """
+        Current window statistics for every segment with points in the window.
+        """
+        hist = self._window_hist()
+        counts = hist.sum(axis=1)
+        median = _quantile_kmh(hist, counts, 0.5)
+        p85 = _quantile_kmh(hist, counts, 0.85)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            space_mean = counts / (hist / SPEED_BIN_CENTRES).sum(axis=1)
+
+        window_end = (self.watermark_epoch + 1) * self.bucket_s
+        out = []
+        for i in np.flatnonzero(counts):
+            key = self._keys[i]
+            length = self.segment_lengths_m.get(key)
+            out.append({
+                "segment": key,
+                "count": int(counts[i]),
+                "median_kmh": float(median[i]),
+                "p85_kmh": float(p85[i]),
+                "space_mean_kmh": float(space_mean[i]),
+                "travel_time_s": float(length / (space_mean[i] / 3.6)) if length else None,
+                "congested": bool(self._congested[i]),
+                "window_end": window_end,
+            })
+        return out
+
+    def evaluate(self) -> List[Dict[str, Any]]:
+        """
+        Check congestion thresholds, emit change events through on_event and return them.
+        """
+        hist = self._window_hist()
+        counts = hist.sum(axis=1)
+        n = len(self._keys)
+        enough = counts >= self.min_count
+        was = self._congested[:n]
+        # only segments with enough points or currently congested can change state
+        candidates = np.flatnonzero(enough | was)
+        median = np.zeros(n)
+        median[candidates] = _quantile_kmh(hist[candidates], counts[candidates], 0.5)
+        now = np.where(was, ~(enough & (median >= self.recovery_kmh)), enough & (median < self.congestion_kmh))
+        changed = np.flatnonzero(now != was)
+        self._congested[:n] = now
+
+        events = []
+        for i in changed:
+            event = {
+                "segment": self._keys[i],
+                "type": "congested" if now[i] else "cleared",
+                "median_kmh": float(median[i]),
+                "count": int(counts[i]),
+                "window_end": (self.watermark_epoch + 1) * self.bucket_s,
+                "emitted_at": time.time(),
+            }
+            events.append(event)
+            if self.on_event is not None:
+                self.on_event(event)
+        return events
+
+    def process(self, name: str, response):
+        """
+        Add one realtime message via the extract function.
+        """
+        point = self.extract(name, response)
+        if point is not None:
+            self.add(*point)
+
+    async def hub_consumer(self, name: str, response):
+        """
+        RealtimeHub consumer callback. Congestion is re-evaluated whenever the
+        watermark moves into a new bucket.
+        """
+        before = self.watermark_epoch
+        self.process(name, response)
+        if self.watermark_epoch != before:
+            self.evaluate()
@@ -0,0 +1,302 @@
+import math
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from corridor_clip import CorridorIndex
+
+# DDSketch bucket used for speeds <= 0 (stationary points)
+ZERO_BUCKET = -(2 ** 31)
+
+TIME_BUCKETS = ("hour_of_day", "day_of_week", "date", "hour", None)
+
+
+class SpeedSketches:
+    """
+    Mergeable per-group speed sketches (DDSketch with a fixed relative accuracy).
+
+    Each group keeps counts of log-spaced buckets, so two partial results merge by
+    adding counts and any quantile is accurate to relative_accuracy. Groups are rows
+    of a pandas index, which keeps thousands of segment x time-bucket sketches in one
+    vectorized table instead of one Python object per group.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f"relative_accuracy must be in (0, 1), got {relative_accuracy}")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Optional[pd.Series] = None  # index = group keys + "bucket", value = count
+
+    def bucket_of(self, values: np.ndarray) -> np.ndarray:
+        values = np.asarray(values, dtype=np.float64)
+        out = np.full(len(values), ZERO_BUCKET, dtype=np.int64)
+        pos = values > 0
+        out[pos] = np.ceil(np.log(values[pos]) / self._log_gamma).astype(np.int64)
+        return out
+
+    def value_of(self, buckets: np.ndarray) -> np.ndarray:
+        buckets = np.asarray(buckets, dtype=np.int64)
+        value = 2.0 * np.power(self.gamma, buckets.astype(np.float64)) / (self.gamma + 1.0)
+        return np.where(buckets == ZERO_BUCKET, 0.0, value)
+
+    def add(self, group_frame: pd.DataFrame, values: np.ndarray):
+        """
+        Add values, one per row of group_frame (the group key columns).
+        """
+        frame = group_frame.copy()
+        frame["bucket"] = self.bucket_of(values)
+        counts = frame.groupby(list(frame.columns), sort=False, dropna=False).size()
+        self._merge_counts(counts)
+
+    def merge(self, other: "SpeedSketches"):
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        if other.buckets is not None:
+            self._merge_counts(other.buckets)
+
+    def _merge_counts(self, counts: pd.Series):
+        if self.buckets is None:
+            self.buckets = counts.astype(np.int64)
+        else:
+            self.buckets = self.buckets.add(counts, fill_value=0).astype(np.int64)
+
+    def quantiles(self, qs: Sequence[float]) -> pd.DataFrame:
+        """
+        One row per group, one column per quantile (named speed_p50, speed_p85, ...).
+        """
+        if self.buckets is None:
+            return pd.DataFrame()
+        group_levels = [n for n in self.buckets.index.names if n != "bucket"]
+        s = self.buckets.sort_index()
+        frame = s.rename("count").reset_index()
+        grouped = frame.groupby(group_levels, sort=False, dropna=False)["count"]
+        frame["cum"] = grouped.cumsum()
+        frame["total"] = grouped.transform("sum")
+
+        out = {}
+        for q in qs:
+            rank = q * (frame["total"] - 1)
+            hit = frame.loc[frame["cum"] > rank]
+            first = hit.groupby(group_levels, sort=False, dropna=False).head(1)
+            col = f"speed_p{int(round(q * 100))}"
+            out[col] = pd.Series(self.value_of(first["bucket"].to_numpy()), index=first.set_index(group_levels).index)
+        return pd.DataFrame(out)
+
+
+class PartialAggregate:
+    """
+    Mergeable AggregateByPath-style partial result.
+
+    Holds per (segment, time_bucket) point counts, speed sums for the mean, vehicle
+    type counts and speed sketches. Partials built from different chunks, files or
+    processes are combined with merge() and turned into a table with finalize().
+    """
+
+    def __init__(self, group_cols: List[str], relative_accuracy: float = 0.01):
+        self.group_cols = list(group_cols)
+        self.totals: Optional[pd.DataFrame] = None
+        self.vehicle_types: Optional[pd.DataFrame] = None
+        self.sketches = SpeedSketches(relative_accuracy)
+
+    def add_frame(self, frame: pd.DataFrame):
+        """
+        frame must contain the group columns plus speed_kmh and vehicle_type.
+        """
+        if frame.empty:
+            return
+        g = frame.groupby(self.group_cols, sort=False, dropna=False)
+        totals = pd.DataFrame({"count": g.size(), "speed_sum": g["speed_kmh"].sum()})
+        if "trip_id" in frame.columns:
+            totals["trips"] = g["trip_id"].nunique()
+        vt = frame.groupby(self.group_cols + ["vehicle_type"], sort=False, dropna=False).size().unstack(fill_value=0)
+        self.totals = _add_frames(self.totals, totals)
+        self.vehicle_types = _add_frames(self.vehicle_types, vt)
+        self.sketches.add(frame[self.group_cols], frame["speed_kmh"].to_numpy())
+
+    def merge(self, other: "PartialAggregate") -> "PartialAggregate":
+        if other.group_cols != self.group_cols:
+            raise ValueError(f"Cannot merge partials grouped by {other.group_cols} into {self.group_cols}")
+        self.totals = _add_frames(self.totals, other.totals)
+        self.vehicle_types = _add_frames(self.vehicle_types, other.vehicle_types)
+        self.sketches.merge(other.sketches)
+        return self
+
+    def finalize(self, quantiles: Sequence[float] = (0.5, 0.85)) -> pd.DataFrame:
+        """
+        Table with count, trips (summed per chunk, so an upper bound when a trip spans
+        chunks), speed_mean, the requested speed percentiles and vehicle type shares.
+        """
+        if self.totals is None:
+            return pd.DataFrame(columns=self.group_cols + ["count", "speed_mean"])
+        out = self.totals.copy()
+        out["speed_mean"] = out["speed_sum"] / out["count"]
+        out = out.drop(columns="speed_sum")
+        out = out.join(self.sketches.quantiles(quantiles))
+        vt = self.vehicle_types.sort_index(axis=1)
+        vt = vt.div(vt.sum(axis=1), axis=0)
+        vt.columns = [f"vehicle_type_{c}_share" for c in vt.columns]
+        out = out.join(vt)
+        return out.sort_index().reset_index()
+
+
+def _add_frames(a: Optional[pd.DataFrame], b: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+    if b is None:
+        return a
+    if a is None:
+        return b.copy()
+    return a.add(b, fill_value=0)
+
+
+def slice_frame(
+    df: pd.DataFrame,
+    *,
+    tz: str = "UTC",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    hours: Optional[Iterable[int]] = None,
+    days_of_week: Optional[Iterable[int]] = None,
+    vehicle_types: Optional[Iterable[int]] = None,
+) -> pd.DataFrame:
+    """
+    Apply a what-if slice to pulled rows and add a local_time column.
+
+    start/end are inclusive local dates ("YYYY-MM-DD"), days_of_week uses Monday=0,
+    mirroring the date_time_range fields of AggregateByPathRequest.
+    """
+    local_time = pd.to_datetime(df["timestamp_seconds"], unit="s", utc=True).dt.tz_convert(tz)
+    mask = np.ones(len(df), dtype=bool)
+    if start is not None:
+        mask &= (local_time.dt.date >= pd.Timestamp(start).date()).to_numpy()
+    if end is not None:
+        mask &= (local_time.dt.date <= pd.Timestamp(end).date()).to_numpy()
+    if hours is not None:
+        mask &= local_time.dt.hour.isin(list(hours)).to_numpy()
+    if days_of_week is not None:
+        mask &= local_time.dt.dayofweek.isin(list(days_of_week)).to_numpy()
+    if vehicle_types is not None:
+        mask &= df["vehicle_type"].isin(list(vehicle_types)).to_numpy()
+
+    out = df.loc[mask].copy()
+    out["local_time"] = local_time[mask]
+    return out
+
+
+def _time_bucket(local_time: pd.Series, time_bucket: Optional[str]):
+    if time_bucket == "hour_of_day":
+        return local_time.dt.hour
+    if time_bucket == "day_of_week":
+        return local_time.dt.dayofweek
+    if time_bucket == "date":
+        return local_time.dt.strftime("%Y-%m-%d")
+    if time_bucket == "hour":
+        return local_time.dt.strftime("%Y-%m-%d %H:00")
+    raise ValueError(f"time_bucket must be one of {TIME_BUCKETS}, got {time_bucket!r}")
+
+
+def aggregate_chunk(
+    df: pd.DataFrame,
+    *,
+    corridor=None,
+    segment_length_m: float = 500.0,
+    buffer_m: float = 25.0,
+    time_bucket: Optional[str] = "hour_of_day",
+    relative_accuracy: float = 0.01,
+    **slice_kwargs,
+) -> PartialAggregate:
+    """
+    Aggregate one chunk of pulled rows into a PartialAggregate.
+
+    Segments are corridor sub-segments of segment_length_m when corridor (WKT or
+    CorridorIndex) is given, otherwise osm_way_id. slice_kwargs are passed to
+    slice_frame (tz, start, end, hours, days_of_week, vehicle_types).
+    """
+    frame = slice_frame(df, **slice_kwargs)
+
+    if corridor is not None:
+        index = corridor if isinstance(corridor, CorridorIndex) else CorridorIndex(corridor, buffer_m=buffer_m)
+        _, chainage, _ = index.locate(frame["road_matched_point_lat"].to_numpy(), frame["road_matched_point_lon"].to_numpy())
+        inside = np.isfinite(chainage)
+        frame = frame.loc[inside].copy()
+        frame["segment"] = (chainage[inside] // segment_length_m).astype(np.int64)
+    else:
+        frame["segment"] = frame["osm_way_id"]
+
+    group_cols = ["segment"]
+    if time_bucket is not None:
+        frame["time_bucket"] = _time_bucket(frame["local_time"], time_bucket)
+        group_cols.append("time_bucket")
+
+    partial = PartialAggregate(group_cols, relative_accuracy)
+    partial.add_frame(frame)
+    return partial
+
+
+def iter_pulled_chunks(path: str, chunksize: int = 500_000):
+    """
+    Yield DataFrame chunks from a pulled .csv or .pkl file.
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix == ".csv":
+        yield from pd.read_csv(path, chunksize=chunksize)
+    elif suffix == ".pkl":
+        with open(path, "rb") as f:
+            df = pickle.load(f)
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize]
+    else:
+        raise ValueError(f"Unsupported file type: {path}")
+
+
+def aggregate_file(path: str, chunksize: int = 500_000, **kwargs) -> Optional[PartialAggregate]:
+    """
+    Aggregate one pulled file chunk by chunk; kwargs go to aggregate_chunk.
+    Returns None for a file without rows.
+    """
+    partial = None
+    for chunk in iter_pulled_chunks(path, chunksize):
+        p = aggregate_chunk(chunk, **kwargs)
+        partial = p if partial is None else partial.merge(p)
+    return partial
+
+
+def aggregate_files(
+    paths: Sequence[str],
+    *,
+    processes: Optional[int] = None,
+    quantiles: Sequence[float] = (0.5, 0.85),
+    **kwargs,
+) -> pd.DataFrame:
+    """
+    Local equivalent of AggregateByPath over already-pulled files.
+
+    Each file is aggregated in a worker process and the partial results are merged,
+    so re-slicing (different hours / days / vehicle types) costs no API calls.
+    Pass corridor as a WKT string so workers can rebuild the index cheaply.
+
+    Example:
+      aggregate_files(["August_2025_SB_D4_OHGO_TEST.csv"], corridor=wkt,
+                      time_bucket="hour_of_day", tz="America/New_York", days_of_week=[5, 6])
+    """
+    partial = None
+    if processes == 1 or len(paths) <= 1:
+        partials = (aggregate_file(p, **kwargs) for p in paths)
+        for p in partials:
+            if p is not None:
+                partial = p if partial is None else partial.merge(p)
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = [pool.submit(aggregate_file, p, **kwargs) for p in paths]
+            for fut in futures:
+                p = fut.result()
+                if p is not None:
+                    partial = p if partial is None else partial.merge(p)
+
+    if partial is None:
+        return pd.DataFrame()
+    return partial.finalize(quantiles)
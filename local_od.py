@@ -0,0 +1,293 @@
+import math
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from corridor_clip import EARTH_RADIUS_M, expand_ranges
+from linestring_to_earth import parse_wkt_linestring, parse_wkt_polygon
+from trajectory_engine import sort_by_trip
+
+# Kinds of grid cell entries
+CELL_INSIDE = 1         # cell lies fully inside a polygon zone
+CELL_POLYGON_EDGE = 2   # cell touches a polygon boundary, needs an exact test
+CELL_LINE = 3           # cell is within the buffer of a linestring zone segment
+
+
+def points_in_polygon(x: np.ndarray, y: np.ndarray, edges, *, max_pairs: int = 4_000_000) -> np.ndarray:
+    """
+    Even-odd ray casting of many points against one polygon (holes included).
+    edges is (x0, y0, x1, y1) arrays over every ring edge.
+    """
+    ex0, ey0, ex1, ey1 = edges
+    inside = np.zeros(len(x), dtype=bool)
+    step = max(1, max_pairs // max(1, len(ex0)))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for start in range(0, len(x), step):
+            px = x[start:start + step, None]
+            py = y[start:start + step, None]
+            straddle = (ey0 > py) != (ey1 > py)
+            x_cross = ex0 + (py - ey0) * (ex1 - ex0) / (ey1 - ey0)
+            inside[start:start + step] = (np.count_nonzero(straddle & (px < x_cross), axis=1) % 2) == 1
+    return inside
+
+
+class ZoneIndex:
+    """
+    Grid index over named OD zones, so membership is found per grid cell instead of
+    testing every point against every zone.
+
+    Zones follow the OriginDestinationRequest Selection semantics:
+      - POLYGON    : POLYGON_PASSING_THROUGH, a point counts when inside the polygon
+      - LINESTRING : LINESTRING_PARTIAL_MATCH, a point counts when within line_buffer_m
+
+    Cells fully inside a polygon accept their points outright; only cells on a
+    polygon boundary need an exact ray-casting test.
+    """
+
+    def __init__(self, zones: Dict[str, str], *, cell_size_m: float = 500.0, line_buffer_m: float = 25.0):
+        if not zones:
+            raise ValueError("At least one zone is required")
+        self.names = list(zones)
+        self.cell_size_m = float(cell_size_m)
+        self.line_buffer_m = float(line_buffer_m)
+
+        parsed = []
+        for name, wkt in zones.items():
+            head = wkt.strip().upper()
+            if head.startswith("POLYGON"):
+                parsed.append(("polygon", [np.asarray(r, dtype=np.float64) for r in parse_wkt_polygon(wkt)]))
+            elif head.startswith("LINESTRING"):
+                parsed.append(("linestring", [np.asarray(parse_wkt_linestring(wkt), dtype=np.float64)]))
+            else:
+                raise ValueError(f"Zone '{name}' must be a WKT POLYGON or LINESTRING")
+
+        all_pts = np.concatenate([ring for _, rings in parsed for ring in rings])
+        self.lon0 = float(all_pts[:, 0].mean())
+        self.lat0 = float(all_pts[:, 1].mean())
+        self._kx = math.radians(1.0) * EARTH_RADIUS_M * math.cos(math.radians(self.lat0))
+        self._ky = math.radians(1.0) * EARTH_RADIUS_M
+
+        ax, ay = self.project(all_pts[:, 1], all_pts[:, 0])
+        pad = self.line_buffer_m + 2 * self.cell_size_m
+        self._grid_x0 = float(ax.min() - pad)
+        self._grid_y0 = float(ay.min() - pad)
+        self._grid_ny = int((ay.max() + pad - self._grid_y0) // self.cell_size_m) + 1
+
+        self._poly_edges = {}
+        seg_cols = ([], [], [], [], [])  # ax, ay, dx, dy, zone
+        keys, zone_ids, kinds, seg_ids = [], [], [], []
+
+        for zone_id, (kind, rings) in enumerate(parsed):
+            projected = [self.project(r[:, 1], r[:, 0]) for r in rings]
+            if kind == "polygon":
+                k, z, t = self._polygon_cells(zone_id, projected)
+                keys.append(k)
+                zone_ids.append(z)
+                kinds.append(t)
+                seg_ids.append(np.full(len(k), -1, dtype=np.int64))
+            else:
+                x, y = projected[0]
+                first_seg = sum(len(c) for c in seg_cols[0])
+                seg_cols[0].append(x[:-1])
+                seg_cols[1].append(y[:-1])
+                seg_cols[2].append(x[1:] - x[:-1])
+                seg_cols[3].append(y[1:] - y[:-1])
+                seg_cols[4].append(np.full(len(x) - 1, zone_id, dtype=np.int64))
+                k, s = self._line_cells(x, y)
+                keys.append(k)
+                zone_ids.append(np.full(len(k), zone_id, dtype=np.int64))
+                kinds.append(np.full(len(k), CELL_LINE, dtype=np.int8))
+                seg_ids.append(s + first_seg)
+
+        empty = np.zeros(0)
+        self._seg_ax, self._seg_ay, self._seg_dx, self._seg_dy = (
+            np.concatenate(c) if c else empty for c in seg_cols[:4]
+        )
+
+        keys = np.concatenate(keys)
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        self._entry_zone = np.concatenate(zone_ids)[order]
+        self._entry_kind = np.concatenate(kinds)[order]
+        self._entry_seg = np.concatenate(seg_ids)[order]
+        self._cell_keys, starts = np.unique(keys, return_index=True)
+        self._cell_offsets = np.append(starts, len(keys))
+
+    def project(self, lat, lon):
+        """
+        Project lat/lon degrees to local x/y metres.
+        """
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        return (lon - self.lon0) * self._kx, (lat - self.lat0) * self._ky
+
+    def _cell_xy(self, x, y):
+        return (
+            np.floor((x - self._grid_x0) / self.cell_size_m).astype(np.int64),
+            np.floor((y - self._grid_y0) / self.cell_size_m).astype(np.int64),
+        )
+
+    def _polygon_cells(self, zone_id, rings):
+        ex0 = np.concatenate([x[:-1] for x, _ in rings])
+        ey0 = np.concatenate([y[:-1] for _, y in rings])
+        ex1 = np.concatenate([x[1:] for x, _ in rings])
+        ey1 = np.concatenate([y[1:] for _, y in rings])
+        self._poly_edges[zone_id] = (ex0, ey0, ex1, ey1)
+
+        # Cells crossed by an edge (sampled at half a cell, then dilated by one cell)
+        lengths = np.hypot(ex1 - ex0, ey1 - ey0)
+        samples = np.maximum(2, np.ceil(lengths / (self.cell_size_m / 2)).astype(np.int64) + 1)
+        edge = np.repeat(np.arange(len(ex0)), samples)
+        frac = expand_ranges(np.zeros(len(samples)), samples) / np.repeat(samples - 1, samples)
+        sx = ex0[edge] + frac * (ex1[edge] - ex0[edge])
+        sy = ey0[edge] + frac * (ey1[edge] - ey0[edge])
+        cx, cy = self._cell_xy(sx, sy)
+        offsets = np.array([-1, 0, 1])
+        cx = np.broadcast_to(cx[:, None, None] + offsets[None, :, None], (len(sx), 3, 3)).ravel()
+        cy = np.broadcast_to(cy[:, None, None] + offsets[None, None, :], (len(sx), 3, 3)).ravel()
+        edge_keys = np.unique(cx * self._grid_ny + cy)
+
+        # Cells of the outer ring's bounding box that are not on the boundary are
+        # uniformly inside or outside; test their centres once
+        ox, oy = rings[0]
+        bx0, by0 = self._cell_xy(np.array([ox.min()]), np.array([oy.min()]))
+        bx1, by1 = self._cell_xy(np.array([ox.max()]), np.array([oy.max()]))
+        gx, gy = np.meshgrid(np.arange(bx0[0], bx1[0] + 1), np.arange(by0[0], by1[0] + 1), indexing="ij")
+        gx, gy = gx.ravel(), gy.ravel()
+        box_keys = gx * self._grid_ny + gy
+        interior = ~np.isin(box_keys, edge_keys)
+        centre_x = self._grid_x0 + (gx[interior] + 0.5) * self.cell_size_m
+        centre_y = self._grid_y0 + (gy[interior] + 0.5) * self.cell_size_m
+        inside_keys = box_keys[interior][points_in_polygon(centre_x, centre_y, self._poly_edges[zone_id])]
+
+        keys = np.concatenate((inside_keys, edge_keys))
+        kinds = np.concatenate((
+            np.full(len(inside_keys), CELL_INSIDE, dtype=np.int8),
+            np.full(len(edge_keys), CELL_POLYGON_EDGE, dtype=np.int8),
+        ))
+        return keys, np.full(len(keys), zone_id, dtype=np.int64), kinds
+
+    def _line_cells(self, x, y):
+        pad = self.line_buffer_m
+        bx0, by0 = self._cell_xy(np.minimum(x[:-1], x[1:]) - pad, np.minimum(y[:-1], y[1:]) - pad)
+        bx1, by1 = self._cell_xy(np.maximum(x[:-1], x[1:]) + pad, np.maximum(y[:-1], y[1:]) + pad)
+        nx = bx1 - bx0 + 1
+        ny = by1 - by0 + 1
+        counts = nx * ny
+        seg = np.repeat(np.arange(len(counts)), counts)
+        local = expand_ranges(np.zeros(len(counts)), counts)
+        keys = (bx0[seg] + local // ny[seg]) * self._grid_ny + (by0[seg] + local % ny[seg])
+        return keys, seg
+
+    def memberships(self, lat, lon, *, chunk_size: int = 1_000_000):
+        """
+        All (point_index, zone_index) pairs where the point belongs to the zone.
+        A point may belong to several overlapping zones.
+        """
+        x, y = self.project(lat, lon)
+        out_pt, out_zone = [], []
+        for start in range(0, len(x), chunk_size):
+            p, z = self._memberships_chunk(x[start:start + chunk_size], y[start:start + chunk_size])
+            out_pt.append(p + start)
+            out_zone.append(z)
+        if not out_pt:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(out_pt), np.concatenate(out_zone)
+
+    def _memberships_chunk(self, x, y):
+        finite = np.isfinite(x) & np.isfinite(y)
+        cx, cy = self._cell_xy(np.where(finite, x, 0.0), np.where(finite, y, 0.0))
+        keys = cx * self._grid_ny + cy
+        pos = np.minimum(np.searchsorted(self._cell_keys, keys), len(self._cell_keys) - 1)
+        hit = finite & (cy >= 0) & (cy < self._grid_ny) & (self._cell_keys[pos] == keys)
+
+        pts = np.flatnonzero(hit)
+        first = self._cell_offsets[pos[pts]]
+        counts = self._cell_offsets[pos[pts] + 1] - first
+        pair_pt = np.repeat(pts, counts)
+        entry = expand_ranges(first, counts)
+        pair_zone = self._entry_zone[entry]
+        pair_kind = self._entry_kind[entry]
+        accept = pair_kind == CELL_INSIDE
+
+        # Exact test only for points in polygon boundary cells, one zone at a time
+        edge_rows = np.flatnonzero(pair_kind == CELL_POLYGON_EDGE)
+        for zone_id in np.unique(pair_zone[edge_rows]):
+            rows = edge_rows[pair_zone[edge_rows] == zone_id]
+            p = pair_pt[rows]
+            accept[rows] = points_in_polygon(x[p], y[p], self._poly_edges[int(zone_id)])
+
+        line_rows = np.flatnonzero(pair_kind == CELL_LINE)
+        if len(line_rows):
+            seg = self._entry_seg[entry[line_rows]]
+            p = pair_pt[line_rows]
+            px = x[p] - self._seg_ax[seg]
+            py = y[p] - self._seg_ay[seg]
+            dx, dy = self._seg_dx[seg], self._seg_dy[seg]
+            len2 = dx * dx + dy * dy
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t = np.clip(np.where(len2 > 0, (px * dx + py * dy) / len2, 0.0), 0.0, 1.0)
+            accept[line_rows] = np.hypot(px - t * dx, py - t * dy) <= self.line_buffer_m
+
+        member = np.unique(pair_pt[accept] * len(self.names) + pair_zone[accept])
+        return member // len(self.names), member % len(self.names)
+
+
+def build_od(
+    df: pd.DataFrame,
+    zones,
+    *,
+    all_pairs: bool = False,
+    lat_col: str = "road_matched_point_lat",
+    lon_col: str = "road_matched_point_lon",
+    **index_kwargs,
+):
+    """
+    Local origin-destination analysis over pulled trajectory points.
+
+    zones is a {name: wkt} dict or a ZoneIndex. Each trip's zone sequence is ordered
+    by the first time the trip is seen in each zone. The trip's origin is its first
+    zone and its destination the zone it was last seen in. With all_pairs=True every
+    ordered pair of distinct zones visited by a trip is counted, which matches
+    how each selection pair of an OriginDestinationRequest is reported.
+
+    Returns (sequences, od):
+      sequences : trip_id, zone_sequence (tuple of names), first_seen, last_seen
+      od        : sparse matrix in long form, columns origin, destination, trips
+    """
+    index = zones if isinstance(zones, ZoneIndex) else ZoneIndex(zones, **index_kwargs)
+
+    order, codes, labels, times = sort_by_trip(df)
+    lat = df[lat_col].to_numpy()[order]
+    lon = df[lon_col].to_numpy()[order]
+    point, zone = index.memberships(lat, lon)
+
+    visits = pd.DataFrame({"trip": codes[point], "zone": zone, "time": times[point]})
+    visits = visits.groupby(["trip", "zone"], sort=False).agg(first_seen=("time", "min"), last_seen=("time", "max")).reset_index()
+    visits = visits.sort_values(["trip", "first_seen", "zone"], kind="stable")
+    visits["zone_name"] = np.asarray(index.names, dtype=object)[visits["zone"].to_numpy()]
+
+    g = visits.groupby("trip", sort=True)
+    sequences = pd.DataFrame({
+        "zone_sequence": g["zone_name"].agg(tuple),
+        "first_seen": g["first_seen"].min(),
+        "last_seen": g["last_seen"].max(),
+    })
+    sequences.insert(0, "trip_id", labels[sequences.index.to_numpy()])
+    sequences = sequences.reset_index(drop=True)
+
+    if all_pairs:
+        pairs = visits[["trip", "zone_name", "first_seen"]].merge(
+            visits[["trip", "zone_name", "first_seen"]], on="trip", suffixes=("_o", "_d")
+        )
+        pairs = pairs.loc[(pairs["first_seen_o"] < pairs["first_seen_d"]) & (pairs["zone_name_o"] != pairs["zone_name_d"])]
+        pairs = pairs.drop_duplicates(["trip", "zone_name_o", "zone_name_d"])
+        od = pairs.groupby(["zone_name_o", "zone_name_d"]).size()
+    else:
+        origin = g["zone_name"].first()
+        destination = visits.sort_values(["trip", "last_seen"], kind="stable").groupby("trip")["zone_name"].last()
+        od = pd.DataFrame({"o": origin, "d": destination}).groupby(["o", "d"]).size()
+
+    od = od.rename("trips").rename_axis(["origin", "destination"]).reset_index()
+    return sequences, od
@@ -0,0 +1,492 @@
+import random
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import grpc
+import numpy as np
+from google.protobuf import message_factory
+
+from gateway_scheduler import PRIORITY_REALTIME, default_priority
+from synthetic_telemetry import PROTO_FIELDS, TelemetryGenerator, corridor_for
+
+MOCK_SECRET = "mock-secret"
+# Used when a request has no geometry
+DEFAULT_WKT = "LINESTRING(151.18703722810923 -33.8695894847834, 151.18361472940623 -33.868689747746664)"
+
+
+def _gateway_service():
+    from compassiot.gateway.v1 import gateway_pb2
+
+    return gateway_pb2.DESCRIPTOR.services_by_name["Service"]
+
+
+def _set(message, path: str, value) -> bool:
+    """
+    Set a dotted field path (e.g. "road_matched_point.lat") if every field on the
+    way exists in this message type; returns whether it was set.
+    """
+    *parents, leaf = path.split(".")
+    for name in parents:
+        field = message.DESCRIPTOR.fields_by_name.get(name)
+        if field is None or field.message_type is None or field.is_repeated:
+            return False
+        message = getattr(message, name)
+    field = message.DESCRIPTOR.fields_by_name.get(leaf)
+    if field is None or field.is_repeated or field.message_type is not None:
+        return False
+    if field.enum_type is not None and value not in field.enum_type.values_by_number:
+        return False
+    setattr(message, leaf, value)
+    return True
+
+
+def _point_message(message):
+    """
+    The message a synthetic point is written into: the response itself if it has
+    a timestamp, otherwise its first (repeated) message field that has one.
+    """
+    if "timestamp" in message.DESCRIPTOR.fields_by_name:
+        return message
+    for field in message.DESCRIPTOR.fields:
+        if field.message_type is not None and "timestamp" in field.message_type.fields_by_name:
+            return getattr(message, field.name).add() if field.is_repeated else getattr(message, field.name)
+    return message
+
+
+def _request_wkt(request) -> Optional[str]:
+    for field in request.DESCRIPTOR.fields:
+        if field.name.endswith("wkt") and field.type == field.TYPE_STRING and not field.is_repeated:
+            return getattr(request, field.name) or None
+    return None
+
+
+def _request_days(request, default_days: int = 1):
+    """
+    Days covered by the request's DateTimeRange (start..end inclusive); without a
+    range, the last default_days days.
+    """
+    today = date.today()
+    for field in request.DESCRIPTOR.fields:
+        if field.message_type is None or field.message_type.name != "DateTimeRange" or not request.HasField(field.name):
+            continue
+        date_range = getattr(request, field.name)
+        start = date(date_range.start.year, date_range.start.month or 1, date_range.start.day or 1) if date_range.start.year else today
+        end = date(date_range.end.year, date_range.end.month or 1, date_range.end.day or 1) if date_range.end.year else today
+        return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    return [today - timedelta(days=i) for i in range(default_days, 0, -1)]
+
+
+def _resume_after(request) -> Optional[Tuple[int, int]]:
+    field = request.DESCRIPTOR.fields_by_name.get("last_received_timestamp")
+    if field is None or not request.HasField("last_received_timestamp"):
+        return None
+    return request.last_received_timestamp.seconds, request.last_received_timestamp.nanos
+
+
+class MockGateway:
+    """
+    Local stand-in for the Compass gateway, for offline benchmarks and resilience
+    tests of the pipelines.
+
+    The gRPC server implements every method of the gateway ServiceStub from its
+    service descriptor: server-streaming RPCs send synthetic points (historical
+    ones for the requested days, realtime ones forever at realtime_rate); unary
+    RPCs answer with unary_handlers[rpc](request, empty_response), or the empty
+    response if there is no handler. A plain HTTP server on rest_port answers
+    the same unary RPCs the way UnaryRestInterceptor calls them
+    (POST /<service>/<Method>, application/proto), including Authenticate,
+    which swaps the secret for a bearer token valid token_ttl_s.
+
+    Historical points are deterministic per (geometry, day, seed) and sorted by
+    timestamp, so a reconnect with last_received_timestamp resumes exactly after
+    the last point received.
+
+    Faults, per call: latency_s (+ uniform jitter_s) before answering, p_429
+    RESOURCE_EXHAUSTED / HTTP 429, p_401 UNAUTHENTICATED / HTTP 401, and every
+    stream is cut with DEADLINE_EXCEEDED after deadline_after messages. rate caps
+    historical streams at that many messages/s (0 = as fast as possible).
+
+    Example:
+      mock = MockGateway(points_per_day=5000, rate=2000, p_429=0.05, deadline_after=1000)
+      mock.start()
+      mock.configure_client()  # or set the COMPASS_* variables printed by main()
+      client = create_gateway_client()
+    """
+
+    def __init__(
+        self,
+        *,
+        host: str = "localhost",
+        grpc_port: int = 50051,
+        rest_port: int = 8080,
+        secret: str = MOCK_SECRET,
+        token_ttl_s: float = 3600.0,
+        points_per_day: int = 2000,
+        vehicles: int = 50,
+        rate: float = 0.0,
+        realtime_rate: float = 10.0,
+        latency_s: float = 0.0,
+        jitter_s: float = 0.0,
+        p_429: float = 0.0,
+        p_401: float = 0.0,
+        deadline_after: int = 0,
+        seed: int = 0,
+        unary_handlers: Optional[Dict[str, Callable[[Any, Any], Any]]] = None,
+        workers: int = 32,
+        service=None,
+    ):
+        self.host = host
+        self.grpc_port = grpc_port
+        self.rest_port = rest_port
+        self.secret = secret
+        self.token_ttl_s = token_ttl_s
+        self.points_per_day = points_per_day
+        self.vehicles = vehicles
+        self.rate = rate
+        self.realtime_rate = realtime_rate
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.p_429 = p_429
+        self.p_401 = p_401
+        self.deadline_after = deadline_after
+        self.seed = seed
+        self.unary_handlers = {"RoadMatchPath": echo_road_match, **(unary_handlers or {})}
+        self.workers = workers
+        self.service = service or _gateway_service()
+
+        self.methods = {m.name: m for m in self.service.methods}
+        self._classes = {
+            m.name: (message_factory.GetMessageClass(m.input_type), message_factory.GetMessageClass(m.output_type))
+            for m in self.service.methods
+        }
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens: Dict[str, float] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._grpc_server = None
+        self._rest_server: Optional[ThreadingHTTPServer] = None
+
+    def _count(self, rpc: str, key: str, n: int = 1):
+        with self._lock:
+            stats = self._stats.setdefault(rpc, {"calls": 0, "messages": 0, "429": 0, "401": 0, "deadline": 0})
+            stats[key] = stats.get(key, 0) + n
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {rpc: dict(stats) for rpc, stats in self._stats.items()}
+
+    def _chance(self, p: float) -> bool:
+        if p <= 0:
+            return False
+        with self._lock:
+            return self._random.random() < p
+
+    def _delay(self):
+        delay = self.latency_s
+        if self.jitter_s > 0:
+            with self._lock:
+                delay += self._random.uniform(0.0, self.jitter_s)
+        if delay > 0:
+            time.sleep(delay)
+
+    def issue_token(self) -> str:
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._tokens[token] = time.monotonic() + self.token_ttl_s
+        return token
+
+    def expire_tokens(self):
+        """
+        Invalidate every issued token, as if they all timed out.
+        """
+        with self._lock:
+            self._tokens.clear()
+
+    def _authorized(self, authorization: Optional[str]) -> bool:
+        if not authorization or not authorization.lower().startswith("bearer "):
+            return False
+        with self._lock:
+            expiry = self._tokens.get(authorization[7:].strip())
+        return expiry is not None and time.monotonic() < expiry
+
+    def _fault(self, rpc: str, authorization: Optional[str]) -> Optional[grpc.StatusCode]:
+        """
+        Status code to fail the call with (auth check plus injected faults), or None.
+        """
+        self._count(rpc, "calls")
+        if rpc == "Authenticate":
+            return None
+        if not self._authorized(authorization) or self._chance(self.p_401):
+            self._count(rpc, "401")
+            return grpc.StatusCode.UNAUTHENTICATED
+        if self._chance(self.p_429):
+            self._count(rpc, "429")
+            return grpc.StatusCode.RESOURCE_EXHAUSTED
+        return None
+
+    def authenticate(self, request):
+        response = self._classes["Authenticate"][1]()
+        if self.secret is not None and getattr(request, "token", None) != self.secret:
+            return None
+        _set(response, "access_token", self.issue_token())
+        return response
+
+    def unary(self, rpc: str, request):
+        response = self._classes[rpc][1]()
+        handler = self.unary_handlers.get(rpc)
+        return handler(request, response) if handler is not None else response
+
+    def historical_points(self, request) -> Iterator[Tuple[int, int, dict]]:
+        """
+        (seconds, nanos, fields) of the synthetic points for a historical request,
+        in timestamp order. Each day is a TelemetryGenerator dataset seeded by
+        (geometry, day, seed).
+        """
+        wkt = _request_wkt(request) or DEFAULT_WKT
+        for day in _request_days(request):
+            midnight = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+            gen = TelemetryGenerator(wkt, seed=zlib.crc32(f"{wkt}|{day}|{self.seed}".encode("utf-8")), start=midnight, vehicles=self.vehicles)
+            df = gen.frame(self.points_per_day).sort_values(["timestamp_seconds", "timestamp_nanos"], kind="stable")
+            paths = [PROTO_FIELDS[column] for column in df.columns]
+            for row in zip(*(df[column].tolist() for column in df.columns)):
+                fields = dict(zip(paths, row))
+                yield fields["timestamp.seconds"], fields["timestamp.nanos"], fields
+
+    def realtime_points(self, request) -> Iterator[dict]:
+        corridor = corridor_for(_request_wkt(request) or DEFAULT_WKT)
+        rng = np.random.default_rng([self.seed, int(time.time())])
+        while True:
+            now = time.time()
+            lat, lng = corridor.point_at(rng.uniform(0.0, corridor.length_m))
+            vehicle = int(rng.integers(0, max(1, self.vehicles)))
+            yield {
+                "timestamp.seconds": int(now),
+                "timestamp.nanos": int((now % 1) * 1e9),
+                "road_matched_point.lat": float(lat),
+                "road_matched_point.lng": float(lng),
+                "raw_point.lat": float(lat),
+                "raw_point.lng": float(lng),
+                "speed": float(np.clip(rng.normal(90.0, 20.0), 0.0, 160.0)),
+                "vehicle_id": f"mock-vehicle-{vehicle}",
+                "point_id": uuid.uuid4().hex,
+            }
+
+    def stream(self, rpc: str, request, is_active: Callable[[], bool]) -> Iterator[Any]:
+        output = self._classes[rpc][1]
+        realtime = default_priority(rpc) == PRIORITY_REALTIME
+        if realtime:
+            points, rate = self.realtime_points(request), self.realtime_rate
+        else:
+            resume = _resume_after(request)
+            points = (fields for s, n, fields in self.historical_points(request) if resume is None or (s, n) > resume)
+            rate = self.rate
+        started = time.monotonic()
+        for sent, fields in enumerate(points):
+            if not is_active():
+                return
+            if rate > 0:
+                wait = started + sent / rate - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+            response = output()
+            point = _point_message(response)
+            for path, value in fields.items():
+                _set(point, path, value)
+            yield response
+
+    def _grpc_unary(self, rpc: str):
+        def handle(request, context):
+            self._delay()
+            if rpc == "Authenticate":
+                response = self.authenticate(request)
+                if response is None:
+                    context.abort(grpc.StatusCode.UNAUTHENTICATED, "invalid secret")
+                return response
+            code = self._fault(rpc, dict(context.invocation_metadata()).get("authorization"))
+            if code is not None:
+                context.abort(code, f"mock {code.name}")
+            return self.unary(rpc, request)
+
+        return handle
+
+    def _grpc_stream(self, rpc: str):
+        def handle(request, context):
+            code = self._fault(rpc, dict(context.invocation_metadata()).get("authorization"))
+            if code is not None:
+                context.abort(code, f"mock {code.name}")
+            self._delay()
+            sent = 0
+            for response in self.stream(rpc, request, context.is_active):
+                if self.deadline_after and sent >= self.deadline_after:
+                    self._count(rpc, "deadline")
+                    context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, "mock deadline")
+                sent += 1
+                self._count(rpc, "messages")
+                yield response
+
+        return handle
+
+    def _generic_handler(self):
+        handlers = {}
+        for name, method in self.methods.items():
+            input_class, output_class = self._classes[name]
+            if method.client_streaming:
+                continue
+            if method.server_streaming:
+                handlers[name] = grpc.unary_stream_rpc_method_handler(
+                    self._grpc_stream(name),
+                    request_deserializer=input_class.FromString,
+                    response_serializer=output_class.SerializeToString,
+                )
+            else:
+                handlers[name] = grpc.unary_unary_rpc_method_handler(
+                    self._grpc_unary(name),
+                    request_deserializer=input_class.FromString,
+                    response_serializer=output_class.SerializeToString,
+                )
+        return grpc.method_handlers_generic_handler(self.service.full_name, handlers)
+
+    def _rest_handler(self):
+        mock = self
+        prefix = f"/{self.service.full_name}/"
+        status = {
+            grpc.StatusCode.UNAUTHENTICATED: 401,
+            grpc.StatusCode.RESOURCE_EXHAUSTED: 429,
+        }
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, code: int, body: bytes, kind: str = "application/proto"):
+                self.send_response(code)
+                self.send_header("Content-Type", kind)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                rpc = self.path[len(prefix):] if self.path.startswith(prefix) else None
+                method = mock.methods.get(rpc)
+                if method is None or method.server_streaming or method.client_streaming:
+                    self._send(404, b"unknown unary method", "text/plain")
+                    return
+                try:
+                    request = mock._classes[rpc][0].FromString(body)
+                except Exception:
+                    self._send(400, b"invalid request", "text/plain")
+                    return
+                mock._delay()
+                if rpc == "Authenticate":
+                    mock._count(rpc, "calls")
+                    response = mock.authenticate(request)
+                    if response is None:
+                        self._send(401, b"invalid secret", "text/plain")
+                    else:
+                        self._send(200, response.SerializeToString())
+                    return
+                code = mock._fault(rpc, self.headers.get("authorization"))
+                if code is not None:
+                    self._send(status[code], f"mock {code.name}".encode(), "text/plain")
+                    return
+                try:
+                    response = mock.unary(rpc, request)
+                except Exception as error:
+                    self._send(500, repr(error).encode(), "text/plain")
+                    return
+                self._send(200, response.SerializeToString())
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> Tuple[int, int]:
+        """
+        Start both servers; returns the bound (grpc_port, rest_port) (pass 0 for
+        any free port).
+        """
+        self._grpc_server = grpc.server(ThreadPoolExecutor(max_workers=self.workers))
+        self._grpc_server.add_generic_rpc_handlers((self._generic_handler(),))
+        self.grpc_port = self._grpc_server.add_insecure_port(f"{self.host}:{self.grpc_port}")
+        self._grpc_server.start()
+
+        self._rest_server = ThreadingHTTPServer((self.host, self.rest_port), self._rest_handler())
+        self._rest_server.daemon_threads = True
+        self.rest_port = self._rest_server.server_address[1]
+        threading.Thread(target=self._rest_server.serve_forever, name="mock-gateway-rest", daemon=True).start()
+        return self.grpc_port, self.rest_port
+
+    def stop(self, grace: Optional[float] = None):
+        if self._grpc_server is not None:
+            self._grpc_server.stop(grace)
+            self._grpc_server = None
+        if self._rest_server is not None:
+            self._rest_server.shutdown()
+            self._rest_server.server_close()
+            self._rest_server = None
+
+    def environment(self) -> Dict[str, str]:
+        """
+        The variables that point client.py at this server.
+        """
+        return {
+            "COMPASS_HOST": f"{self.host}:{self.grpc_port}",
+            "COMPASS_REST_HOST": f"{self.host}:{self.rest_port}",
+            "COMPASS_INSECURE": "1",
+            "COMPASS_API_KEY": self.secret or "any",
+        }
+
+    def configure_client(self):
+        """
+        Point an already imported client module at this server.
+        """
+        import client
+
+        env = self.environment()
+        client.HOST = env["COMPASS_HOST"]
+        client.REST_HOST = env["COMPASS_REST_HOST"]
+        client.INSECURE = True
+        client.SECRET = env["COMPASS_API_KEY"]
+
+
+def echo_road_match(request, response):
+    """
+    RoadMatchPath stand-in: every raw point comes back as its own matched point.
+    """
+    target = next((f for f in response.DESCRIPTOR.fields if f.is_repeated and f.message_type is not None), None)
+    if target is None:
+        return response
+    for raw in getattr(request, "raw_points", []):
+        point = getattr(response, target.name).add()
+        if _set(point, "lat", raw.lat):
+            _set(point, "lng", raw.lng)
+            continue
+        for field in point.DESCRIPTOR.fields:
+            if field.message_type is not None and not field.is_repeated and _set(getattr(point, field.name), "lat", raw.lat):
+                _set(getattr(point, field.name), "lng", raw.lng)
+                break
+    return response
+
+
+def main():
+    mock = MockGateway()
+    mock.start()
+    print("Mock gateway running; point the scripts at it with:")
+    for key, value in mock.environment().items():
+        print(f"  export {key}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
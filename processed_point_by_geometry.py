@@ -1,4 +1,4 @@
-from client import create_gateway_client, get_enum_str
+from client import create_gateway_client, get_enum_str, resumable_stream
 import grpc
 import compassiot.gateway.v1.gateway_pb2_grpc as gateway
 import compassiot.compass.v1.time_pb2 as time
@@ -6,9 +6,20 @@ import compassiot.platform.v1.streaming_pb2 as streaming
 import compassiot.compass.v1.vehicle_pb2 as vehicle
 import json
 # from tinydb import TinyDB, Query
+import os
 import pandas as pd
 import pickle
-from halo import Halo
+import sys
+from time import perf_counter
+from external_sort import ExternalSorter
+from pull_manifest import PullManifest, day_range, filters_hash, geometry_hash, request_days
+from stage_metrics import RunMetrics
+from wire_archive import ArchiveWriter
+
+# Re-decode one message in this many to estimate protobuf decode time inside the stream
+DECODE_SAMPLE_EVERY = 64
+# Budgeted pulls hand rows to the spill in batches of this share of the budget
+SPILL_BATCH_SHARE = 8
 
 def flatten_dict(d, parent_key='', sep='_'):
     items = []
@@ -20,28 +31,92 @@ def flatten_dict(d, parent_key='', sep='_'):
             items.append((new_key, v))
     return dict(items)
 
-def paginate_processed_point(client: gateway.ServiceStub, req: streaming.ProcessedPointByGeometryRequest):
-    stream = client.ProcessedPointByGeometry(req)
-    while True:
-        try:
-            for response in stream:
-                req.last_received_timestamp.CopyFrom(response.timestamp)
-                yield response
-        except grpc.RpcError as e:
-            if e.code() == grpc.StatusCode.DEADLINE_EXCEEDED:
-                print("DeadlineExceed, retrying")
-                stream = client.ProcessedPointByGeometry(req)
-                continue
-            else:
-                raise e
-        break
+def processed_point_to_row(response) -> dict:
+    """
+    Flatten one ProcessedPoint into a TELEMETRY_COLUMNS row, matching
+    flatten_dict() applied to the dict built in pull_linestring_data.
+    """
+    return {
+        "vehicle_type": response.vehicle_type,
+        "timestamp_seconds": response.timestamp.seconds,
+        "timestamp_nanos": response.timestamp.nanos,
+        "road_matched_point_lat": response.road_matched_point.lat,
+        "road_matched_point_lon": response.road_matched_point.lng,
+        "speed_kmh": response.speed,
+        "osm_way_id": response.osm_way_id,
+        "vehicle_id": response.vehicle_id,
+        "trip_id": response.trip_id,
+        "raw_point_lat": response.raw_point.lat,
+        "raw_point_lon": response.raw_point.lng,
+        "transport_type": response.transport_type,
+        "acceleration_x": response.acceleration.x,
+        "acceleration_y": response.acceleration.y,
+        "acceleration_z": response.acceleration.z,
+        "gyro_roll": response.gyro.roll,
+        "gyro_pitch": response.gyro.pitch,
+        "gyro_yaw": response.gyro.yaw,
+        "iri": response.iri,
+        "near_miss_timestamp_seconds": response.near_miss.timestamp.seconds,
+        "near_miss_timestamp_nanos": response.near_miss.timestamp.nanos,
+        "near_miss_type": response.near_miss.type,
+        "bearing": response.bearing,
+        "point_id": response.point_id,
+    }
 
+def processed_point_to_dict(response) -> dict:
+    """
+    Nested dict of a ProcessedPoint; flatten_dict() of it gives the CSV columns.
+    """
+    output = {}
+    output["vehicle_type"] = response.vehicle_type
+    output["timestamp"] = {"seconds":response.timestamp.seconds,"nanos":response.timestamp.nanos}
+    output["road_matched_point"]={"lat":response.road_matched_point.lat,"lon":response.road_matched_point.lng}
+    output["speed_kmh"]=response.speed
+    output["osm_way_id"]=response.osm_way_id
+    output["vehicle_id"]=response.vehicle_id
+    output["trip_id"]=response.trip_id
+    output["raw_point"]={"lat":response.raw_point.lat,"lon":response.raw_point.lng}
+    output["transport_type"]=response.transport_type
+    output["acceleration"]={"x":response.acceleration.x,"y":response.acceleration.y,"z":response.acceleration.z}
+    output["gyro"]={"roll":response.gyro.roll,"pitch":response.gyro.pitch,"yaw":response.gyro.yaw}
+    output["iri"]=response.iri
+    output["near_miss"]={"timestamp":{"seconds":response.near_miss.timestamp.seconds,"nanos":response.near_miss.timestamp.nanos},"type":response.near_miss.type}
+    output["bearing"]=response.bearing
+    output["point_id"]=response.point_id
+    return output
 
-                   
-def pull_linestring_data(linestring,date_range):
-    client = create_gateway_client()
-    count = 0
-    request = streaming.ProcessedPointByGeometryRequest(
+def paginate_processed_point(client: gateway.ServiceStub, req: streaming.ProcessedPointByGeometryRequest, on_retry=None, capture: ArchiveWriter = None):
+    """
+    Capture mode: pass a create_gateway_client(raw=True) client and an ArchiveWriter.
+    Responses are then yielded as their serialized bytes, undecoded, after being
+    appended to the archive; only the last one is decoded, on reconnect, for the
+    resume timestamp. Reconnects are also counted in the client's GatewayMetrics,
+    if it was created with one.
+    """
+    gateway_metrics = getattr(client, "metrics", None)
+    if gateway_metrics is not None:
+        record_retry, caller_on_retry = gateway_metrics.retry_hook("ProcessedPointByGeometry"), on_retry
+
+        def on_retry(code):
+            record_retry(code)
+            if caller_on_retry is not None:
+                caller_on_retry(code)
+
+    def open_stream(last_timestamp):
+        if last_timestamp is not None:
+            req.last_received_timestamp.CopyFrom(last_timestamp)
+        return client.ProcessedPointByGeometry(req)
+
+    if capture is None:
+        yield from resumable_stream(open_stream, cursor=lambda response: response.timestamp, on_retry=on_retry)
+        return
+    cursor = lambda raw: streaming.ProcessedPoint.FromString(raw).timestamp
+    for raw in resumable_stream(open_stream, cursor=cursor, on_retry=on_retry):
+        capture.append(raw)
+        yield raw
+
+def processed_point_request(linestring, date_range) -> streaming.ProcessedPointByGeometryRequest:
+    return streaming.ProcessedPointByGeometryRequest(
         linestring_or_polygon_wkt=linestring,
         #D7 i-75 from OHGO
         #linestring_or_polygon_wkt=
@@ -98,57 +173,266 @@ def pull_linestring_data(linestring,date_range):
 
     )
 
-    with Halo(text="Talking with Compass...",spinner="dots") as spinner:
-        spinner.text = "Talking with Compass..."
-        dataset=[]
-        for response in paginate_processed_point(client, request):
-            ## helper to print enum objects
-            # print("Vehicle Type:", get_enum_str(response, streaming.ProcessedPoint.VEHICLE_TYPE_FIELD_NUMBER, response.vehicle_type))
-            #print(response)
-            output = {}
-            output["vehicle_type"] = response.vehicle_type
-            output["timestamp"] = {"seconds":response.timestamp.seconds,"nanos":response.timestamp.nanos}
-            output["road_matched_point"]={"lat":response.road_matched_point.lat,"lon":response.road_matched_point.lng}
-            output["speed_kmh"]=response.speed
-            output["osm_way_id"]=response.osm_way_id
-            output["vehicle_id"]=response.vehicle_id
-            output["trip_id"]=response.trip_id
-            output["raw_point"]={"lat":response.raw_point.lat,"lon":response.raw_point.lng}
-            output["transport_type"]=response.transport_type
-            output["acceleration"]={"x":response.acceleration.x,"y":response.acceleration.y,"z":response.acceleration.z}
-            output["gyro"]={"roll":response.gyro.roll,"pitch":response.gyro.pitch,"yaw":response.gyro.yaw}
-            output["iri"]=response.iri
-            output["near_miss"]={"timestamp":{"seconds":response.near_miss.timestamp.seconds,"nanos":response.near_miss.timestamp.nanos},"type":response.near_miss.type}
-            output["bearing"]=response.bearing
-            output["point_id"]=response.point_id
-            #outj = json.dumps(output)
-            #print(outj)
-            # db.insert(output)
-            output = flatten_dict(output)
-            dataset.append(output)
-            count = count + 1
-            if(count % 100 == 0):
-                spinner.text = f"Pull amount: {count}"
-                #print(count)
-    print()
+def capture_linestring_data(linestring, date_range, directory: str, metrics: RunMetrics = None) -> int:
+    """
+    Pull straight into a wire archive (see wire_archive.ArchiveReader) without
+    decoding: stage stream_wait covers network + gRPC + archive append.
+    Returns the number of messages captured.
+    """
+    metrics = metrics or RunMetrics("capture")
+    stream = metrics.get("stream_wait")
+
+    def on_retry(code):
+        stream.retries += 1
+
+    client = create_gateway_client(raw=True)
+    count = 0
+    with ArchiveWriter(directory) as archive:
+        for raw in metrics.timed_iter("stream_wait", paginate_processed_point(client, processed_point_request(linestring, date_range), on_retry=on_retry, capture=archive)):
+            count += 1
+            if count % 100 == 0:
+                metrics.progress("stream_wait")
+        metrics.progress("stream_wait", force=True)
+        metrics.end_progress()
+        stream.bytes += archive.raw_bytes
+    print(f"Captured {count} items to {directory} ({archive.compressed_bytes} bytes compressed)")
+    return count
+
+
+                   
+def _row_bytes(row: dict) -> int:
+    return sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row.values())
+
+def pull_linestring_data(linestring,date_range, metrics: RunMetrics = None, spill: ExternalSorter = None):
+    """
+    Stages recorded in metrics: stream_wait (network + gRPC, time inside the stream
+    iterator minus the decode estimate), protobuf_decode (estimated by re-decoding
+    every DECODE_SAMPLE_EVERY-th message) and build_rows (dict building + flatten).
+
+    With spill (an ExternalSorter with a memory budget) rows are not kept in a
+    list: every 1/SPILL_BATCH_SHARE of the budget worth of rows is handed to the
+    spill as a DataFrame (stage spill), which writes sorted runs to disk as its
+    buffer fills. Returns the spill instead of the rows.
+    """
+    client = create_gateway_client()
+    metrics = metrics or RunMetrics("pull")
+    count = 0
+    request = processed_point_request(linestring, date_range)
+
+    stream = metrics.get("stream_wait")
+    build = metrics.get("build_rows")
+    decode_samples, decode_sample_s = 0, 0.0
+
+    def on_retry(code):
+        stream.retries += 1
+
+    dataset=[]
+    batch_rows = None
+    for response in metrics.timed_iter("stream_wait", paginate_processed_point(client, request, on_retry=on_retry)):
+        stream.bytes += response.ByteSize()
+        if count % DECODE_SAMPLE_EVERY == 0:
+            data = response.SerializeToString()
+            start = perf_counter()
+            type(response).FromString(data)
+            decode_sample_s += perf_counter() - start
+            decode_samples += 1
+        start = perf_counter()
+        ## helper to print enum objects
+        # print("Vehicle Type:", get_enum_str(response, streaming.ProcessedPoint.VEHICLE_TYPE_FIELD_NUMBER, response.vehicle_type))
+        #print(response)
+        output = processed_point_to_dict(response)
+        #outj = json.dumps(output)
+        #print(outj)
+        # db.insert(output)
+        output = flatten_dict(output)
+        dataset.append(output)
+        count = count + 1
+        build.wall_s += perf_counter() - start
+        build.items += 1
+        if spill is not None:
+            if batch_rows is None:
+                batch_rows = max(1000, spill.memory_budget // (SPILL_BATCH_SHARE * _row_bytes(output)))
+            if len(dataset) >= batch_rows:
+                with metrics.stage("spill") as stage:
+                    spill.add(pd.DataFrame(dataset))
+                    stage.items += len(dataset)
+                dataset = []
+        if(count % 100 == 0):
+            metrics.progress("stream_wait")
+    metrics.progress("stream_wait", force=True)
+    metrics.end_progress()
+
+    if decode_samples:
+        decode = metrics.get("protobuf_decode")
+        decode.estimated = True
+        decode.wall_s = min(stream.wall_s, decode_sample_s / decode_samples * count)
+        decode.items, decode.bytes = count, stream.bytes
+        stream.wall_s -= decode.wall_s
     print(f"Total items {count}")
+    if spill is not None:
+        with metrics.stage("spill") as stage:
+            if dataset:
+                spill.add(pd.DataFrame(dataset))
+                stage.items += len(dataset)
+            stage.bytes = spill.spilled_bytes
+        print(f"Spilled {spill.spills} run(s), {spill.spilled_bytes / 1e6:,.1f} MB")
+        return spill
     return dataset
 
-def store_datapull(linestring:str, date_range:time.DateTimeRange, filename:str):
-    print("Pulling data from Compass...")
-    dataset = pull_linestring_data(linestring,date_range)
-    
+def store_datapull(linestring:str, date_range:time.DateTimeRange, filename:str, manifest: PullManifest = None, memory_budget=None, sort_by=()):
+    """
+    Pull, then save {filename}.pkl and {filename}.csv. A per-stage performance
+    report is printed and written to {filename}.metrics.json / .prom.
+
+    With a manifest the pull is made one day at a time, only for the days not yet
+    pulled successfully into filename, and their rows are appended to the files
+    (see pull_missing_days). Returns the number of rows pulled.
+
+    With memory_budget (bytes or e.g. "2GiB") the pulled rows are held to about
+    that much memory, the rest spilled to temporary files, and only the CSV is
+    written, streamed from the spill (a .pkl needs the whole frame in memory; a
+    stale one is removed). sort_by (e.g. ["vehicle_id", "timestamp"]) sorts the
+    rows on the way out; by default they keep stream order.
+    """
+    metrics = RunMetrics(filename)
+    if manifest is not None:
+        rows = pull_missing_days(linestring, date_range, filename, manifest, metrics, memory_budget=memory_budget, sort_by=sort_by)
+    elif memory_budget is not None:
+        print("Pulling data from Compass...")
+        with ExternalSorter(sort_by, memory_budget=memory_budget) as spill:
+            pull_linestring_data(linestring, date_range, metrics=metrics, spill=spill)
+            rows = save_spilled_datapull(spill, filename, metrics)
+    else:
+        print("Pulling data from Compass...")
+        dataset = pull_linestring_data(linestring,date_range, metrics=metrics)
+        save_datapull(dataset, filename, metrics)
+        rows = len(dataset)
+    metrics.finish(f"{filename}.metrics")
+    print("Done")
+    return rows
+
+def pull_missing_days(linestring:str, date_range:time.DateTimeRange, filename:str, manifest: PullManifest, metrics: RunMetrics = None, memory_budget=None, sort_by=()) -> int:
+    """
+    Pull the day partitions of date_range that the manifest has no "ok" record of
+    for this geometry, filters and output, append their rows to {filename}.pkl and
+    {filename}.csv, then record each day as ok (with its row count) or failed.
+    Returns the number of rows appended. Existing files with no "ok" partition
+    recorded for this output (e.g. left by a pull without a manifest) are
+    overwritten by the first write rather than appended to.
+
+    With memory_budget each day goes through its own spill and is appended to the
+    CSV (only) as soon as it is complete, so a failed day leaves nothing behind.
+    """
+    metrics = metrics or RunMetrics(filename)
+    geometry = geometry_hash(linestring)
+    filters = filters_hash(processed_point_request(linestring, date_range))
+    exists = os.path.exists(f"{filename}.csv") and (memory_budget is not None or os.path.exists(f"{filename}.pkl"))
+    if not exists:
+        manifest.forget(filename)
+    # Rows already in the files are only kept if the manifest says this pull wrote them
+    append = exists and any(
+        p["status"] == "ok" and p["output"] == filename for p in manifest.partitions(geometry, filters).values()
+    )
+    if exists and not append:
+        print(f"{filename} has no manifest record for this pull; overwriting it")
+    days = manifest.pending(geometry, filters, request_days(date_range), output=filename)
+    print(f"Pulling {len(days)} missing day(s) from Compass...")
+    dataset, pulled = [], []
+    if memory_budget is not None:
+        total = 0
+        for day in days:
+            print(f"Pulling {day}")
+            with ExternalSorter(sort_by, memory_budget=memory_budget) as spill:
+                try:
+                    pull_linestring_data(linestring, day_range(date_range, day), metrics=metrics, spill=spill)
+                except grpc.RpcError as error:
+                    print(f"Pull of {day} failed: {error}")
+                    manifest.record(geometry, day, filters, status="failed", output=filename, error=str(error))
+                    continue
+                count = save_spilled_datapull(spill, filename, metrics, append=append)
+            append = True
+            manifest.record(geometry, day, filters, status="ok", rows=count, output=filename)
+            total += count
+        return total
+    for day in days:
+        print(f"Pulling {day}")
+        try:
+            rows = pull_linestring_data(linestring, day_range(date_range, day), metrics=metrics)
+        except grpc.RpcError as error:
+            print(f"Pull of {day} failed: {error}")
+            manifest.record(geometry, day, filters, status="failed", output=filename, error=str(error))
+            continue
+        dataset.extend(rows)
+        pulled.append((day, len(rows)))
+    if dataset or (pulled and not append):
+        save_datapull(dataset, filename, metrics, append=append)
+    for day, count in pulled:
+        manifest.record(geometry, day, filters, status="ok", rows=count, output=filename)
+    return len(dataset)
+
+def save_datapull(dataset, filename:str, metrics: RunMetrics = None, append: bool = False):
+    """
+    Build the DataFrame from pulled rows and save {filename}.pkl and {filename}.csv
+    (stages dataframe, pickle and csv). With append, rows are added to existing
+    files instead (CSV columns in the existing order). Returns the new rows' DataFrame.
+    """
+    metrics = metrics or RunMetrics(filename)
+    appending = append and os.path.exists(f"{filename}.pkl") and os.path.exists(f"{filename}.csv")
     print("Converting to PD")
-    df_1d = pd.DataFrame(dataset)
+    with metrics.stage("dataframe") as stage:
+        df_1d = pd.DataFrame(dataset)
+        stage.items += len(df_1d)
     print(f"Saving PD to pickle {filename}.pkl")
-    with open(f"{filename}.pkl", 'wb') as file:
-        pickle.dump(df_1d, file)
+    with metrics.stage("pickle") as stage:
+        if appending:
+            with open(f"{filename}.pkl", 'rb') as file:
+                existing = pickle.load(file)
+            df_1d = df_1d.reindex(columns=existing.columns) if len(existing.columns) else df_1d
+            to_pickle = pd.concat([existing, df_1d], ignore_index=True)
+        else:
+            to_pickle = df_1d
+        with open(f"{filename}.pkl", 'wb') as file:
+            pickle.dump(to_pickle, file)
+        stage.items += len(df_1d)
+        stage.bytes += os.path.getsize(f"{filename}.pkl")
     
     print(f"Saving PD to CSV {filename}.csv")
-    with open(f"{filename}.pkl", 'rb') as f:
+    with metrics.stage("csv") as stage:
         df = df_1d
-        df.to_csv(f"{filename}.csv", index=False)
-    print("Done")
+        if appending:
+            df.to_csv(f"{filename}.csv", index=False, mode="a", header=False)
+        else:
+            df.to_csv(f"{filename}.csv", index=False)
+        stage.items += len(df)
+        stage.bytes += os.path.getsize(f"{filename}.csv")
+    return df_1d
+
+def save_spilled_datapull(spill: ExternalSorter, filename:str, metrics: RunMetrics = None, append: bool = False) -> int:
+    """
+    Write the rows of a budgeted pull to {filename}.csv a block at a time, in
+    spill order (stage csv). With append, rows are added to an existing CSV in its
+    column order. No .pkl is written, and an existing one, which would no longer
+    match the CSV, is removed. Returns the number of rows written.
+    """
+    metrics = metrics or RunMetrics(filename)
+    appending = append and os.path.exists(f"{filename}.csv") and os.path.getsize(f"{filename}.csv") > 0
+    if os.path.exists(f"{filename}.pkl"):
+        print(f"Removing {filename}.pkl (budgeted pulls write CSV only)")
+        os.remove(f"{filename}.pkl")
+    columns = pd.read_csv(f"{filename}.csv", nrows=0).columns if appending else None
+    print(f"Saving PD to CSV {filename}.csv")
+    rows = 0
+    with metrics.stage("csv") as stage:
+        if not appending:
+            open(f"{filename}.csv", "w").close()
+        for df in spill.sorted_chunks():
+            if columns is not None and len(columns):
+                df = df.reindex(columns=columns)
+            df.to_csv(f"{filename}.csv", index=False, mode="a", header=rows == 0 and not appending)
+            rows += len(df)
+        stage.items += rows
+        stage.bytes += os.path.getsize(f"{filename}.csv")
+    return rows
     
 if __name__ == "__main__":
     #D7LS = "LINESTRING( -84.1898015470108 39.841716477293716, -84.18979969378638 39.84165140355554, -84.18974870361424 39.84030206333315, -84.18969443099803 39.837729528743985, -84.18962116440345 39.834585971794205, -84.18961847844076 39.8344706907382, -84.1896021012548 39.83378638350034, -84.18937046976048 39.824054583235515, -84.18926660924228 39.81977674376397, -84.1891626382313 39.81549377068289, -84.18910326587923 39.8130277316431, -84.18896343232545 39.80721900977772, -84.1889416104506 39.806291410877805, -84.18893327228811 39.805937007536805, -84.18893331810219 39.805847372988154, -84.18893324893192 39.80576746946502, -84.18893417868823 39.80562764549461, -84.18893579565574 39.80556429319604, -84.18893795700232 39.805480033396044, -84.18894240725625 39.805393848785215, -84.18894625563891 39.80532136546049, -84.18895347180559 39.805209556925234, -84.18896065742955 39.8050964880679, -84.18896630423943 39.805011456841115, -84.18897557844642 39.80491709520259, -84.18898585966485 39.80483055654863, -84.18900249107404 39.80470726165574, -84.18901744173529 39.804596512138055, -84.18903402912701 39.80449546892019, -84.1890504143978 39.80440055379006, -84.18906577558914 39.80431159976464, -84.18908329183888 39.80421513713496, -84.18910001038464 39.804138774787454, -84.1891205907878 39.8040483035392, -84.189141914996 39.80395475837241, -84.18916098263622 39.80387412802172, -84.18918590010557 39.80377467585589, -84.18921005310862 39.803687035706695, -84.18923430312971 39.80359858385907, -84.18926154094744 39.80350810637905, -84.18929601379648 39.803393292153615, -84.18935621080198 39.803193067451105, -84.18943533081894 39.80293032111807, -84.189498335958 39.80272068647769, -84.18955820418013 39.80252136665475, -84.18959572950449 39.80239281568015, -84.18962629019046 39.80229012876618, -84.18965330342938 39.802195240267835, -84.18968373924952 39.80208742048873, -84.18971255810214 39.801985119597624, -84.18973590172311 39.801893076823305, -84.18976341083207 39.8017849391047, -84.1897879815517 39.80168567163635, -84.18980691534296 39.80159477341147, -84.18982653005719 39.80148864147787, -84.18984553391702 39.801386211328676, -84.18986552322873 39.801271425997214, -84.1898885847787 39.80113884911501, -84.18990093481723 39.801051019265664, -84.18991497548511 39.80095100261383, -84.18992799027694 39.800837578916834, -84.18994150093883 39.80072054483935, -84.1899490342108 39.8006411619461, -84.18995913396954 39.8005327344639, -84.18996592163982 39.80041300480578, -84.18997293299061 39.800288046992996, -84.18997664393106 39.800190702217, -84.18998093069159 39.80007857545699, -84.18998207334863 39.79996685432896, -84.1899760052289 39.79958201179507, -84.18996605638712 39.79940306764464, -84.18995294278061 39.79921398997215, -84.18994702467951 39.799143359449396, -84.18994169766987 39.79907785474753, -84.18993417966927 39.799013463228654, -84.18992708567346 39.79895212772834, -84.18991139839366 39.79883506490565, -84.18989604708376 39.798731869542415, -84.18989216456511 39.79870661194626, -84.18987415334367 39.79859003251833, -84.18986305914989 39.79851785467099, -84.18984635857046 39.79842639045502, -84.18982507658305 39.79830976776105, -84.18979923654392 39.79818339263988, -84.18977538806975 39.798066897217176, -84.18974900634649 39.79795665464037, -84.18972164635788 39.79785426340189, -84.18969405190897 39.79774701104913, -84.18967074062736 39.7976574431248, -84.1896379826622 39.79755395887735, -84.18960737346721 39.79745719965037, -84.18956929478063 39.797336586028884, -84.18953689075171 39.797238050640985, -84.18950720412651 39.79714560258331, -84.18947698120708 39.79706478272839, -84.1894396948346 39.79696235427214, -84.18941257469618 39.79688905660542, -84.18938297969912 39.79681002957008, -84.18934365504926 39.79671501755736, -84.18929949027664 39.796608274172186, -84.18924895105874 39.79649387565775, -84.18918569349307 39.7963510145964, -84.18914056842141 39.796257617704065, -84.18908216085994 39.796136576125676, -84.18901208238631 39.79600137969446, -84.18895413206734 39.795889520804494, -84.18888807714787 39.795770931560796, -84.18882905154547 39.79566773574105, -84.18877100241183 39.79556623767159, -84.18869829097609 39.79544279019686, -84.18863164496517 39.79533835289146, -84.18856403326531 39.79523257849329, -84.18850164077726 39.7951349263202, -84.18844241754552 39.79504758782521, -84.18836526843229 39.79493375337864, -84.18831902495809 39.79486640663181, -84.18825268796762 39.79476980168266, -84.18817131138265 39.79465981127082, -84.18815813758901 39.794642987982435, -84.18811202077727 39.794584094706956, -84.18805562274711 39.79451212041048, -84.18800170047386 39.79444110060824, -84.18794735150087 39.794371708265146, -84.18788553034132 39.79429278532109, -84.18780763472809 39.79419625687084, -84.18768566327545 39.79404946644316, -84.18757776752499 39.79391967931961, -84.18743006023776 39.793742090530145, -84.18729883074779 39.79358426312311, -84.18717313398166 39.79343302149779, -84.18705032170591 39.79328516165828, -84.18692895931103 39.79313926244346, -84.18683922569899 39.7930311930974, -84.18673433211819 39.79290469507886, -84.18658036447177 39.792719177713515, -84.18642410971462 39.79253081124475, -84.18627494536 39.792355493892465, -84.18616688701448 39.79222840999907, -84.186089600459 39.79213754759092, -84.18598016409784 39.792005100812254, -84.1859572696345 39.79197739176951, -84.1858348068034 39.79182925546481, -84.18567264382662 39.79163304468846, -84.18555583229696 39.791491583013695, -84.18540798577088 39.79131264266205, -84.1852523239018 39.79112435517166, -84.1851018318372 39.790942209716285, -84.18493750931049 39.79074341693166, -84.1847663299432 39.79053625491171, -84.18469249651169 39.79044317937608, -84.18462366579799 39.79035417554441, -84.18456005339777 39.7902684296177, -84.184437209681 39.79008984916121, -84.18435779501661 39.789968747030116, -84.18427532428365 39.78982264612697, -84.18421710985997 39.78971385093464, -84.18415066686829 39.78957382520697, -84.18409371547591 39.78943510379867, -84.18405408000895 39.78932198760627, -84.18401607049263 39.7892036231116, -84.18398684200824 39.78910071632592, -84.18395915413457 39.78899391418565, -84.18393638992694 39.78888307792782, -84.18391673928011 39.788765800549086, -84.18390010068441 39.78863298488428, -84.18388551563746 39.78841546304386, -84.18388183973131 39.788360652260735, -84.18388465145814 39.78825476221025, -84.18389130887272 39.78812926873921, -84.18389789532038 39.78806359271216, -84.18390802382521 39.78798020883472, -84.18392264749973 39.787894417841876, -84.1839392205184 39.78780229339361, -84.18395497427355 39.787714955252234, -84.18397726956057 39.787618063455106, -84.18399545325856 39.787539428204624, -84.1840200293681 39.787445116452425, -84.18404609039281 39.787359071456734, -84.18407263740609 39.787273829849255, -84.18410394459205 39.78717293513224, -84.18414519433158 39.787048655289965, -84.1841860074899 39.78692564328963, -84.18422606965662 39.78680534392186, -84.18426461007725 39.78668975146141, -84.1842926842265 39.786609712470046, -84.18432341469406 39.78653332919314, -84.18440999701609 39.786323266978464, -84.1844536192063 39.78619571013102, -84.18452471816609 39.78598280767566, -84.18459745385631 39.78576997221115, -84.18465241009045 39.78560414589441, -84.18470268610196 39.78545244078579, -84.18474975782286 39.7853082583225, -84.18480553421884 39.78513773540473, -84.18486173731459 39.78496558568999, -84.18490819638446 39.78482024109976, -84.18493754164983 39.784715590236694, -84.18496819935386 39.784602453168546, -84.1849938094243 39.784497856509276, -84.18502061515237 39.7843847749988, -84.1850414003714 39.7842931297644, -84.18506640587567 39.784182866492266, -84.18509139610855 39.784062333832644, -84.18511125426622 39.783961332928804, -84.18513125705266 39.78384699829086, -84.18514845619708 39.78373261306925, -84.18516328828075 39.783626550217775, -84.18517702980964 39.78351888150406, -84.18519048747092 39.783404279664566, -84.18522027111416 39.78314404715885, -84.18523754122549 39.78299382912279, -84.1852535510005 39.78285457600705, -84.18529431744639 39.78249815484133, -84.18532556354691 39.782226009178274, -84.18536488460353 39.781862942278465, -84.18540438622153 39.7814977106075, -84.1854362341933 39.781202224419005, -84.1854638232523 39.78094787781106, -84.18548252168493 39.78070248830317, -84.18549500197918 39.78053790415071, -84.18550520863745 39.780404791627234, -84.18551646452795 39.7802813038278, -84.18552748416154 39.780172142154406, -84.18555494476146 39.77991734783627, -84.18559387055936 39.779557348478335, -84.18562400813883 39.77927810247894, -84.18565900201071 39.77895347306708, -84.18569319368706 39.77863912526271, -84.18572700088447 39.77832820582187, -84.18575909409631 39.77803334669779, -84.1857896628671 39.77775265230223, -84.18581619550733 39.77751264470007, -84.18584227000676 39.77727786802753, -84.18587137811693 39.77701404095861, -84.18589792333356 39.776774573430245, -84.18592541896778 39.77652617341157, -84.18594899076085 39.77631341363738, -84.1859673846646 39.77614721242708, -84.18598129238183 39.776032063940306, -84.18599149454852 39.775947056845304, -84.18600124486261 39.77587719087224, -84.18600967016165 39.775815271372814, -84.18601609221761 39.77576707359802, -84.18603132674652 39.77566812068727, -84.18604710116291 39.77558186212739, -84.18606154517438 39.77550814538628, -84.18608210401797 39.77541695297423, -84.18610076472136 39.77533416685347, -84.18612079355893 39.77525964828218, -84.1861398755722 39.775189467474874, -84.18615855873348 39.77513172364908, -84.18617648192003 39.77507633338567, -84.18619937368842 39.77501402515452, -84.18621953368 39.774959413581215, -84.1862448697643 39.77489680008179, -84.18626437129078 39.774848773576736, -84.18628917197915 39.77478814974927, -84.18631549890519 39.77472786348106, -84.18633940846478 39.77467382817718, -84.18636526916518 39.77461841407111, -84.18639344841733 39.77456233504977, -84.18642163036444 39.77450634642738, -84.18645229705159 39.77445176344877, -84.18647971992227 39.77440299305336, -84.1865253830848 39.774326482997644, -84.18656553867632 39.77426356582849, -84.18660434320165 39.77420273919266, -84.1866455120928 39.774138276059354, -84.18667543677154 39.77409163124745, -84.18670929337628 39.77404339774459, -84.18674348415433 39.77399452971035, -84.18678301362009 39.7739395479522, -84.1868149172874 39.773897469461666, -84.18685566846194 39.77384472252612, -84.18690080611002 39.77378993051489, -84.18693490166663 39.77375208699493, -84.18697243148257 39.77371043438178, -84.18704428233227 39.77363066405798, -84.18711045133776 39.773557281464655, -84.18718436471934 39.77348072490072, -84.18724332025313 39.77342285053144, -84.18729646278871 39.773370826110316, -84.1873536558279 39.77331730134868, -84.18744589753622 39.77323632991263)"
@@ -1,12 +1,431 @@
-from client import create_gateway_client, get_enum_str
+from client import RETRYABLE_STREAM_CODES, backoff_delay, create_gateway_client, get_enum_str
+
+import asyncio
+import calendar
+import json
+import os
+import random
+import sys
+import time as clock
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
 
 import grpc
+import requests
+from requests.adapters import HTTPAdapter
 import compassiot.gateway.v1.gateway_pb2_grpc as gateway
 import compassiot.compass.v1.time_pb2 as time
 import compassiot.platform.v1.streaming_pb2 as streaming
 import compassiot.compass.v1.vehicle_pb2 as vehicle
 import compassiot.compass.v1.file_pb2 as file
 
+# Export status enum names (matched by substring) that mean the job will never produce files
+FAILED_STATUS_WORDS = ("FAIL", "ERROR", "CANCEL", "EXPIRED")
+
+
+def month_ranges(date_range: time.DateTimeRange) -> List[time.DateTimeRange]:
+    """
+    Split a DateTimeRange into one range per calendar month, keeping its
+    day_of_week / hour_of_day / exclude_date filters.
+    """
+    first = date(date_range.start.year, date_range.start.month, date_range.start.day)
+    last = date(date_range.end.year, date_range.end.month, date_range.end.day)
+    out = []
+    year, month = first.year, first.month
+    while (year, month) <= (last.year, last.month):
+        lo = max(first, date(year, month, 1))
+        hi = min(last, date(year, month, calendar.monthrange(year, month)[1]))
+        part = time.DateTimeRange()
+        part.CopyFrom(date_range)
+        part.start.CopyFrom(time.LocalDate(day=lo.day, month=lo.month, year=lo.year))
+        part.end.CopyFrom(time.LocalDate(day=hi.day, month=hi.month, year=hi.year))
+        out.append(part)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return out
+
+
+def export_urls(response) -> List[str]:
+    """
+    Every http(s) URL found in the string fields of an export response (recursively).
+    """
+    urls = []
+    for field, value in response.ListFields():
+        values = value if field.is_repeated else [value]
+        for v in values:
+            if field.type == field.TYPE_STRING and v.startswith(("https://", "http://")):
+                urls.append(v)
+            elif field.type == field.TYPE_MESSAGE:
+                urls.extend(export_urls(v))
+    return urls
+
+
+def export_status(response) -> Optional[str]:
+    """
+    Name of the first enum field whose name mentions status/state, if any.
+    """
+    for field, value in response.ListFields():
+        if field.enum_type is not None and ("status" in field.name or "state" in field.name):
+            return field.enum_type.values_by_number[value].name
+    return None
+
+
+def export_id(response) -> Optional[str]:
+    """
+    The first non-empty string field whose name is "id" or ends in "_id", if any
+    (the handle a status call looks the export up by).
+    """
+    for field, value in response.ListFields():
+        if field.type == field.TYPE_STRING and not field.is_repeated and (field.name == "id" or field.name.endswith("_id")) and value:
+            return value
+    return None
+
+
+class ExportJob:
+    """
+    One server-side export (e.g. corridor x month) and where it got to.
+    """
+
+    def __init__(self, name: str, request: streaming.ProcessedPointByGeometryFileExportRequest):
+        self.name = name
+        self.request = request
+        self.state = "pending"  # pending -> submitted -> downloading -> done | failed
+        self.status: Optional[str] = None
+        self.polls = 0
+        self.urls: List[str] = []
+        self.export_id: Optional[str] = None
+        self.files: List[Path] = []
+        self.bytes = 0
+        self.error: Optional[str] = None
+        self.submitted_at: Optional[float] = None
+        self.ready_at: Optional[float] = None
+        self.done_at: Optional[float] = None
+
+    def report(self) -> Dict[str, Any]:
+        def elapsed(a, b):
+            return None if a is None or b is None else round(b - a, 3)
+        return {
+            "name": self.name,
+            "state": self.state,
+            "status": self.status,
+            "export_id": self.export_id,
+            "polls": self.polls,
+            "files": [str(f) for f in self.files],
+            "bytes": self.bytes,
+            "wait_s": elapsed(self.submitted_at, self.ready_at),
+            "download_s": elapsed(self.ready_at, self.done_at),
+            "error": self.error,
+        }
+
+
+def download_file(
+    url: str,
+    dest: Path,
+    *,
+    session: Optional[requests.Session] = None,
+    part_size: int = 16 * 1024 * 1024,
+    workers: int = 4,
+    timeout: float = 300,
+) -> int:
+    """
+    Download url to dest with parallel HTTP range requests.
+
+    Data goes to dest + ".partial" and finished part numbers to dest + ".parts.json",
+    so an interrupted download resumes with the missing parts only. Servers without
+    range support get a plain single-stream download. Returns the file size.
+    """
+    session = session or requests.Session()
+    dest = Path(dest)
+    if dest.exists():
+        return dest.stat().st_size
+    partial = dest.with_name(dest.name + ".partial")
+    progress = dest.with_name(dest.name + ".parts.json")
+
+    # Presigned export URLs are signed for GET only (HEAD gets a 403), so probe
+    # with a one-byte range request; the total size comes from Content-Range.
+    probe = session.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=timeout)
+    try:
+        probe.raise_for_status()
+        size = 0
+        if probe.status_code == 206:
+            total = probe.headers.get("Content-Range", "").rpartition("/")[2]
+            size = int(total) if total.isdigit() else 0
+        if probe.status_code != 206 or size == 0:
+            # No usable range support: a 200 already carries the whole body
+            response = probe if probe.status_code == 200 else session.get(url, stream=True, timeout=timeout)
+            with response:
+                response.raise_for_status()
+                with open(partial, "wb") as f:
+                    for block in response.iter_content(1024 * 1024):
+                        f.write(block)
+            os.replace(partial, dest)
+            return dest.stat().st_size
+    finally:
+        probe.close()
+
+    parts = [(start, min(size, start + part_size) - 1) for start in range(0, size, part_size)]
+    done = set()
+    if partial.exists() and progress.exists() and partial.stat().st_size == size:
+        saved = json.loads(progress.read_text())
+        if saved.get("url") == url and saved.get("size") == size and saved.get("part_size") == part_size:
+            done = set(saved["done"])
+    else:
+        with open(partial, "wb") as f:
+            f.truncate(size)
+
+    def fetch(index: int):
+        start, end = parts[index]
+        with session.get(url, headers={"Range": f"bytes={start}-{end}"}, stream=True, timeout=timeout) as response:
+            if response.status_code != 206:
+                raise IOError(f"Expected 206 for range {start}-{end}, got {response.status_code}")
+            with open(partial, "r+b") as f:
+                f.seek(start)
+                for block in response.iter_content(1024 * 1024):
+                    f.write(block)
+        return index
+
+    todo = [i for i in range(len(parts)) if i not in done]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for index in pool.map(fetch, todo):
+            done.add(index)
+            progress.write_text(json.dumps({"url": url, "size": size, "part_size": part_size, "done": sorted(done)}))
+
+    os.replace(partial, dest)
+    progress.unlink(missing_ok=True)
+    return size
+
+
+def csv_to_parquet(path: Path) -> Path:
+    """
+    Convert a downloaded CSV export to Parquet next to it (requires pyarrow).
+    """
+    import pyarrow.csv
+    import pyarrow.parquet
+
+    out = Path(path).with_suffix(".parquet")
+    reader = pyarrow.csv.open_csv(path)
+    with pyarrow.parquet.ParquetWriter(out, reader.schema) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+    return out
+
+
+def import_to_db_sink(connect: Callable[[], Any], *, district: int, source: str = "file export"):
+    """
+    on_file callback importing each downloaded CSV into vehicle_telemetry with its
+    own import_metadata row (route = the job's WKT).
+    """
+    from csv_import_lib import import_csv, insert_metadata
+    from datetime import datetime
+    from realtime_sink import route_linestring_for
+
+    def sink(job: ExportJob, path: Path):
+        conn = connect()
+        try:
+            metadata_id = insert_metadata(
+                conn,
+                district=district,
+                downloaded_at=datetime.now(),
+                source=source,
+                route_linestring=route_linestring_for(job.request.linestring_or_polygon_wkt),
+                filename=str(path),
+            )
+            return import_csv(conn, csv_path=str(path), metadata_id=metadata_id)
+        finally:
+            conn.close()
+
+    return sink
+
+
+class ExportPipeline:
+    """
+    Bulk historical backfill through ProcessedPointByGeometryFileExport.
+
+    Jobs are submitted max_jobs at a time, each exactly once. A job whose
+    response (or server-streamed status updates) carries no download URLs yet is
+    polled with jittered, growing intervals through status_call(export_id), where
+    export_id is the id field of the submit response. The gateway has no such
+    lookup RPC in this client, so status_call must be supplied. Otherwise
+    resubmit_to_poll=True polls the old way, by re-sending the same export
+    request. That is only safe if the gateway deduplicates identical export
+    requests, which has not been verified: each re-send may start a new export
+    that counts against quota. Without either, a job that is not ready on submit
+    fails with a message saying so. Files are fetched with parallel range
+    requests into out_dir, and each finished file is handed to on_file(job, path)
+    (e.g. import_to_db_sink or csv_to_parquet) in a worker thread while other
+    jobs keep polling and downloading. Rerunning a pipeline skips files that are
+    already complete and resumes partial downloads.
+
+    Example:
+      pipeline = ExportPipeline(on_file=lambda job, path: csv_to_parquet(path))
+      pipeline.add_corridor_months({"D4": d4_wkt, "D7": d7_wkt}, date_range)
+      asyncio.run(pipeline.run())
+      print(pipeline.report())
+    """
+
+    def __init__(
+        self,
+        client=None,
+        *,
+        out_dir: str = "exports",
+        max_jobs: int = 8,
+        max_downloads: int = 4,
+        download_workers: int = 4,
+        part_size: int = 16 * 1024 * 1024,
+        poll_s: float = 15.0,
+        poll_max_s: float = 120.0,
+        job_timeout_s: float = 6 * 3600,
+        max_retries: int = 5,
+        on_file: Optional[Callable[[ExportJob, Path], Any]] = None,
+        status_call: Optional[Callable[[str], Any]] = None,
+        resubmit_to_poll: bool = False,
+    ):
+        self.client = client or create_gateway_client()
+        self.status_call = status_call
+        self.resubmit_to_poll = resubmit_to_poll
+        self.out_dir = Path(out_dir)
+        self.max_jobs = max_jobs
+        self.max_downloads = max_downloads
+        self.download_workers = download_workers
+        self.part_size = part_size
+        self.poll_s = poll_s
+        self.poll_max_s = poll_max_s
+        self.job_timeout_s = job_timeout_s
+        self.max_retries = max_retries
+        self.on_file = on_file
+        self.jobs: List[ExportJob] = []
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=max_downloads * download_workers))
+
+    def add(self, name: str, request: streaming.ProcessedPointByGeometryFileExportRequest) -> ExportJob:
+        job = ExportJob(name, request)
+        self.jobs.append(job)
+        return job
+
+    def add_corridor_months(self, corridors: Dict[str, str], date_range: time.DateTimeRange, *, file_type=file.CSV, **request_fields):
+        """
+        One job per corridor WKT x calendar month of date_range.
+        """
+        for name, wkt in corridors.items():
+            for part in month_ranges(date_range):
+                request = streaming.ProcessedPointByGeometryFileExportRequest(
+                    linestring_or_polygon_wkt=wkt,
+                    date_time_range=part,
+                    file_type=file_type,
+                    **request_fields,
+                )
+                self.add(f"{name}_{part.start.year:04d}-{part.start.month:02d}", request)
+
+    @staticmethod
+    def _responses(response) -> List[Any]:
+        if hasattr(response, "DESCRIPTOR"):
+            return [response]
+        return list(response)  # server-streamed status updates
+
+    def _submit(self, job: ExportJob) -> List[Any]:
+        return self._responses(self.client.ProcessedPointByGeometryFileExport(job.request))
+
+    def _poll(self, job: ExportJob) -> List[Any]:
+        if self.status_call is not None and job.export_id:
+            return self._responses(self.status_call(job.export_id))
+        return self._submit(job)  # resubmit_to_poll
+
+    async def _submit_and_wait(self, job: ExportJob):
+        attempt = 0
+        deadline = clock.monotonic() + self.job_timeout_s
+        job.submitted_at = clock.time()
+        submitted = False
+        while True:
+            try:
+                responses = await asyncio.to_thread(self._poll if submitted else self._submit, job)
+                attempt = 0
+            except grpc.RpcError as error:
+                if error.code() not in RETRYABLE_STREAM_CODES or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                await asyncio.sleep(backoff_delay(attempt, self.poll_s, self.poll_max_s))
+                continue
+            job.state = "submitted"
+            if submitted:
+                job.polls += 1
+            submitted = True
+            for response in responses:
+                job.status = export_status(response) or job.status
+                job.export_id = job.export_id or export_id(response)
+                job.urls.extend(u for u in export_urls(response) if u not in job.urls)
+            if job.urls:
+                job.ready_at = clock.time()
+                return
+            if job.status and any(word in job.status for word in FAILED_STATUS_WORDS):
+                raise RuntimeError(f"export {job.name} ended with status {job.status}")
+            if not (self.status_call is not None and job.export_id) and not self.resubmit_to_poll:
+                raise RuntimeError(
+                    f"export {job.name} is not ready (status {job.status}) and cannot be polled: pass status_call "
+                    "(and get an export id back), or resubmit_to_poll=True if re-sending the request is safe"
+                )
+            if clock.monotonic() > deadline:
+                raise TimeoutError(f"export {job.name} not ready after {self.job_timeout_s:.0f}s")
+            # Poll slowly: exports take minutes, and polls count against the rate limit
+            interval = min(self.poll_max_s, self.poll_s * (1.5 ** min(job.polls, 10)))
+            await asyncio.sleep(random.uniform(0.5, 1.0) * interval)
+
+    async def _download(self, url: str, dest: Path) -> int:
+        attempt = 0
+        while True:
+            try:
+                return await asyncio.to_thread(
+                    download_file, url, dest,
+                    session=self.session, part_size=self.part_size, workers=self.download_workers,
+                )
+            except (requests.RequestException, IOError) as error:
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                print(f"Download of {dest.name} failed ({error}), resuming", file=sys.stderr)
+                await asyncio.sleep(backoff_delay(attempt))
+
+    async def _run_job(self, job: ExportJob, jobs: asyncio.Semaphore, downloads: asyncio.Semaphore):
+        try:
+            async with jobs:
+                await self._submit_and_wait(job)
+            job.state = "downloading"
+            for i, url in enumerate(job.urls):
+                suffix = Path(url.split("?")[0]).suffix or ".csv"
+                dest = self.out_dir / f"{job.name}_{i}{suffix}" if len(job.urls) > 1 else self.out_dir / f"{job.name}{suffix}"
+                async with downloads:
+                    job.bytes += await self._download(url, dest)
+                job.files.append(dest)
+                if self.on_file is not None:
+                    await asyncio.to_thread(self.on_file, job, dest)
+            job.done_at = clock.time()
+            job.state = "done"
+        except Exception as error:
+            job.state = "failed"
+            job.error = f"{type(error).__name__}: {error}"
+            print(f"[{job.name}] {job.error}", file=sys.stderr)
+
+    async def run(self) -> List[ExportJob]:
+        """
+        Run every job that isn't done yet; failures are recorded on the job.
+        """
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        jobs = asyncio.Semaphore(self.max_jobs)
+        downloads = asyncio.Semaphore(self.max_downloads)
+        await asyncio.gather(*(self._run_job(job, jobs, downloads) for job in self.jobs if job.state != "done"))
+        return self.jobs
+
+    def report(self) -> Dict[str, Any]:
+        finished = [job for job in self.jobs if job.state == "done"]
+        return {
+            "jobs": len(self.jobs),
+            "done": len(finished),
+            "failed": sum(job.state == "failed" for job in self.jobs),
+            "bytes": sum(job.bytes for job in self.jobs),
+            "details": [job.report() for job in self.jobs],
+        }
+
+
 def main():
     client = create_gateway_client()
 
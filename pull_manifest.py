@@ -0,0 +1,171 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+_NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+# DayOfWeek enum names in date.weekday() order
+WEEKDAY_NAMES = ("MONDAY", "TUESDAY", "WEDNESDAY", "THURSDAY", "FRIDAY", "SATURDAY", "SUNDAY")
+
+
+def normalize_geometry_wkt(wkt: str) -> str:
+    """
+    Canonical form of a WKT string: upper-case keywords, no optional whitespace,
+    numbers written as repr(float), so formatting differences hash the same.
+    """
+    s = re.sub(r"\s+", " ", wkt.strip().upper())
+    s = re.sub(r"\s*([(),])\s*", r"\1", s)
+    return _NUMBER.sub(lambda m: repr(float(m.group(0))), s)
+
+
+def geometry_hash(wkt: str) -> str:
+    return hashlib.sha256(normalize_geometry_wkt(wkt).encode("utf-8")).hexdigest()
+
+
+def filters_hash(request: Any) -> str:
+    """
+    Hash of everything in a ProcessedPointByGeometryRequest except the geometry,
+    the dates and the resume position: hours, days of week, filters, vehicle types.
+    """
+    request = type(request).FromString(request.SerializeToString())
+    request.ClearField("linestring_or_polygon_wkt")
+    request.ClearField("last_received_timestamp")
+    for name in ("start", "end", "exclude_date"):
+        request.date_time_range.ClearField(name)
+    return hashlib.sha256(request.SerializeToString(deterministic=True)).hexdigest()
+
+
+def _local_date(value) -> date:
+    return date(value.year, value.month or 1, value.day or 1)
+
+
+def request_days(date_range: Any, today: Optional[date] = None) -> List[date]:
+    """
+    Days of a DateTimeRange (start and end inclusive) that its day_of_week and
+    exclude_date leave in, up to yesterday: days from today on are still being
+    filled and are never treated as complete partitions. An unset end (year 0)
+    also stops at yesterday.
+    """
+    today = today or date.today()
+    names = date_range.DESCRIPTOR.fields_by_name["day_of_week"].enum_type.values_by_number
+    weekdays = {WEEKDAY_NAMES.index(names[v].name) for v in date_range.day_of_week if names[v].name in WEEKDAY_NAMES}
+    excluded = {_local_date(d) for d in date_range.exclude_date if d.year}
+    if not date_range.start.year:
+        raise ValueError("DateTimeRange has no start date")
+    end = today - timedelta(days=1)
+    if date_range.end.year:  # an unset end means up to yesterday
+        end = min(_local_date(date_range.end), end)
+    day = _local_date(date_range.start)
+    days = []
+    while day <= end:
+        if day not in excluded and (not weekdays or day.weekday() in weekdays):
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def day_range(date_range: Any, day: date) -> Any:
+    """
+    Copy of a DateTimeRange restricted to one day (hours and days of week kept).
+    """
+    single = type(date_range)()
+    single.CopyFrom(date_range)
+    single.ClearField("exclude_date")
+    for bound in (single.start, single.end):
+        bound.year, bound.month, bound.day = day.year, day.month, day.day
+    return single
+
+
+class PullManifest:
+    """
+    Record of which day partitions of a pull have been fetched, in a sqlite file.
+
+    A partition is keyed by geometry_hash(wkt) x day x filters_hash(request) and
+    holds its status ("ok" or "failed"), row count, output location and error.
+    store_datapull(..., manifest=PullManifest()) uses it to pull only the days
+    that are missing or failed for the output it appends to. It also records how
+    many rows of each output's CSV were imported into a destination, so the job
+    runner imports only the rows that later pulls appended.
+
+    Example:
+      manifest = PullManifest("pull_manifest.sqlite")
+      store_datapull(linestring, date_range, "August_2025_D4", manifest=manifest)
+    """
+
+    def __init__(self, path: str = "pull_manifest.sqlite"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS partitions ("
+            " geometry TEXT NOT NULL, day TEXT NOT NULL, filters TEXT NOT NULL, status TEXT NOT NULL,"
+            " rows INTEGER NOT NULL, output TEXT, pulled_at REAL NOT NULL, error TEXT,"
+            " PRIMARY KEY (geometry, day, filters))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS imports ("
+            " output TEXT NOT NULL, destination TEXT NOT NULL, rows INTEGER NOT NULL, imported_at REAL NOT NULL,"
+            " PRIMARY KEY (output, destination))"
+        )
+
+    def partitions(self, geometry: str, filters: str) -> Dict[date, Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT day, status, rows, output, pulled_at, error FROM partitions WHERE geometry = ? AND filters = ?",
+                (geometry, filters),
+            ).fetchall()
+        return {
+            date.fromisoformat(day): {"status": status, "rows": count, "output": output, "pulled_at": pulled_at, "error": error}
+            for day, status, count, output, pulled_at, error in rows
+        }
+
+    def pending(self, geometry: str, filters: str, days: Iterable[date], output: Optional[str] = None) -> List[date]:
+        """
+        Days without an "ok" partition (written to output, when given).
+        """
+        done = {
+            day for day, p in self.partitions(geometry, filters).items()
+            if p["status"] == "ok" and (output is None or p["output"] == output)
+        }
+        return [day for day in days if day not in done]
+
+    def record(self, geometry: str, day: date, filters: str, *, status: str, rows: int = 0, output: Optional[str] = None, error: Optional[str] = None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO partitions (geometry, day, filters, status, rows, output, pulled_at, error)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (geometry, day.isoformat(), filters, status, rows, output, time.time(), error),
+            )
+
+    def imported_rows(self, output: str, destination: str) -> Optional[int]:
+        """
+        Leading rows of output's CSV already imported into destination, if recorded.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT rows FROM imports WHERE output = ? AND destination = ?", (output, destination)
+            ).fetchone()
+        return row[0] if row else None
+
+    def record_import(self, output: str, destination: str, rows: int):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO imports (output, destination, rows, imported_at) VALUES (?, ?, ?, ?)",
+                (output, destination, rows, time.time()),
+            )
+
+    def forget(self, output: str):
+        """
+        Drop every partition and import recorded for output (e.g. after deleting its files).
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM partitions WHERE output = ?", (output,))
+            self._conn.execute("DELETE FROM imports WHERE output = ?", (output,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,7 +1,6 @@
 # from tinydb import TinyDB, Query
 import pandas as pd
 # from flatten_json import flatten
-import pickle
 
 # def flatten_dict(d, parent_key='', sep='_'):
 #     items = []
@@ -18,12 +17,13 @@ import pickle
 
 
 
+from external_sort import sort_convert
+
 dataset = []
 file_path = 'March2025_SB_D4' # Replace with the actual path to your .pkl file
-with open(f"{file_path}.pkl", 'rb') as f:
-    df = pickle.load(f)
-    df_sort = df.sort_values(by='vehicle_id')
-    df_sort.to_csv(f"{file_path}.csv", index=False)
+# sorted with spill files, so months larger than memory work too
+# (python external_sort.py <in> <out> --by vehicle_id timestamp --memory 2GiB for other keys/formats)
+sort_convert(f"{file_path}.pkl", f"{file_path}.csv", by=['vehicle_id'], memory_budget='1GiB')
 
 # for item in alldata:
     #print(item)
@@ -0,0 +1,283 @@
+import asyncio
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+import grpc
+
+from client import (
+    REST_HOST,
+    RETRYABLE_STREAM_CODES,
+    SHORT_TIMEOUT_SEC,
+    AsyncAccessTokenInterceptor,
+    api_secret,
+    backoff_delay,
+    create_async_gateway_client,
+)
+import compassiot.platform.v1.streaming_pb2 as streaming
+
+# Realtime streams also reconnect after token expiry and transport resets
+RETRYABLE_CODES = set(RETRYABLE_STREAM_CODES) | {grpc.StatusCode.UNKNOWN, grpc.StatusCode.UNAUTHENTICATED}
+
+
+class Subscription:
+    """
+    One realtime streaming RPC watched by a RealtimeHub, plus its running stats.
+    """
+
+    def __init__(self, name: str, rpc: str, request: Any, timeout: Optional[float]):
+        self.name = name
+        self.rpc = rpc
+        self.request = request
+        self.timeout = timeout
+        self.messages = 0
+        self.connects = 0
+        self.reconnects = 0
+        self.dropped = 0
+        self.last_message_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.running = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "rpc": self.rpc,
+            "running": self.running,
+            "messages": self.messages,
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+            "dropped": self.dropped,
+            "last_message_at": self.last_message_at,
+            "last_error": self.last_error,
+        }
+
+
+class Consumer:
+    """
+    A bounded queue of (subscription_name, response) tuples fed by the hub.
+
+    overflow="block" makes the producing subscriptions wait for the consumer
+    (backpressure); overflow="drop_oldest" keeps the freshest messages instead.
+    """
+
+    def __init__(self, names: Optional[Iterable[str]], maxsize: int, overflow: str):
+        if overflow not in ("block", "drop_oldest"):
+            raise ValueError(f"overflow must be 'block' or 'drop_oldest', got {overflow!r}")
+        self.names = set(names) if names is not None else None
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.overflow = overflow
+        self.dropped = 0
+
+    def wants(self, name: str) -> bool:
+        return self.names is None or name in self.names
+
+    async def put(self, item) -> bool:
+        if self.overflow == "block":
+            await self.queue.put(item)
+            return True
+        dropped = False
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return not dropped
+            except asyncio.QueueFull:
+                self.queue.get_nowait()
+                self.dropped += 1
+                dropped = True
+
+
+class RealtimeHub:
+    """
+    Runs many RealtimeRawPointByGeometry / RealtimeTrajectoryByPath subscriptions
+    concurrently on one asyncio event loop over a single grpc.aio channel.
+
+    Each subscription reconnects on its own with jittered exponential backoff, so
+    a gateway hiccup doesn't make 200 corridors reconnect in lock step. Messages
+    are fanned out to every registered consumer through bounded queues.
+
+    Example:
+      hub = RealtimeHub()
+      for name, wkt in corridors.items():
+          hub.subscribe_trajectory(name, wkt)
+      consumer = hub.add_consumer()
+      async def main():
+          await hub.start()
+          while True:
+              name, response = await consumer.get()
+    """
+
+    def __init__(
+        self,
+        client=None,
+        auth: Optional[AsyncAccessTokenInterceptor] = None,
+        *,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+    ):
+        if client is None:
+            auth = auth or AsyncAccessTokenInterceptor(REST_HOST, api_secret())
+            client = create_async_gateway_client(auth)
+        self.client = client
+        self.auth = auth
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.subscriptions: Dict[str, Subscription] = {}
+        self.consumers: List[Consumer] = []
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._callbacks: List[tuple] = []
+        self._consumer_tasks: List[asyncio.Task] = []
+        self._started = False
+
+    def subscribe(self, name: str, rpc: str, request: Any, *, timeout: Optional[float] = SHORT_TIMEOUT_SEC) -> Subscription:
+        """
+        Register a streaming RPC (by ServiceStub method name). If the hub is already
+        running the subscription starts immediately.
+        """
+        if name in self.subscriptions:
+            raise ValueError(f"Subscription '{name}' already exists")
+        sub = Subscription(name, rpc, request, timeout)
+        self.subscriptions[name] = sub
+        if self._started:
+            self._tasks[name] = asyncio.get_running_loop().create_task(self._run_subscription(sub))
+        return sub
+
+    def subscribe_geometry(self, name: str, bounds_wkt: str, *, stream_env=None, **kwargs) -> Subscription:
+        request = streaming.RealtimeRawPointByGeometryRequest(bounds_wkt=bounds_wkt)
+        if stream_env is not None:
+            request.stream_env = stream_env
+        return self.subscribe(name, "RealtimeRawPointByGeometry", request, **kwargs)
+
+    def subscribe_trajectory(self, name: str, linestring_wkt: str, **kwargs) -> Subscription:
+        request = streaming.RealtimeTrajectoryByPath(linestring_wkt=linestring_wkt)
+        return self.subscribe(name, "RealtimeTrajectoryByPath", request, **kwargs)
+
+    async def unsubscribe(self, name: str):
+        task = self._tasks.pop(name, None)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self.subscriptions.pop(name, None)
+
+    def add_consumer(
+        self,
+        callback: Optional[Callable[[str, Any], Awaitable[None]]] = None,
+        *,
+        names: Optional[Iterable[str]] = None,
+        maxsize: int = 10_000,
+        overflow: str = "block",
+    ) -> asyncio.Queue:
+        """
+        Register a consumer for all subscriptions (or only those in names).
+
+        Returns the consumer's queue of (name, response). If an async callback is
+        given, the hub drains the queue into it on a task of its own.
+        """
+        consumer = Consumer(names, maxsize, overflow)
+        self.consumers.append(consumer)
+        if callback is not None:
+            self._callbacks.append((consumer, callback))
+            if self._started:
+                self._consumer_tasks.append(asyncio.get_running_loop().create_task(self._drain(consumer, callback)))
+        return consumer.queue
+
+    async def start(self):
+        """
+        Start every subscription and callback consumer on the running loop.
+        """
+        loop = asyncio.get_running_loop()
+        self._started = True
+        self._consumer_tasks = [loop.create_task(self._drain(c, cb)) for c, cb in self._callbacks]
+        for name, sub in self.subscriptions.items():
+            if name not in self._tasks:
+                self._tasks[name] = loop.create_task(self._run_subscription(sub))
+
+    async def run(self):
+        """
+        Start the hub and wait until every subscription has stopped.
+        """
+        await self.start()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def stop(self):
+        tasks = list(self._tasks.values()) + list(self._consumer_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._consumer_tasks = []
+        self._started = False
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [sub.stats() for sub in self.subscriptions.values()]
+
+    async def _drain(self, consumer: Consumer, callback):
+        while True:
+            name, response = await consumer.queue.get()
+            await callback(name, response)
+
+    async def _publish(self, sub: Subscription, response):
+        item = (sub.name, response)
+        for consumer in self.consumers:
+            if consumer.wants(sub.name) and not await consumer.put(item):
+                sub.dropped += 1
+
+    async def _run_subscription(self, sub: Subscription):
+        method = getattr(self.client, sub.rpc)
+        attempt = 0
+        sub.running = True
+        try:
+            while True:
+                sub.connects += 1
+                received = False
+                try:
+                    call = method(sub.request, timeout=sub.timeout)
+                    async for response in call:
+                        received = True
+                        sub.messages += 1
+                        sub.last_message_at = time.time()
+                        await self._publish(sub, response)
+                    # Server closed the stream cleanly; realtime streams are open-ended, so reconnect
+                    sub.last_error = None
+                except grpc.aio.AioRpcError as error:
+                    sub.last_error = f"{error.code().name}: {error.details()}"
+                    if error.code() not in RETRYABLE_CODES:
+                        print(f"[{sub.name}] stream failed, not retrying: {sub.last_error}", file=sys.stderr)
+                        return
+                    if error.code() == grpc.StatusCode.UNAUTHENTICATED and self.auth is not None:
+                        await asyncio.to_thread(self.auth.refresh)
+
+                # A connection that delivered data resets the backoff; the jitter still
+                # spreads out streams whose SHORT_TIMEOUT_SEC deadlines expire together
+                attempt = 0 if received else attempt + 1
+                await asyncio.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_max))
+                sub.reconnects += 1
+        finally:
+            sub.running = False
+
+
+def main():
+    """
+    Watch every corridor WKT text file given on the command line and print messages.
+    """
+    from linestring_to_earth import load_linestring_from_textfile
+
+    paths = sys.argv[1:]
+    if not paths:
+        print("usage: python realtime_hub.py CORRIDOR.txt [CORRIDOR.txt ...]")
+        return
+
+    async def printer(name, response):
+        print(name, response)
+
+    async def run():
+        hub = RealtimeHub()
+        for path in paths:
+            hub.subscribe_trajectory(path, load_linestring_from_textfile(path))
+        hub.add_consumer(printer, overflow="drop_oldest")
+        await hub.run()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from csv_import_lib import TELEMETRY_COLUMNS, build_telemetry_insert_sql, insert_metadata
+from linestring_to_earth import parse_wkt_polygon
+from processed_point_by_geometry import processed_point_to_row
+
+
+def route_linestring_for(wkt: str) -> str:
+    """
+    import_metadata.route is a LINESTRING; realtime geometry subscriptions use
+    polygon bounds, so store the outer ring of a POLYGON as a LINESTRING.
+    """
+    if wkt.strip().upper().startswith("POLYGON"):
+        ring = parse_wkt_polygon(wkt)[0]
+        return "LINESTRING(" + ", ".join(f"{lon} {lat}" for lon, lat in ring) + ")"
+    return wkt
+
+
+class RealtimeTelemetrySink:
+    """
+    Micro-batched writer of realtime points into the vehicle_telemetry table.
+
+    Rows are built with the TELEMETRY_COLUMNS mapping and tagged with a synthetic
+    realtime metadata_id per subscription (an import_metadata row with
+    source "realtime" and filename "realtime:<name>:<start time>").
+
+    Batches are flushed when they reach batch_size rows or max_age_s seconds. At
+    most max_inflight_batches wait for the single DB writer; beyond that the hub
+    consumer awaits, which (with overflow="block") stalls the stream readers so
+    backpressure reaches gRPC flow control instead of growing memory.
+
+    When a write fails the batch goes to a JSON-lines spool file under spool_dir
+    and the DB connection is reopened; spooled batches are replayed, oldest first,
+    once writes succeed again, so a DB outage doesn't lose points. A batch that
+    can be neither written nor spooled (e.g. the spool disk is full) is dropped
+    and counted in stats() rather than stopping the writer; a spool file that
+    cannot be parsed is renamed to *.jsonl.bad and left for inspection.
+
+    Example:
+      sink = RealtimeTelemetrySink(get_db_connection)
+      sink.register("D4", district=4, wkt=load_linestring_from_textfile("D4_OHGO.txt"))
+      hub.add_consumer(sink.hub_consumer, overflow="block")
+      await sink.start()
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        *,
+        table_name: str = "vehicle_telemetry",
+        batch_size: int = 2000,
+        max_age_s: float = 2.0,
+        max_inflight_batches: int = 8,
+        spool_dir: str = "realtime_spool",
+        retry_s: float = 10.0,
+        to_row: Callable[[Any], Dict[str, Any]] = processed_point_to_row,
+    ):
+        self.connect = connect
+        self.table_name = table_name
+        self.insert_sql = build_telemetry_insert_sql(table_name)
+        self.batch_size = batch_size
+        self.max_age_s = max_age_s
+        self.spool_dir = Path(spool_dir)
+        self.retry_s = retry_s
+        self.to_row = to_row
+
+        self.metadata_ids: Dict[str, int] = {}
+        self._routes: Dict[str, tuple] = {}
+        self._conn = None
+        self._buffer: List[list] = []
+        self._buffer_started: Optional[float] = None
+        self._batches: asyncio.Queue = asyncio.Queue(maxsize=max_inflight_batches)
+        self._tasks: List[asyncio.Task] = []
+        self._last_failure: Optional[float] = None
+
+        self.rows_received = 0
+        self.rows_written = 0
+        self.rows_spooled = 0
+        self.rows_replayed = 0
+        self.batches_written = 0
+        self.write_errors = 0
+        self.writer_errors = 0
+        self.rows_dropped = 0
+        self.last_writer_error: Optional[str] = None
+
+    def register(self, name: str, *, district: int, wkt: str, metadata_id: Optional[int] = None):
+        """
+        Declare a subscription's route. The realtime metadata row is inserted on the
+        first write, unless an existing metadata_id is given.
+        """
+        self._routes[name] = (int(district), wkt)
+        if metadata_id is not None:
+            self.metadata_ids[name] = int(metadata_id)
+
+    def _metadata_id(self, name: str) -> int:
+        if name in self.metadata_ids:
+            return self.metadata_ids[name]
+        if name not in self._routes:
+            raise ValueError(f"Subscription '{name}' was not registered with the sink")
+        district, wkt = self._routes[name]
+        now = datetime.now()
+        metadata_id = insert_metadata(
+            self._connection(),
+            district=district,
+            downloaded_at=now,
+            source="realtime",
+            route_linestring=route_linestring_for(wkt),
+            filename=f"realtime:{name}:{now:%Y-%m-%dT%H:%M:%S}",
+        )
+        self.metadata_ids[name] = metadata_id
+        return metadata_id
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = self.connect()
+        return self._conn
+
+    def _reset_connection(self):
+        try:
+            if self._conn is not None:
+                self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self._tasks = [loop.create_task(self._writer()), loop.create_task(self._age_flusher())]
+
+    async def stop(self):
+        """
+        Flush the buffer, wait for queued batches to be written (or spooled), then stop.
+        """
+        await self.flush()
+        await self._batches.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._reset_connection()
+
+    async def hub_consumer(self, name: str, response):
+        """
+        RealtimeHub consumer callback.
+        """
+        row = self.to_row(response)
+        values = [row.get(col) for col in TELEMETRY_COLUMNS]
+        self._buffer.append([name, values])
+        self.rows_received += 1
+        if self._buffer_started is None:
+            self._buffer_started = time.monotonic()
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        self._buffer_started = None
+        await self._batches.put(batch)  # blocks when the writer is behind
+
+    async def _age_flusher(self):
+        while True:
+            await asyncio.sleep(self.max_age_s / 4)
+            if self._buffer_started is not None and time.monotonic() - self._buffer_started >= self.max_age_s:
+                await self.flush()
+            elif self.rows_spooled > self.rows_replayed and self._may_retry() and self._batches.empty():
+                # Nothing new arriving; wake the writer so the spool still drains
+                await self._batches.put([])
+
+    async def _writer(self):
+        while True:
+            batch = await self._batches.get()
+            try:
+                if self._spool_files() and self._may_retry():
+                    await asyncio.to_thread(self._replay_spool)
+                if not batch:
+                    continue
+                if self._last_failure is not None and not self._may_retry():
+                    await asyncio.to_thread(self._spool, batch)
+                else:
+                    await asyncio.to_thread(self._write_or_spool, batch)
+            except Exception as e:
+                # keep the writer alive; a dead writer would block hub_consumer forever
+                self.writer_errors += 1
+                self.rows_dropped += len(batch)
+                self.last_writer_error = f"{type(e).__name__}: {e}"
+                print(f"Realtime sink dropped {len(batch):,} rows: {self.last_writer_error}", file=sys.stderr)
+            finally:
+                self._batches.task_done()
+
+    def _may_retry(self) -> bool:
+        return self._last_failure is None or time.monotonic() - self._last_failure >= self.retry_s
+
+    def _write(self, batch: List[list]):
+        conn = self._connection()
+        rows = [values + [self._metadata_id(name)] for name, values in batch]
+        cur = conn.cursor()
+        cur.executemany(self.insert_sql, rows)
+        conn.commit()
+
+    def _write_or_spool(self, batch: List[list]):
+        try:
+            self._write(batch)
+            self._last_failure = None
+            self.rows_written += len(batch)
+            self.batches_written += 1
+        except Exception as e:
+            self.write_errors += 1
+            self._last_failure = time.monotonic()
+            print(f"Realtime sink write failed, spooling {len(batch):,} rows: {e}", file=sys.stderr)
+            self._reset_connection()
+            self._spool(batch)
+
+    def _spool(self, batch: List[list]):
+        name = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.jsonl"
+        tmp = self.spool_dir / (name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for item in batch:
+                f.write(json.dumps(item))
+                f.write("\n")
+        os.replace(tmp, self.spool_dir / name)
+        self.rows_spooled += len(batch)
+
+    def _spool_files(self) -> List[Path]:
+        return sorted(self.spool_dir.glob("*.jsonl"))
+
+    def _replay_spool(self):
+        for path in self._spool_files():
+            try:
+                with open(path, encoding="utf-8") as f:
+                    batch = [json.loads(line) for line in f if line.strip()]
+            except ValueError as e:
+                self.writer_errors += 1
+                self.last_writer_error = f"{path.name}: {e}"
+                print(f"Realtime sink spool file {path.name} is unreadable, setting it aside: {e}", file=sys.stderr)
+                os.replace(path, path.with_name(path.name + ".bad"))
+                continue
+            try:
+                self._write(batch)
+            except Exception as e:
+                self.write_errors += 1
+                self._last_failure = time.monotonic()
+                print(f"Realtime sink replay of {path.name} failed: {e}", file=sys.stderr)
+                self._reset_connection()
+                return
+            path.unlink()
+            self._last_failure = None
+            self.rows_replayed += len(batch)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rows_received": self.rows_received,
+            "rows_written": self.rows_written,
+            "rows_spooled": self.rows_spooled,
+            "rows_replayed": self.rows_replayed,
+            "batches_written": self.batches_written,
+            "write_errors": self.write_errors,
+            "writer_errors": self.writer_errors,
+            "rows_dropped": self.rows_dropped,
+            "last_writer_error": self.last_writer_error,
+            "buffered_rows": len(self._buffer),
+            "queued_batches": self._batches.qsize(),
+            "spool_files": len(self._spool_files()),
+        }
+
+
+def main():
+    """
+    Stream every corridor WKT text file given on the command line into vehicle_telemetry.
+    usage: python realtime_sink.py DISTRICT CORRIDOR.txt [CORRIDOR.txt ...]
+    """
+    from import_to_db import get_db_connection
+    from linestring_to_earth import load_linestring_from_textfile
+    from realtime_hub import RealtimeHub
+
+    if len(sys.argv) < 3:
+        print(main.__doc__)
+        return
+    district = int(sys.argv[1])
+    paths = sys.argv[2:]
+
+    async def run():
+        hub = RealtimeHub()
+        sink = RealtimeTelemetrySink(get_db_connection)
+        for path in paths:
+            wkt = load_linestring_from_textfile(path)
+            hub.subscribe_trajectory(path, wkt)
+            sink.register(path, district=district, wkt=wkt)
+        hub.add_consumer(sink.hub_consumer, overflow="block", maxsize=20_000)
+        await sink.start()
+        try:
+            await hub.run()
+        finally:
+            await hub.stop()
+            await sink.stop()
+            print(sink.stats())
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
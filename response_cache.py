@@ -0,0 +1,159 @@
+import calendar
+import hashlib
+import sqlite3
+import threading
+import time
+from datetime import date
+from typing import Any, Iterable, Optional
+
+# Unary analytics RPCs whose answer is fixed once the date range is in the past
+CACHEABLE_RPCS = ("AggregateByPath", "IntersectionAnalysis", "OriginDestination")
+
+
+def request_key(rpc: str, request: Any) -> str:
+    """
+    Cache key: RPC name plus the deterministic serialization of the request.
+    """
+    digest = hashlib.sha256(rpc.encode("utf-8") + b"\0")
+    digest.update(request.SerializeToString(deterministic=True))
+    return digest.hexdigest()
+
+
+def _end_date(value) -> Optional[date]:
+    """
+    Last day a LocalDate bound covers: a month-only bound (day 0) runs to the
+    end of the month, a year-only one to December 31.
+    """
+    if value.year == 0:
+        return None
+    month = value.month or 12
+    return date(value.year, month, value.day or calendar.monthrange(value.year, month)[1])
+
+
+def settled(request: Any, today: Optional[date] = None) -> bool:
+    """
+    True if the request has a DateTimeRange and every one it has is closed and
+    ended before today, so the server is no longer adding data to the answer.
+    Requests without a date range are never considered settled.
+    """
+    today = today or date.today()
+    ranges = 0
+    for field in request.DESCRIPTOR.fields:
+        if field.message_type is None or field.message_type.name != "DateTimeRange":
+            continue
+        if not request.HasField(field.name):
+            continue
+        date_range = getattr(request, field.name)
+        end = _end_date(date_range.end) if date_range.HasField("end") else None
+        if end is None or end >= today:
+            return False
+        ranges += 1
+    return ranges > 0
+
+
+class ResponseCache:
+    """
+    On-disk cache of serialized unary responses, in a single sqlite file so
+    several processes can share it.
+
+    Entries expire ttl_s seconds after being stored; when the total payload size
+    exceeds max_bytes the least recently used entries are evicted. Only RPCs in
+    rpcs are cached, and only requests whose date range is settled (closed and
+    over before today).
+
+    Example:
+      client = create_gateway_client(cache=ResponseCache("compass_cache.sqlite"))
+    """
+
+    def __init__(
+        self,
+        path: str = "compass_cache.sqlite",
+        *,
+        max_bytes: int = 512 * 1024 * 1024,
+        ttl_s: float = 30 * 24 * 3600,
+        rpcs: Iterable[str] = CACHEABLE_RPCS,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.rpcs = set(rpcs)
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, rpc TEXT NOT NULL, payload BLOB NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    def cacheable(self, rpc: str, request: Any) -> bool:
+        if rpc not in self.rpcs:
+            return False
+        if not settled(request):
+            self.bypassed += 1
+            return False
+        return True
+
+    def _fresh(self, key: str) -> Optional[bytes]:
+        row = self._conn.execute("SELECT payload, created FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if time.time() - row[1] > self.ttl_s:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            return None
+        return row[0]
+
+    def contains(self, rpc: str, request: Any) -> bool:
+        if rpc not in self.rpcs or not settled(request):
+            return False
+        with self._lock:
+            return self._fresh(request_key(rpc, request)) is not None
+
+    def get(self, rpc: str, request: Any) -> Optional[bytes]:
+        """
+        Serialized response for the request, or None on a miss.
+        """
+        key = request_key(rpc, request)
+        with self._lock:
+            payload = self._fresh(key)
+            if payload is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+            return bytes(payload)
+
+    def put(self, rpc: str, request: Any, payload: bytes):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, rpc, payload, size, created, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+                (request_key(rpc, request), rpc, sqlite3.Binary(payload), len(payload), now, now),
+            )
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        victims, freed = [], 0
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "bypassed": self.bypassed, "entries": entries, "bytes": size}
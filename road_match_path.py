@@ -1,7 +1,214 @@
-from client import create_gateway_client
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Mapping, Optional, Sequence, Tuple
+
+import grpc
+import numpy as np
+
+from client import RETRYABLE_STREAM_CODES, backoff_delay, create_gateway_client
 from compassiot.gateway.v1.gateway_pb2 import RoadMatchPathRequest, RoadMatchPathResponse
 from compassiot.compass.v1.geo_pb2 import LatLng
 
+# Unary errors worth retrying a chunk for (DEADLINE_EXCEEDED here means a slow request)
+RETRYABLE_CODES = set(RETRYABLE_STREAM_CODES)
+
+
+def default_matched_points(response) -> List[Any]:
+    """
+    The matched points of a RoadMatchPathResponse: its first repeated message field.
+    """
+    for field in response.DESCRIPTOR.fields:
+        if field.is_repeated and field.message_type is not None:
+            return list(getattr(response, field.name))
+    raise ValueError(f"{response.DESCRIPTOR.name} has no repeated message field")
+
+
+def default_point_coords(point) -> Tuple[float, float]:
+    """
+    (lat, lng) of a matched point: a LatLng itself, or its first LatLng-like field.
+    """
+    if hasattr(point, "lat") and hasattr(point, "lng"):
+        return point.lat, point.lng
+    for field in point.DESCRIPTOR.fields:
+        if field.message_type is not None and not field.is_repeated:
+            value = getattr(point, field.name)
+            if hasattr(value, "lat") and hasattr(value, "lng"):
+                return value.lat, value.lng
+    raise ValueError(f"Can't find coordinates in {point.DESCRIPTOR.name}")
+
+
+def chunk_bounds(n: int, max_points: int, overlap: int) -> List[Tuple[int, int]]:
+    """
+    [start, end) index ranges of at most max_points covering 0..n, consecutive
+    ranges sharing `overlap` points; none for an empty trace.
+    """
+    if overlap >= max_points:
+        raise ValueError("overlap must be smaller than max_points")
+    if n == 0:
+        return []
+    if n <= max_points:
+        return [(0, n)]
+    step = max_points - overlap
+    count = math.ceil((n - overlap) / step)
+    return [(i * step, min(n, i * step + max_points)) for i in range(count)]
+
+
+def _nearest(coords: np.ndarray, lat: float, lng: float, lo: int, hi: int) -> int:
+    lo, hi = max(0, lo), min(len(coords), hi)
+    if hi <= lo:
+        lo, hi = 0, len(coords)
+    c = coords[lo:hi]
+    x = np.radians(c[:, 1] - lng) * math.cos(math.radians(lat))
+    y = np.radians(c[:, 0] - lat)
+    return lo + int(np.argmin(x * x + y * y))
+
+
+class BatchRoadMatcher:
+    """
+    Road-match long GPS traces with RoadMatchPath.
+
+    Each trace is split into overlapping chunks of at most max_points raw points.
+    The chunks of all traces are submitted concurrently through the client's
+    pooled REST transport, and the matched paths are stitched back into one path
+    per trace. At each overlap the cut is made at the raw point in the middle of
+    the overlap: the earlier chunk keeps its matched points before the one nearest
+    that raw point, the later chunk contributes its points from its own nearest
+    one on. Only points near the expected position are searched, so loops in a
+    trace don't confuse the cut.
+
+    Example:
+      matcher = BatchRoadMatcher(workers=16)
+      paths = matcher.match({"veh1": lat_lng_array, "veh2": other_array})
+      print(matcher.stats())
+    """
+
+    def __init__(
+        self,
+        client=None,
+        *,
+        max_points: int = 500,
+        overlap: int = 50,
+        workers: int = 8,
+        max_retries: int = 5,
+        matched_points: Callable[[Any], List[Any]] = default_matched_points,
+        point_coords: Callable[[Any], Tuple[float, float]] = default_point_coords,
+    ):
+        self.client = client or create_gateway_client()
+        self.max_points = max_points
+        self.overlap = overlap
+        self.workers = workers
+        self.max_retries = max_retries
+        self.matched_points = matched_points
+        self.point_coords = point_coords
+        self._stats: Dict[str, Any] = {}
+        self._latencies: List[float] = []
+        self._lock = threading.Lock()  # _request runs on the pool's threads
+
+    def _request(self, points: np.ndarray) -> RoadMatchPathResponse:
+        request = RoadMatchPathRequest(raw_points=[LatLng(lat=float(lat), lng=float(lng)) for lat, lng in points])
+        attempt = 0
+        while True:
+            try:
+                started = time.monotonic()
+                response = self.client.RoadMatchPath(request)
+                with self._lock:
+                    self._latencies.append(time.monotonic() - started)
+                return response
+            except grpc.RpcError as error:
+                if error.code() not in RETRYABLE_CODES or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                with self._lock:
+                    self._stats["retries"] += 1
+                time.sleep(backoff_delay(attempt))
+
+    def _stitch(self, raw: np.ndarray, bounds: List[Tuple[int, int]], chunks: List[List[Any]]) -> List[Any]:
+        path = list(chunks[0])
+        # The last chunk appended and the index of its first point that is in path
+        tail, tail_from, (tail_start, tail_end) = chunks[0], 0, bounds[0]
+        for (start, end), chunk in zip(bounds[1:], chunks[1:]):
+            if not chunk or len(tail) <= tail_from:
+                path.extend(chunk)
+                tail, tail_from, tail_start, tail_end = chunk, 0, start, end
+                continue
+            cut = start + (tail_end - start) // 2
+            lat, lng = raw[cut]
+
+            # Expected position of the cut in each matched chunk, +/- the overlap length
+            tail_coords = np.array([self.point_coords(p) for p in tail], dtype=np.float64)
+            scale = len(tail) / (tail_end - tail_start)
+            guess = (cut - tail_start) * scale
+            width = (tail_end - start) * scale + 1
+            i_tail = _nearest(tail_coords, lat, lng, max(tail_from, int(guess - width)), int(math.ceil(guess + width)) + 1)
+            i_tail = max(i_tail, tail_from)
+
+            chunk_coords = np.array([self.point_coords(p) for p in chunk], dtype=np.float64)
+            scale = len(chunk) / (end - start)
+            guess = (cut - start) * scale
+            width = (tail_end - start) * scale + 1
+            i_chunk = _nearest(chunk_coords, lat, lng, int(guess - width), int(math.ceil(guess + width)) + 1)
+
+            del path[len(path) - (len(tail) - i_tail):]
+            path.extend(chunk[i_chunk:])
+            tail, tail_from, tail_start, tail_end = chunk, i_chunk, start, end
+        return path
+
+    def match(self, traces: Mapping[Hashable, Sequence[Sequence[float]]]) -> Dict[Hashable, Optional[List[Any]]]:
+        """
+        Road-match every trace (an N x 2 array of lat, lng in travel order).
+
+        Returns {trace: matched points}; a trace whose chunks failed after retries
+        maps to None and its error is listed in stats()["errors"].
+        """
+        self._stats = {"traces": len(traces), "chunks": 0, "retries": 0, "raw_points": 0, "matched_points": 0, "errors": {}}
+        self._latencies = []
+        started = time.monotonic()
+
+        raws, jobs = {}, []
+        for name, points in traces.items():
+            raw = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+            raws[name] = raw
+            self._stats["raw_points"] += len(raw)
+            for i, (lo, hi) in enumerate(chunk_bounds(len(raw), self.max_points, self.overlap)):
+                jobs.append((name, i, lo, hi))
+        self._stats["chunks"] = len(jobs)
+
+        results: Dict[Hashable, Dict[int, Any]] = {name: {} for name in traces}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [(name, i, pool.submit(self._request, raws[name][lo:hi])) for name, i, lo, hi in jobs]
+            for name, i, future in futures:
+                try:
+                    results[name][i] = self.matched_points(future.result())
+                except Exception as error:
+                    self._stats["errors"][name] = repr(error)
+
+        out: Dict[Hashable, Optional[List[Any]]] = {}
+        for name, raw in raws.items():
+            if name in self._stats["errors"] or len(raw) == 0:
+                out[name] = None if name in self._stats["errors"] else []
+                continue
+            bounds = chunk_bounds(len(raw), self.max_points, self.overlap)
+            out[name] = self._stitch(raw, bounds, [results[name][i] for i in range(len(bounds))])
+            self._stats["matched_points"] += len(out[name])
+
+        self._stats["wall_s"] = time.monotonic() - started
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Throughput of the last match() call.
+        """
+        stats = dict(self._stats)
+        wall = stats.get("wall_s") or float("nan")
+        latencies = np.array(self._latencies, dtype=np.float64)
+        stats["raw_points_per_s"] = stats.get("raw_points", 0) / wall
+        stats["requests_per_s"] = len(latencies) / wall
+        stats["latency_mean_s"] = float(latencies.mean()) if len(latencies) else None
+        stats["latency_p95_s"] = float(np.percentile(latencies, 95)) if len(latencies) else None
+        return stats
+
 
 def main():
     client = create_gateway_client()
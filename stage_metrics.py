@@ -0,0 +1,199 @@
+import json
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """
+    Peak resident set size of this process so far.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux reports KiB
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.wall_s = 0.0
+        self.items = 0
+        self.bytes = 0
+        self.retries = 0
+        self.peak_rss: Optional[int] = None
+        self.estimated = False
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "stage": self.name,
+            "wall_s": round(self.wall_s, 6),
+            "items": self.items,
+            "items_per_s": self.items / self.wall_s if self.wall_s > 0 else None,
+            "bytes": self.bytes,
+            "mb_per_s": self.bytes / 1e6 / self.wall_s if self.wall_s > 0 and self.bytes else None,
+            "retries": self.retries,
+            "peak_rss_bytes": self.peak_rss,
+            "estimated": self.estimated,
+        }
+
+
+class RunMetrics:
+    """
+    Per-stage wall time, items, bytes, retries and peak RSS for one pull or import.
+
+    Stages accumulate, so a stage entered once per message still reports a single
+    total. progress() replaces the old spinner counters with a throttled status
+    line on stderr (only when it's a terminal).
+
+    Example:
+      metrics = RunMetrics("July_D4")
+      with metrics.stage("csv") as st:
+          df.to_csv(path)
+          st.items += len(df)
+      metrics.finish("July_D4.metrics")  # prints the summary, writes .json and .prom
+    """
+
+    def __init__(self, run: str, *, progress_interval_s: float = 0.5):
+        self.run = run
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.stages: Dict[str, StageStats] = {}
+        self.progress_interval_s = progress_interval_s
+        self._last_progress = 0.0
+        self._tty = sys.stderr.isatty()
+
+    def get(self, name: str) -> StageStats:
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = StageStats(name)
+        return stage
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageStats]:
+        stage = self.get(name)
+        start = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            stage.wall_s += time.perf_counter() - start
+            stage.peak_rss = peak_rss_bytes()
+
+    def add(self, name: str, *, wall_s: float = 0.0, items: int = 0, bytes: int = 0, retries: int = 0):
+        stage = self.get(name)
+        stage.wall_s += wall_s
+        stage.items += items
+        stage.bytes += bytes
+        stage.retries += retries
+
+    def timed_iter(self, name: str, iterable: Iterable) -> Iterator:
+        """
+        Yield from iterable, charging the time spent inside next() (e.g. waiting
+        on a stream) and one item per element to stage `name`.
+        """
+        stage = self.get(name)
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                stage.wall_s += time.perf_counter() - start
+                stage.peak_rss = peak_rss_bytes()
+                return
+            stage.wall_s += time.perf_counter() - start
+            stage.items += 1
+            yield item
+
+    def progress(self, name: str, *, force: bool = False):
+        if not self._tty:
+            return
+        now = time.perf_counter()
+        if not force and now - self._last_progress < self.progress_interval_s:
+            return
+        self._last_progress = now
+        stage = self.get(name)
+        elapsed = now - self._t0
+        rate = stage.items / elapsed if elapsed > 0 else 0.0
+        mb = f" | {stage.bytes / 1e6:,.1f} MB" if stage.bytes else ""
+        retries = f" | {stage.retries} retries" if stage.retries else ""
+        sys.stderr.write(f"\r{name}: {stage.items:,} items | {rate:,.0f}/s{mb}{retries} | {elapsed:,.1f}s ")
+        sys.stderr.flush()
+
+    def end_progress(self):
+        if self._tty:
+            sys.stderr.write("\n")
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "run": self.run,
+            "started_at": self.started_at,
+            "wall_s": round(time.perf_counter() - self._t0, 6),
+            "peak_rss_bytes": peak_rss_bytes(),
+            "stages": [stage.report() for stage in self.stages.values()],
+        }
+
+    def summary(self) -> str:
+        report = self.report()
+        lines = [f"{'stage':<22}{'wall s':>10}{'share':>8}{'items':>13}{'items/s':>14}{'MB':>10}{'retries':>9}"]
+        total = report["wall_s"] or 1.0
+        for s in report["stages"]:
+            name = s["stage"] + (" ~" if s["estimated"] else "")
+            rate = f"{s['items_per_s']:,.0f}" if s["items_per_s"] else "-"
+            lines.append(
+                f"{name:<22}{s['wall_s']:>10.2f}{100 * s['wall_s'] / total:>7.1f}%{s['items']:>13,}"
+                f"{rate:>14}{s['bytes'] / 1e6:>10.1f}{s['retries']:>9}"
+            )
+        rss = report["peak_rss_bytes"]
+        estimated = any(s["estimated"] for s in report["stages"])
+        lines.append(f"total {report['wall_s']:.2f}s" + (f", peak RSS {rss / 2**20:,.0f} MiB" if rss else "") + (" (~ = estimate)" if estimated else ""))
+        return "\n".join(lines)
+
+    def prometheus(self) -> str:
+        """
+        The report in Prometheus text exposition format.
+        """
+        run = self.run.replace("\\", "\\\\").replace('"', '\\"')
+        report = self.report()
+        out = []
+
+        def metric(name, help_text, samples):
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                if value is not None:
+                    out.append(f"{name}{{{labels}}} {value}")
+
+        stages = report["stages"]
+        label = lambda s: f'run="{run}",stage="{s["stage"]}"'
+        metric("compass_stage_wall_seconds", "Wall time spent in the stage.", [(label(s), s["wall_s"]) for s in stages])
+        metric("compass_stage_items", "Items processed by the stage.", [(label(s), s["items"]) for s in stages])
+        metric("compass_stage_items_per_second", "Stage throughput.", [(label(s), s["items_per_s"]) for s in stages])
+        metric("compass_stage_bytes", "Bytes processed by the stage.", [(label(s), s["bytes"]) for s in stages])
+        metric("compass_stage_retries", "Retries during the stage.", [(label(s), s["retries"]) for s in stages])
+        metric("compass_run_wall_seconds", "Wall time of the run.", [(f'run="{run}"', report["wall_s"])])
+        metric("compass_run_peak_rss_bytes", "Peak resident set size.", [(f'run="{run}"', report["peak_rss_bytes"])])
+        return "\n".join(out) + "\n"
+
+    def write(self, prefix: str) -> Dict[str, Any]:
+        """
+        Write <prefix>.json and <prefix>.prom; returns the report.
+        """
+        report = self.report()
+        Path(f"{prefix}.json").write_text(json.dumps(report, indent=2))
+        Path(f"{prefix}.prom").write_text(self.prometheus())
+        return report
+
+    def finish(self, prefix: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Print the summary and, if prefix is given, write the report files.
+        """
+        print(self.summary())
+        return self.write(prefix) if prefix else self.report()
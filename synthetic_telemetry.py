@@ -0,0 +1,285 @@
+import math
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Any, Iterator, Sequence
+
+import numpy as np
+import pandas as pd
+
+from corridor_clip import EARTH_RADIUS_M, CorridorIndex, expand_ranges
+from csv_import_lib import TELEMETRY_COLUMNS
+from linestring_to_earth import parse_wkt_polygon
+from wire_decode import PROTO_FIELDS
+
+# float (not double) fields of ProcessedPoint
+FLOAT32_COLUMNS = (
+    "speed_kmh", "acceleration_x", "acceleration_y", "acceleration_z",
+    "gyro_roll", "gyro_pitch", "gyro_yaw", "iri", "bearing",
+)
+
+_B64_ALPHABET = np.frombuffer(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/", dtype=np.uint8)
+_M_PER_DEG = math.radians(1.0) * EARTH_RADIUS_M
+
+
+def base64_ids(rng: np.random.Generator, n: int, nbytes: int = 16) -> np.ndarray:
+    """
+    n random ids, each the standard base64 encoding of nbytes random bytes,
+    encoded with array operations instead of one b64encode call per id.
+    """
+    pad = (-nbytes) % 3
+    raw = np.zeros((n, nbytes + pad), dtype=np.uint32)
+    raw[:, :nbytes] = rng.integers(0, 256, (n, nbytes), dtype=np.uint8)
+    raw = raw.reshape(n, -1, 3)
+    v = (raw[:, :, 0] << 16) | (raw[:, :, 1] << 8) | raw[:, :, 2]
+    sextets = np.stack([(v >> 18) & 63, (v >> 12) & 63, (v >> 6) & 63, v & 63], axis=-1).reshape(n, -1)
+    chars = _B64_ALPHABET[sextets]
+    if pad:
+        chars[:, -pad:] = ord("=")
+    return np.ascontiguousarray(chars).view(f"S{chars.shape[1]}").ravel().astype(str)
+
+
+def corridor_for(wkt: str) -> CorridorIndex:
+    """
+    CorridorIndex of a LINESTRING, or of the outer ring of a POLYGON.
+    """
+    if wkt.strip().upper().startswith("POLYGON"):
+        ring = parse_wkt_polygon(wkt)[0]
+        wkt = "LINESTRING(" + ", ".join(f"{lon} {lat}" for lon, lat in ring) + ")"
+    return CorridorIndex(wkt)
+
+
+class TelemetryGenerator:
+    """
+    Seeded generator of ProcessedPoint-shaped telemetry along a corridor.
+
+    Every trip is one vehicle driving part of the corridor in one direction,
+    sampled every sample_interval_s, with a smoothly varying speed around a
+    per-trip cruise speed. osm_way_id and road roughness (iri) come from fixed
+    ~way_length_m pieces of the corridor, raw points are the matched points plus
+    GPS noise, bearing follows the corridor segment, and a near_miss_rate share of
+    the points is a near miss (hard braking of 4-8 m/s^2; all accelerations are
+    in m/s^2). vehicle_id, trip_id and point_id are base64 strings like the real
+    ones.
+
+    Rows are built a chunk at a time with numpy, so memory stays bounded by
+    chunk_rows. The same arguments always produce the same data.
+
+    Example:
+      gen = TelemetryGenerator(load_linestring_from_textfile("D4_OHGO.txt"), seed=1, days=31)
+      gen.to_csv("synthetic_D4.csv", rows=20_000_000)
+      for point in gen.messages(1000): ...
+    """
+
+    def __init__(
+        self,
+        wkt: str,
+        *,
+        seed: int = 0,
+        start: Any = datetime(2025, 7, 1, tzinfo=timezone.utc),
+        days: float = 1.0,
+        vehicles: int = 1000,
+        sample_interval_s: float = 1.0,
+        trip_points: Sequence[int] = (60, 900),
+        speed_kmh: Sequence[float] = (90.0, 15.0),
+        near_miss_rate: float = 2e-4,
+        gps_noise_m: float = 4.0,
+        way_length_m: float = 400.0,
+        vehicle_types: Sequence[int] = (1, 2, 3, 4),
+        vehicle_type_weights: Sequence[float] = (0.7, 0.15, 0.1, 0.05),
+        transport_type: int = 1,
+    ):
+        self.corridor = corridor_for(wkt)
+        self.seed = seed
+        self.start_s = start.timestamp() if isinstance(start, datetime) else float(start)
+        self.days = days
+        self.vehicles = vehicles
+        self.sample_interval_s = sample_interval_s
+        self.trip_points = (max(2, int(trip_points[0])), max(2, int(trip_points[1])))
+        self.speed_kmh = speed_kmh
+        self.near_miss_rate = near_miss_rate
+        self.gps_noise_m = gps_noise_m
+        self.transport_type = transport_type
+
+        # Fixed per (corridor, seed): ways, vehicles
+        rng = np.random.default_rng([seed, 0])
+        self.way_length_m = way_length_m
+        n_ways = int(self.corridor.length_m // way_length_m) + 1
+        self.way_ids = rng.integers(10**7, 10**9, n_ways)
+        self.way_iri = np.clip(rng.gamma(4.0, 0.5, n_ways), 0.5, 8.0)
+        self.vehicle_ids = base64_ids(rng, vehicles)
+        weights = np.asarray(vehicle_type_weights, dtype=np.float64)
+        self.vehicle_types = rng.choice(np.asarray(vehicle_types), size=vehicles, p=weights / weights.sum())
+
+    def _trips(self, rng: np.random.Generator, count: int):
+        length = self.corridor.length_m
+        mean, sd = self.speed_kmh
+        speed = np.clip(rng.normal(mean, sd, count), 20.0, 130.0)
+        step = speed / 3.6 * self.sample_interval_s
+        points = rng.integers(self.trip_points[0], self.trip_points[1] + 1, count)
+        points = np.maximum(2, np.minimum(points, (length / step).astype(np.int64) + 1))
+        travel = np.minimum(length, (points - 1) * step * 1.2)
+        forward = rng.random(count) < 0.5
+        offset = rng.uniform(0.0, 1.0, count) * (length - travel)
+        return {
+            "vehicle": rng.integers(0, self.vehicles, count),
+            "direction": np.where(forward, 1.0, -1.0),
+            "chainage": np.where(forward, offset, length - offset),
+            "speed": speed,
+            "phase": rng.uniform(0.0, 2 * math.pi, count),
+            "points": points,
+            "start_s": self.start_s + rng.uniform(0.0, self.days * 86400.0, count),
+            "trip_id": base64_ids(rng, count, 12),
+        }
+
+    def frame(self, rows: int, *, chunk: int = 0) -> pd.DataFrame:
+        """
+        One chunk of rows (TELEMETRY_COLUMNS), grouped by trip in time order.
+        """
+        rng = np.random.default_rng([self.seed, 1, chunk])
+        mean_points = sum(self.trip_points) / 2
+        trips = self._trips(rng, int(rows / mean_points * 1.1) + 1)
+        while trips["points"].sum() < rows:
+            more = self._trips(rng, int(rows / mean_points * 0.2) + 1)
+            trips = {k: np.concatenate([trips[k], more[k]]) for k in trips}
+        points = trips["points"]
+        keep = np.searchsorted(np.cumsum(points), rows) + 1
+        trips = {k: v[:keep] for k, v in trips.items()}
+        points = trips["points"].copy()
+        points[-1] -= points.sum() - rows
+
+        trip = np.repeat(np.arange(len(points)), points)
+        first = np.cumsum(points) - points
+        j = expand_ranges(np.zeros(len(points)), points)
+        n = rows
+
+        speed = trips["speed"][trip] * (1.0 + 0.08 * np.sin(trips["phase"][trip] + 0.05 * j)) + rng.normal(0.0, 1.5, n)
+        speed = np.maximum(speed, 0.0)
+        step_m = speed / 3.6 * self.sample_interval_s
+        travelled = np.cumsum(step_m)
+        travelled -= np.repeat(travelled[first], points)
+        direction = trips["direction"][trip]
+        chainage = np.clip(trips["chainage"][trip] + direction * travelled, 0.0, self.corridor.length_m)
+        lat, lon = self.corridor.point_at(chainage)
+
+        corridor = self.corridor
+        segment = np.clip(np.searchsorted(corridor.segment_start_m, chainage, side="right") - 1, 0, len(corridor.ax) - 1)
+        heading = np.degrees(np.arctan2(corridor.dx[segment], corridor.dy[segment]))
+        bearing = np.where(direction > 0, heading, heading + 180.0) % 360.0
+
+        t = trips["start_s"][trip] + j * self.sample_interval_s + rng.uniform(0.0, 0.05, n)
+        seconds = np.floor(t).astype(np.int64)
+        nanos = ((t - seconds) * 1e9).astype(np.int64)
+
+        way = np.minimum((chainage // self.way_length_m).astype(np.int64), len(self.way_ids) - 1)
+        noise = rng.normal(0.0, self.gps_noise_m, (2, n))
+
+        accel_x = np.zeros(n)
+        accel_x[1:] = np.diff(speed) / 3.6 / self.sample_interval_s
+        accel_x[first] = 0.0
+        accel_x += rng.normal(0.0, 0.05, n)
+
+        near_miss = rng.random(n) < self.near_miss_rate
+        accel_x[near_miss] = -rng.uniform(4.0, 8.0, int(near_miss.sum()))
+
+        vehicle = trips["vehicle"][trip]
+        columns = {
+            "vehicle_type": self.vehicle_types[vehicle],
+            "timestamp_seconds": seconds,
+            "timestamp_nanos": nanos,
+            "road_matched_point_lat": lat,
+            "road_matched_point_lon": lon,
+            "speed_kmh": speed,
+            "osm_way_id": self.way_ids[way],
+            "vehicle_id": self.vehicle_ids[vehicle],
+            "trip_id": trips["trip_id"][trip],
+            "raw_point_lat": lat + noise[0] / _M_PER_DEG,
+            "raw_point_lon": lon + noise[1] / (_M_PER_DEG * np.cos(np.radians(lat))),
+            "transport_type": np.full(n, self.transport_type),
+            "acceleration_x": accel_x,
+            "acceleration_y": rng.normal(0.0, 0.3, n),
+            "acceleration_z": rng.normal(0.0, 0.3, n),
+            "gyro_roll": rng.normal(0.0, 0.5, n),
+            "gyro_pitch": rng.normal(0.0, 0.5, n),
+            "gyro_yaw": rng.normal(0.0, 0.5, n),
+            "iri": np.maximum(0.3, self.way_iri[way] + rng.normal(0.0, 0.2, n)),
+            "near_miss_timestamp_seconds": np.where(near_miss, seconds, 0),
+            "near_miss_timestamp_nanos": np.where(near_miss, nanos, 0),
+            "near_miss_type": np.where(near_miss, rng.integers(1, 5, n), 0),
+            "bearing": bearing,
+            "point_id": base64_ids(rng, n),
+        }
+        for column in FLOAT32_COLUMNS:
+            columns[column] = columns[column].astype(np.float32)
+        return pd.DataFrame({column: columns[column] for column in TELEMETRY_COLUMNS})
+
+    def chunks(self, rows: int, chunk_rows: int = 1_000_000) -> Iterator[pd.DataFrame]:
+        for chunk, start in enumerate(range(0, rows, chunk_rows)):
+            yield self.frame(min(chunk_rows, rows - start), chunk=chunk)
+
+    def to_csv(self, path: str, rows: int, chunk_rows: int = 1_000_000) -> int:
+        """
+        Write rows to a CSV in the format store_datapull writes (importable with
+        import_csv). Returns the file size in bytes.
+        """
+        for i, df in enumerate(self.chunks(rows, chunk_rows)):
+            df.to_csv(path, index=False, mode="w" if i == 0 else "a", header=i == 0)
+        return os.path.getsize(path)
+
+    def to_parquet(self, path: str, rows: int, chunk_rows: int = 1_000_000) -> int:
+        """
+        Write rows to a Parquet file, one row group per chunk (needs pyarrow).
+        Returns the file size in bytes.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for df in self.chunks(rows, chunk_rows):
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        return os.path.getsize(path)
+
+    def messages(self, rows: int, message_class=None, chunk_rows: int = 100_000) -> Iterator[Any]:
+        """
+        Yield the rows as ProcessedPoint messages (or message_class).
+        """
+        if message_class is None:
+            import compassiot.platform.v1.streaming_pb2 as streaming
+
+            message_class = streaming.ProcessedPoint
+        paths = [PROTO_FIELDS[column].split(".") for column in TELEMETRY_COLUMNS]
+        for df in self.chunks(rows, chunk_rows):
+            for row in zip(*(df[column].tolist() for column in TELEMETRY_COLUMNS)):
+                message = message_class()
+                for path, value in zip(paths, row):
+                    if not value:
+                        continue  # proto3 default; also keeps near_miss unset
+                    target = message
+                    for name in path[:-1]:
+                        target = getattr(target, name)
+                    setattr(target, path[-1], value)
+                yield message
+
+
+def main():
+    if len(sys.argv) < 4:
+        print("Usage: python synthetic_telemetry.py <linestring.txt> <rows> <out.csv|out.parquet> [seed]")
+        sys.exit(1)
+
+    from linestring_to_earth import load_linestring_from_textfile
+
+    gen = TelemetryGenerator(load_linestring_from_textfile(sys.argv[1]), seed=int(sys.argv[4]) if len(sys.argv) > 4 else 0)
+    rows, out = int(sys.argv[2]), sys.argv[3]
+    size = gen.to_parquet(out, rows) if out.endswith(".parquet") else gen.to_csv(out, rows)
+    print(f"Wrote {rows:,} rows to {out} ({size / 1e6:,.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
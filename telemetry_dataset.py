@@ -0,0 +1,182 @@
+import glob
+import os
+import uuid
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# Hive partition keys, outermost first: <root>/corridor=D4_OHGO/date=2025-08-01/vehicle_type=1/*.parquet
+PARTITION_KEYS = ("corridor", "date", "vehicle_type")
+ROW_GROUP_ROWS = 64 * 1024
+POINT_COLUMNS = {"road_matched_point": ("road_matched_point_lon", "road_matched_point_lat"), "raw_point": ("raw_point_lon", "raw_point_lat")}
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+    except ImportError as error:
+        raise ImportError("telemetry_dataset needs pyarrow (pip install pyarrow)") from error
+    return pa, ds
+
+
+def _partitioning():
+    pa, ds = _pyarrow()
+    types = {"corridor": pa.string(), "date": pa.date32(), "vehicle_type": pa.int32()}
+    return ds.partitioning(pa.schema([(key, types[key]) for key in PARTITION_KEYS]), flavor="hive")
+
+
+def _epoch_seconds(value) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day, tzinfo=timezone.utc).timestamp()
+    return float(value)
+
+
+def write_dataset(
+    data: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+    root: str,
+    corridor: str,
+    *,
+    name: Optional[str] = None,
+    row_group_rows: int = ROW_GROUP_ROWS,
+    compression: str = "zstd",
+) -> int:
+    """
+    Add pulled rows (TELEMETRY_COLUMNS, e.g. a save_datapull DataFrame) to the
+    partitioned Parquet dataset at root, under corridor=<corridor>/date=<UTC day
+    of timestamp_seconds>/vehicle_type=<n>. Rows are sorted by time inside each
+    file, so the per-row-group min/max statistics Parquet stores for every column
+    let read_dataset skip row groups by time (and, along a corridor, by position
+    and way). New files get unique names, so writing again appends; with name
+    (e.g. the pull's output prefix) the files a previous write of that name left
+    in the corridor are replaced instead. data can also be an iterable of
+    DataFrames (e.g. external_sort.iter_chunks of a pulled CSV), written one at a
+    time. Returns the number of rows written.
+    """
+    pa, ds = _pyarrow()
+    prefix = f"{name}-" if name else f"part-{uuid.uuid4().hex}-"
+    if name:
+        for path in glob.glob(os.path.join(glob.escape(root), f"corridor={glob.escape(corridor)}", "*", "*", glob.escape(prefix) + "*.parquet")):
+            os.remove(path)
+    rows = 0
+    for n, df in enumerate([data] if isinstance(data, pd.DataFrame) else data):
+        if df.empty:
+            continue
+        days = pd.to_datetime(df["timestamp_seconds"], unit="s", utc=True).dt.date
+        frame = df.assign(corridor=corridor, date=days, vehicle_type=df["vehicle_type"].astype(np.int32))
+        frame = frame.sort_values(["vehicle_type", "timestamp_seconds", "timestamp_nanos"], kind="stable")
+        ds.write_dataset(
+            pa.Table.from_pandas(frame, preserve_index=False),
+            root,
+            format="parquet",
+            partitioning=_partitioning(),
+            basename_template=f"{prefix}{n}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+            file_options=ds.ParquetFileFormat().make_write_options(compression=compression),
+            max_rows_per_group=row_group_rows,
+            min_rows_per_group=min(row_group_rows, 8192),
+        )
+        rows += len(frame)
+    return rows
+
+
+def _filter_terms(
+    start=None,
+    end=None,
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+    point: str = "road_matched_point",
+    osm_way_ids: Optional[Iterable[int]] = None,
+    vehicle_types: Optional[Iterable[int]] = None,
+    corridors: Optional[Iterable[str]] = None,
+) -> Tuple[List[Any], List[Any]]:
+    """
+    (partition terms, column terms) of a filter, as pyarrow expressions.
+    """
+    pa, ds = _pyarrow()
+    partition, column = [], []
+    start_s, end_s = _epoch_seconds(start), _epoch_seconds(end)
+    if start_s is not None:
+        partition.append(ds.field("date") >= pa.scalar(datetime.fromtimestamp(start_s, timezone.utc).date(), pa.date32()))
+        column.append(ds.field("timestamp_seconds") >= int(np.floor(start_s)))
+    if end_s is not None:
+        partition.append(ds.field("date") <= pa.scalar(datetime.fromtimestamp(end_s, timezone.utc).date(), pa.date32()))
+        column.append(ds.field("timestamp_seconds") < int(np.ceil(end_s)))
+    if vehicle_types is not None:
+        partition.append(ds.field("vehicle_type").isin(pa.array(list(vehicle_types), pa.int32())))
+    if corridors is not None:
+        partition.append(ds.field("corridor").isin(pa.array(list(corridors), pa.string())))
+    if bbox is not None:
+        lon, lat = POINT_COLUMNS[point]
+        min_lon, min_lat, max_lon, max_lat = bbox
+        column += [ds.field(lon) >= min_lon, ds.field(lon) <= max_lon, ds.field(lat) >= min_lat, ds.field(lat) <= max_lat]
+    if osm_way_ids is not None:
+        column.append(ds.field("osm_way_id").isin(pa.array(list(osm_way_ids), pa.int64())))
+    return partition, column
+
+
+def _all(terms: List[Any]):
+    expression = None
+    for term in terms:
+        expression = term if expression is None else expression & term
+    return expression
+
+
+def dataset_filter(**filters: Any):
+    """
+    pyarrow expression for read_dataset's filters (None if there are none):
+    start/end (datetime, date or epoch seconds; end exclusive), bbox
+    (min_lon, min_lat, max_lon, max_lat) on point ("road_matched_point" or
+    "raw_point"), osm_way_ids, vehicle_types and corridors.
+    """
+    partition, column = _filter_terms(**filters)
+    return _all(partition + column)
+
+
+def open_dataset(root: str):
+    _, ds = _pyarrow()
+    return ds.dataset(root, format="parquet", partitioning=_partitioning())
+
+
+def read_dataset(root: str, *, columns: Optional[Sequence[str]] = None, as_table: bool = False, **filters: Any):
+    """
+    Rows of the dataset at root matching the filters (see dataset_filter), as a
+    DataFrame (or a pyarrow Table with as_table).
+
+    Filters are pushed down: partition directories outside the corridors, days
+    or vehicle types are never opened, and inside the remaining files row groups
+    whose statistics cannot match (time, bbox, osm_way_id) are not read.
+
+    Example:
+      df = read_dataset("telemetry", start=datetime(2025, 8, 1), end=datetime(2025, 9, 1),
+                        bbox=(-81.7, 41.0, -81.5, 41.3), vehicle_types=[1], columns=["timestamp_seconds", "speed_kmh"])
+    """
+    table = open_dataset(root).to_table(columns=list(columns) if columns is not None else None, filter=dataset_filter(**filters))
+    return table if as_table else table.to_pandas()
+
+
+def scan_plan(root: str, **filters: Any) -> Dict[str, int]:
+    """
+    How much of the dataset a read with these filters touches: files and row
+    groups in total, the files left after partition pruning, and the row
+    groups in them whose statistics can match.
+    """
+    partition, column = _filter_terms(**filters)
+    dataset = open_dataset(root)
+    everything = list(dataset.get_fragments())
+    fragments = list(dataset.get_fragments(filter=_all(partition + column)))
+    row_groups = _all(column)
+    return {
+        "files": len(everything),
+        "row_groups": sum(fragment.metadata.num_row_groups for fragment in everything),
+        "files_selected": len(fragments),
+        "row_groups_selected": sum(
+            fragment.metadata.num_row_groups if row_groups is None else len(fragment.split_by_row_group(filter=row_groups))
+            for fragment in fragments
+        ),
+    }
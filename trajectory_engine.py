@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+
+from corridor_clip import CorridorIndex, expand_ranges
+
+
+def point_times(df: pd.DataFrame) -> np.ndarray:
+    """
+    Combine timestamp_seconds/timestamp_nanos into float seconds since the epoch.
+    """
+    return df["timestamp_seconds"].to_numpy(dtype=np.float64) + df["timestamp_nanos"].to_numpy(dtype=np.float64) * 1e-9
+
+
+def sort_by_trip(df: pd.DataFrame):
+    """
+    Factorize trip_id and return (order, trip_codes, trip_labels, times) with order
+    sorting the rows by (trip, timestamp). trip_codes/times are already in that order.
+    """
+    codes, labels = pd.factorize(df["trip_id"], sort=False)
+    times = point_times(df)
+    order = np.lexsort((times, codes))
+    return order, codes[order], labels, times[order]
+
+
+def group_bounds(sorted_codes: np.ndarray):
+    """
+    Start/stop offsets of each run of equal values in an already-sorted code array.
+    """
+    if len(sorted_codes) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    change = np.flatnonzero(sorted_codes[1:] != sorted_codes[:-1]) + 1
+    starts = np.concatenate(([0], change))
+    stops = np.concatenate((change, [len(sorted_codes)]))
+    return starts, stops
+
+
+def reconstruct_trajectories(
+    df: pd.DataFrame,
+    corridor,
+    *,
+    segment_length_m: float = 500.0,
+    buffer_m: float = 25.0,
+    max_gap_s: float = 120.0,
+):
+    """
+    Rebuild per-trip trajectories along a corridor from pulled ProcessedPoint rows.
+
+    corridor is a WKT LINESTRING or a CorridorIndex. Rows without a chainage_m column
+    are clipped to the corridor first (see corridor_clip). The corridor is cut into
+    sub-segments of segment_length_m (the last one is shorter), and a trip's time at
+    each sub-segment boundary is interpolated between its consecutive points moving
+    forward along the corridor. Consecutive points further apart than max_gap_s are
+    not interpolated. Points beyond either end of the corridor clip to chainage 0 or
+    its full length, so the first/last boundary time is the last/first such point.
+
+    Returns (trips, segment_times):
+      trips         : one row per trip_id with entry/exit time and chainage, point count
+      segment_times : one row per (trip_id, segment) fully traversed, with entry/exit
+                      time, travel_time_s and speed_kmh
+    """
+    index = corridor if isinstance(corridor, CorridorIndex) else CorridorIndex(corridor, buffer_m=buffer_m)
+
+    if "chainage_m" not in df.columns:
+        _, chainage, _ = index.locate(df["road_matched_point_lat"].to_numpy(), df["road_matched_point_lon"].to_numpy())
+        inside = np.isfinite(chainage)
+        df = df.loc[inside]
+        chainage = chainage[inside]
+    else:
+        chainage = df["chainage_m"].to_numpy(dtype=np.float64)
+
+    order, codes, labels, times = sort_by_trip(df)
+    chainage = chainage[order]
+    starts, stops = group_bounds(codes)
+
+    trips = pd.DataFrame({
+        "trip_id": labels[codes[starts]] if len(starts) else np.array([], dtype=object),
+        "vehicle_id": df["vehicle_id"].to_numpy()[order[starts]] if "vehicle_id" in df.columns else None,
+        "point_count": stops - starts,
+        "entry_time": times[starts],
+        "exit_time": times[stops - 1],
+        "entry_chainage_m": chainage[starts],
+        "exit_chainage_m": chainage[stops - 1],
+    })
+    trips["duration_s"] = trips["exit_time"] - trips["entry_time"]
+
+    edges = np.append(np.arange(0.0, index.length_m, segment_length_m), index.length_m)
+    segment_times = _segment_crossings(codes, times, chainage, edges, max_gap_s)
+    segment_times.insert(0, "trip_id", labels[segment_times.pop("trip_code").to_numpy()])
+    return trips, segment_times
+
+
+def _segment_crossings(codes, times, chainage, edges, max_gap_s):
+    # Consecutive point pairs of the same trip moving forward along the corridor
+    c0, c1 = chainage[:-1], chainage[1:]
+    t0, t1 = times[:-1], times[1:]
+    pair = (codes[:-1] == codes[1:]) & (c1 > c0) & (t1 - t0 <= max_gap_s)
+    pair_idx = np.flatnonzero(pair)
+
+    lo = np.searchsorted(edges, c0[pair_idx], side="left")
+    hi = np.searchsorted(edges, c1[pair_idx], side="right")
+    counts = hi - lo
+
+    # One row per boundary crossed by a pair
+    rows = np.repeat(pair_idx, counts)
+    edge = expand_ranges(lo, counts)
+    frac = (edges[edge] - c0[rows]) / (c1[rows] - c0[rows])
+    cross_t = t0[rows] + frac * (t1[rows] - t0[rows])
+    trip = codes[rows]
+
+    # First crossing of each (trip, boundary); rows are already in trip/time order
+    n_edges = len(edges)
+    keys = trip.astype(np.int64) * n_edges + edge
+    keys, first = np.unique(keys, return_index=True)
+    cross_t = cross_t[first]
+
+    # Segment i spans boundaries i and i+1 of the same trip
+    nxt = np.searchsorted(keys, keys + 1)
+    nxt_ok = np.minimum(nxt, len(keys) - 1)
+    has_exit = (nxt < len(keys)) & (keys[nxt_ok] == keys + 1) & ((keys % n_edges) < n_edges - 1)
+
+    seg = (keys % n_edges)[has_exit]
+    entry_t = cross_t[has_exit]
+    exit_t = cross_t[nxt_ok[has_exit]]
+    travel = exit_t - entry_t
+    length = edges[seg + 1] - edges[seg]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        speed = np.where(travel > 0, length / travel * 3.6, np.nan)
+
+    return pd.DataFrame({
+        "trip_code": (keys // n_edges)[has_exit],
+        "segment": seg,
+        "segment_start_m": edges[seg],
+        "segment_end_m": edges[seg + 1],
+        "entry_time": entry_t,
+        "exit_time": exit_t,
+        "travel_time_s": travel,
+        "speed_kmh": speed,
+    })
+
+
+def summarize_segment_times(segment_times: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per-segment traversal count and travel time / speed statistics.
+    """
+    g = segment_times.groupby("segment")
+    out = g.agg(
+        segment_start_m=("segment_start_m", "first"),
+        segment_end_m=("segment_end_m", "first"),
+        traversals=("travel_time_s", "size"),
+        travel_time_mean_s=("travel_time_s", "mean"),
+        travel_time_median_s=("travel_time_s", "median"),
+        speed_mean_kmh=("speed_kmh", "mean"),
+    )
+    out["travel_time_p85_s"] = g["travel_time_s"].quantile(0.85)
+    out["speed_p15_kmh"] = g["speed_kmh"].quantile(0.15)
+    return out.reset_index()
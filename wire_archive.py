@@ -0,0 +1,336 @@
+import json
+import mmap
+import os
+import time
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from wire_decode import decode_columns
+
+INDEX_NAME = "index.jsonl"
+META_NAME = "meta.json"
+
+Timestamp = Tuple[int, int]  # (seconds, nanos)
+
+
+def _default_message_class():
+    import compassiot.platform.v1.streaming_pb2 as streaming
+
+    return streaming.ProcessedPoint
+
+
+def encode_varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def read_varint(buf, pos: int) -> Tuple[int, int]:
+    """
+    Decode the varint at buf[pos]; returns (value, position after it).
+    """
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def skip_field(buf, pos: int, wire_type: int) -> int:
+    if wire_type == 0:
+        return read_varint(buf, pos)[1]
+    if wire_type == 1:
+        return pos + 8
+    if wire_type == 2:
+        length, pos = read_varint(buf, pos)
+        return pos + length
+    if wire_type == 5:
+        return pos + 4
+    raise ValueError(f"Unsupported wire type {wire_type}")
+
+
+class TimestampScanner:
+    """
+    Reads a message's Timestamp field straight from its wire bytes, stepping over
+    the other fields without decoding them. Field numbers come from the message
+    descriptor.
+    """
+
+    def __init__(self, message_class=None, field: str = "timestamp"):
+        descriptor = (message_class or _default_message_class()).DESCRIPTOR.fields_by_name[field]
+        self.field_number = descriptor.number
+        self.seconds_number = descriptor.message_type.fields_by_name["seconds"].number
+        self.nanos_number = descriptor.message_type.fields_by_name["nanos"].number
+
+    def __call__(self, raw) -> Optional[Timestamp]:
+        pos, end = 0, len(raw)
+        while pos < end:
+            key, pos = read_varint(raw, pos)
+            number, wire_type = key >> 3, key & 7
+            if number != self.field_number or wire_type != 2:
+                pos = skip_field(raw, pos, wire_type)
+                continue
+            length, pos = read_varint(raw, pos)
+            seconds = nanos = 0
+            sub_end = pos + length
+            while pos < sub_end:
+                key, pos = read_varint(raw, pos)
+                if key >> 3 == self.seconds_number and key & 7 == 0:
+                    seconds, pos = read_varint(raw, pos)
+                elif key >> 3 == self.nanos_number and key & 7 == 0:
+                    nanos, pos = read_varint(raw, pos)
+                else:
+                    pos = skip_field(raw, pos, key & 7)
+            return seconds, nanos
+        return None
+
+
+def as_timestamp(value) -> Optional[Timestamp]:
+    """
+    None, epoch seconds, a datetime or a (seconds, nanos) pair -> (seconds, nanos).
+    """
+    if value is None or isinstance(value, tuple):
+        return value
+    if isinstance(value, datetime):
+        value = value.timestamp()
+    seconds = int(value // 1)
+    return seconds, int(round((value - seconds) * 1e9))
+
+
+class ArchiveWriter:
+    """
+    Appends serialized messages, exactly as received, to an archive directory.
+
+    Messages are written length-delimited (varint length + bytes) into blocks of
+    about block_bytes, each block zlib-compressed on its own and appended to the
+    current segment file (a new one every segment_bytes). index.jsonl gets one line
+    per block: segment, offset, compressed length, message count and the
+    timestamps of its first and last message. Only those two messages per block
+    are looked at (their timestamp read from the wire bytes), so appending is a
+    buffer copy; streams are assumed to arrive in timestamp order, as
+    ProcessedPointByGeometry resumes by last_received_timestamp.
+
+    Example:
+      with ArchiveWriter("pulls/July_D4") as archive:
+          for raw in paginate_processed_point(create_gateway_client(raw=True), request, capture=archive):
+              pass
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        *,
+        message_class=None,
+        block_bytes: int = 1 << 20,
+        segment_bytes: int = 256 << 20,
+        level: int = 1,
+    ):
+        message_class = message_class or _default_message_class()
+        self.directory = directory
+        self.block_bytes = block_bytes
+        self.segment_bytes = segment_bytes
+        self.level = level
+        self.timestamp_of = TimestampScanner(message_class)
+        os.makedirs(directory, exist_ok=True)
+
+        meta_path = os.path.join(directory, META_NAME)
+        if not os.path.exists(meta_path):
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({"message_type": message_class.DESCRIPTOR.full_name, "codec": "zlib", "created_at": time.time()}, f)
+
+        existing = sorted(name for name in os.listdir(directory) if name.startswith("segment-") and name.endswith(".bin"))
+        self._segment_no = int(existing[-1][8:13]) if existing else 0
+        self._segment = open(os.path.join(directory, self._segment_name()), "ab")
+        self._index = open(os.path.join(directory, INDEX_NAME), "a", encoding="utf-8")
+        self._block = bytearray()
+        self._count = 0
+        self._first: Optional[bytes] = None
+        self._last: Optional[bytes] = None
+        self.messages = 0
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+
+    def _segment_name(self) -> str:
+        return f"segment-{self._segment_no:05d}.bin"
+
+    def append(self, raw: bytes):
+        if self._count == 0:
+            self._first = raw
+        self._last = raw
+        self._block += encode_varint(len(raw))
+        self._block += raw
+        self._count += 1
+        self.messages += 1
+        self.raw_bytes += len(raw)
+        if len(self._block) >= self.block_bytes:
+            self.flush()
+
+    def flush(self):
+        """
+        Compress and write the pending block (if any) and its index line.
+        """
+        if not self._count:
+            return
+        if self._segment.tell() >= self.segment_bytes:
+            self._segment.close()
+            self._segment_no += 1
+            self._segment = open(os.path.join(self.directory, self._segment_name()), "ab")
+        data = zlib.compress(bytes(self._block), self.level)
+        offset = self._segment.tell()
+        self._segment.write(data)
+        self._segment.flush()
+        entry = {
+            "segment": self._segment_name(),
+            "offset": offset,
+            "length": len(data),
+            "count": self._count,
+            "raw_bytes": len(self._block),
+            "first": self.timestamp_of(self._first),
+            "last": self.timestamp_of(self._last),
+        }
+        self._index.write(json.dumps(entry) + "\n")
+        self._index.flush()
+        self.compressed_bytes += len(data)
+        self._block.clear()
+        self._count = 0
+        self._first = self._last = None
+
+    def close(self):
+        self.flush()
+        self._segment.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ArchiveReader:
+    """
+    Memory-maps the segments of an ArchiveWriter directory and decodes on demand.
+
+    start/end (epoch seconds, datetimes or (seconds, nanos)) select a time slice:
+    only the blocks whose [first, last] range overlaps it are decompressed, and
+    only messages in the two boundary blocks have their timestamp checked.
+
+    Example:
+      reader = ArchiveReader("pulls/July_D4")
+      for point in reader.messages(start=datetime(2025, 7, 4), end=datetime(2025, 7, 5)):
+          ...
+      columns = reader.columns(start=datetime(2025, 7, 4), fields=["timestamp.seconds", "speed"])
+    """
+
+    def __init__(self, directory: str, message_class=None):
+        self.directory = directory
+        self.message_class = message_class or _default_message_class()
+        self.timestamp_of = TimestampScanner(self.message_class)
+        with open(os.path.join(directory, META_NAME), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta["message_type"] != self.message_class.DESCRIPTOR.full_name:
+            raise ValueError(f"{directory} holds {self.meta['message_type']}, not {self.message_class.DESCRIPTOR.full_name}")
+        self.index: List[Dict[str, Any]] = []
+        with open(os.path.join(directory, INDEX_NAME), encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    entry["first"], entry["last"] = tuple(entry["first"] or (0, 0)), tuple(entry["last"] or (0, 0))
+                    self.index.append(entry)
+        self._maps: Dict[str, Tuple[Any, mmap.mmap]] = {}
+
+    def __len__(self) -> int:
+        return sum(entry["count"] for entry in self.index)
+
+    def time_range(self) -> Optional[Tuple[Timestamp, Timestamp]]:
+        if not self.index:
+            return None
+        return min(e["first"] for e in self.index), max(e["last"] for e in self.index)
+
+    def blocks(self, start=None, end=None) -> List[Dict[str, Any]]:
+        start, end = as_timestamp(start), as_timestamp(end)
+        return [
+            entry for entry in self.index
+            if (start is None or entry["last"] >= start) and (end is None or entry["first"] < end)
+        ]
+
+    def _map(self, segment: str) -> mmap.mmap:
+        mapped = self._maps.get(segment)
+        if mapped is None:
+            f = open(os.path.join(self.directory, segment), "rb")
+            mapped = self._maps[segment] = (f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        return mapped[1]
+
+    def block_messages(self, entry: Dict[str, Any]) -> List[bytes]:
+        """
+        The serialized messages of one index entry.
+        """
+        mapped = self._map(entry["segment"])
+        data = zlib.decompress(mapped[entry["offset"]:entry["offset"] + entry["length"]])
+        view = memoryview(data)
+        out, pos, end = [], 0, len(data)
+        while pos < end:
+            length, pos = read_varint(data, pos)
+            out.append(bytes(view[pos:pos + length]))
+            pos += length
+        return out
+
+    def raw_batches(self, start=None, end=None) -> Iterator[List[bytes]]:
+        """
+        Serialized messages in the slice, one list per block (for bulk decoding).
+        """
+        start, end = as_timestamp(start), as_timestamp(end)
+        for entry in self.blocks(start, end):
+            batch = self.block_messages(entry)
+            inside = (start is None or entry["first"] >= start) and (end is None or entry["last"] < end)
+            if not inside:
+                batch = [
+                    raw for raw, ts in ((raw, self.timestamp_of(raw)) for raw in batch)
+                    if (start is None or ts >= start) and (end is None or ts < end)
+                ]
+            if batch:
+                yield batch
+
+    def iter_raw(self, start=None, end=None) -> Iterator[bytes]:
+        for batch in self.raw_batches(start, end):
+            yield from batch
+
+    def messages(self, start=None, end=None) -> Iterator[Any]:
+        """
+        Lazily decode the messages in the slice.
+        """
+        from_string = self.message_class.FromString
+        for raw in self.iter_raw(start, end):
+            yield from_string(raw)
+
+    def columns(self, start=None, end=None, fields: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+        """
+        Bulk-decode the slice into one array per field (wire_decode.decode_columns),
+        a block at a time.
+        """
+        fields = list(fields) if fields is not None else None
+        parts = [decode_columns(batch, self.message_class, fields) for batch in self.raw_batches(start, end)]
+        if not parts:
+            return decode_columns([], self.message_class, fields)
+        return {path: np.concatenate([part[path] for part in parts]) for path in parts[0]}
+
+    def close(self):
+        for f, mapped in self._maps.values():
+            mapped.close()
+            f.close()
+        self._maps.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
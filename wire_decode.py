@@ -0,0 +1,347 @@
+from itertools import chain
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from google.protobuf.descriptor import FieldDescriptor as F
+
+# TELEMETRY_COLUMNS -> ProcessedPoint field path (as read by processed_point_to_row)
+PROTO_FIELDS = {
+    "vehicle_type": "vehicle_type",
+    "timestamp_seconds": "timestamp.seconds",
+    "timestamp_nanos": "timestamp.nanos",
+    "road_matched_point_lat": "road_matched_point.lat",
+    "road_matched_point_lon": "road_matched_point.lng",
+    "speed_kmh": "speed",
+    "osm_way_id": "osm_way_id",
+    "vehicle_id": "vehicle_id",
+    "trip_id": "trip_id",
+    "raw_point_lat": "raw_point.lat",
+    "raw_point_lon": "raw_point.lng",
+    "transport_type": "transport_type",
+    "acceleration_x": "acceleration.x",
+    "acceleration_y": "acceleration.y",
+    "acceleration_z": "acceleration.z",
+    "gyro_roll": "gyro.roll",
+    "gyro_pitch": "gyro.pitch",
+    "gyro_yaw": "gyro.yaw",
+    "iri": "iri",
+    "near_miss_timestamp_seconds": "near_miss.timestamp.seconds",
+    "near_miss_timestamp_nanos": "near_miss.timestamp.nanos",
+    "near_miss_type": "near_miss.type",
+    "bearing": "bearing",
+    "point_id": "point_id",
+}
+
+# field type -> (wire type, numpy dtype of the column)
+_TYPES = {
+    F.TYPE_DOUBLE: (1, np.float64),
+    F.TYPE_FLOAT: (5, np.float32),
+    F.TYPE_INT64: (0, np.int64),
+    F.TYPE_UINT64: (0, np.uint64),
+    F.TYPE_INT32: (0, np.int32),
+    F.TYPE_FIXED64: (1, np.uint64),
+    F.TYPE_FIXED32: (5, np.uint32),
+    F.TYPE_BOOL: (0, np.bool_),
+    F.TYPE_UINT32: (0, np.uint32),
+    F.TYPE_ENUM: (0, np.int32),
+    F.TYPE_SFIXED32: (5, np.int32),
+    F.TYPE_SFIXED64: (1, np.int64),
+    F.TYPE_SINT32: (0, np.int32),
+    F.TYPE_SINT64: (0, np.int64),
+    F.TYPE_STRING: (2, None),
+    F.TYPE_BYTES: (2, None),
+}
+# fixed-width wire type -> little-endian dtypes (float, unsigned, signed)
+_FIXED = {1: ("<f8", "<u8", "<i8"), 5: ("<f4", "<u4", "<i4")}
+_FIXED_KIND = {F.TYPE_DOUBLE: 0, F.TYPE_FLOAT: 0, F.TYPE_FIXED64: 1, F.TYPE_FIXED32: 1, F.TYPE_SFIXED64: 2, F.TYPE_SFIXED32: 2}
+_PAD = 16  # covers 8-byte word reads and the longest varint past the end of the last message
+
+
+def _default_message_class():
+    import compassiot.platform.v1.streaming_pb2 as streaming
+
+    return streaming.ProcessedPoint
+
+
+def scalar_paths(descriptor, prefix: str = "", depth: int = 4) -> List[str]:
+    """
+    Dotted paths of every singular scalar field, descending into singular message
+    fields (up to depth levels).
+    """
+    paths = []
+    for field in descriptor.fields:
+        if field.is_repeated:
+            continue
+        path = prefix + field.name
+        if field.type == F.TYPE_MESSAGE:
+            if depth > 0:
+                paths.extend(scalar_paths(field.message_type, path + ".", depth - 1))
+        elif field.type in _TYPES:
+            paths.append(path)
+    return paths
+
+
+def _plan(descriptor, paths: Iterable[str]) -> Dict[int, Tuple[Any, Any]]:
+    """
+    field number -> (field, column path) for leaves, or (field, sub-plan) for messages.
+    """
+    plan: Dict[int, Tuple[Any, Any]] = {}
+    for path in paths:
+        node, desc, rest = plan, descriptor, path
+        while True:
+            name, _, rest = rest.partition(".")
+            field = desc.fields_by_name.get(name)
+            if field is None:
+                raise KeyError(f"{desc.full_name} has no field {name!r} (in {path!r})")
+            if field.is_repeated:
+                raise ValueError(f"Repeated field {path!r} is not supported")
+            if not rest:
+                if field.type not in _TYPES:
+                    raise ValueError(f"{path!r} is not a scalar field")
+                node[field.number] = (field, path)
+                break
+            if field.type != F.TYPE_MESSAGE:
+                raise ValueError(f"{path!r}: {name!r} is not a message field")
+            node = node.setdefault(field.number, (field, {}))[1]
+            desc = field.message_type
+    return plan
+
+
+class _Wire:
+    """
+    The concatenated messages as a uint8 array, zero-padded so reads that run past
+    the last message stay in bounds, plus overlapping views with a stride of one
+    byte: view("<u8")[pos] is the 8 bytes starting at each pos, in one gather.
+    """
+
+    def __init__(self, raws: Sequence[bytes], size: int):
+        self.size = size
+        self.buf = np.frombuffer(b"".join(chain(raws, (bytes(_PAD),))), dtype=np.uint8)
+        self._views: Dict[str, np.ndarray] = {}
+
+    def view(self, dtype: str) -> np.ndarray:
+        view = self._views.get(dtype)
+        if view is None:
+            width = np.dtype(dtype).itemsize
+            if self.size + width > len(self.buf):
+                self.buf = np.concatenate([self.buf[:self.size], np.zeros(max(width, 256), dtype=np.uint8)])
+                self._views.clear()
+            view = self._views[dtype] = np.ndarray((len(self.buf) - width + 1,), dtype=dtype, buffer=self.buf, strides=(1,))
+        return view
+
+
+_STOP_BITS = np.uint64(0x8080808080808080)
+_BYTE_FLAGS = np.uint64(0x0101010101010101)
+
+
+def _varints(wire: _Wire, pos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Decode one varint at each position; returns (values as uint64, positions after them).
+    Varints longer than one byte are decoded from the 64-bit little-endian word at
+    their position: bytes up to the first clear continuation bit are kept and their
+    7-bit groups packed together. Only varints over 8 bytes (negative ints) loop.
+    """
+    byte = wire.buf[pos]
+    value = byte.astype(np.uint64)
+    more = np.flatnonzero(byte & 0x80)
+    if not len(more):
+        return value, pos + 1
+    size = np.ones(len(pos), dtype=np.int64)
+    start = pos[more]
+    word = wire.view("<u8")[start]
+    stops = ~word & _STOP_BITS
+    lowest = stops & (~stops + np.uint64(1))
+    word &= (lowest << np.uint64(1)) - np.uint64(1)
+    packed = np.zeros(len(more), dtype=np.uint64)
+    for i in range(8):
+        packed |= (word >> np.uint64(i)) & np.uint64(0x7F << (7 * i))
+    value[more] = packed
+    size[more] = (((word >> np.uint64(7)) & _BYTE_FLAGS) * _BYTE_FLAGS) >> np.uint64(56)
+    size[more] += 1
+    long = np.flatnonzero(stops == 0)
+    if len(long):
+        index = more[long]
+        slow, slow_size = packed[long], np.full(len(long), 8, dtype=np.int64)
+        pending = np.arange(len(long))
+        shift = 56
+        while len(pending):
+            if shift > 63:
+                raise ValueError("Malformed varint")
+            byte = wire.buf[start[long[pending]] + slow_size[pending]]
+            slow[pending] |= (byte & 0x7F).astype(np.uint64) << np.uint64(shift)
+            slow_size[pending] += 1
+            pending = pending[(byte & 0x80) != 0]
+            shift += 7
+        value[index], size[index] = slow, slow_size
+    return value, pos + size
+
+
+def _from_varint(field, value: np.ndarray) -> np.ndarray:
+    if field.type == F.TYPE_BOOL:
+        return value != 0
+    if field.type in (F.TYPE_SINT32, F.TYPE_SINT64):
+        signed = (value >> np.uint64(1)).view(np.int64) ^ -(value & np.uint64(1)).view(np.int64)
+        return signed.astype(_TYPES[field.type][1])
+    if field.type in (F.TYPE_UINT64, F.TYPE_UINT32):
+        return value.astype(_TYPES[field.type][1])
+    return value.view(np.int64).astype(_TYPES[field.type][1])
+
+
+class _Columns:
+    def __init__(self, n: int):
+        self.n = n
+        self.arrays: Dict[str, np.ndarray] = {}
+        self.strings: Dict[str, List[Tuple[np.ndarray, np.ndarray]]] = {}
+
+    def put(self, field, path: str, rows: np.ndarray, values: np.ndarray):
+        column = self.arrays.get(path)
+        if column is None:
+            column = self.arrays[path] = np.zeros(self.n, dtype=_TYPES[field.type][1])
+        column[rows] = values
+
+    def put_bytes(self, path: str, rows: np.ndarray, wire: _Wire, start: np.ndarray, length: np.ndarray):
+        width = max(int(length.max()) if len(length) else 0, 1)
+        data = wire.view(f"S{width}")[start]
+        if (length < width).any():
+            matrix = data.view(np.uint8).reshape(-1, width)
+            matrix *= np.arange(width) < length[:, None]
+        self.strings.setdefault(path, []).append((rows, data))
+
+    def finish(self, plan_fields: Sequence[Tuple[Any, str]]) -> Dict[str, np.ndarray]:
+        out = {}
+        for field, path in plan_fields:
+            if field.type in (F.TYPE_STRING, F.TYPE_BYTES):
+                pieces = self.strings.get(path, [])
+                width = max((piece.dtype.itemsize for _, piece in pieces), default=1)
+                column = np.zeros(self.n, dtype=f"S{width}")
+                for rows, piece in pieces:
+                    column[rows] = piece
+                if field.type == F.TYPE_BYTES:
+                    out[path] = column.astype(object)
+                elif (column.view(np.uint8) < 0x80).all():
+                    out[path] = column.astype(np.str_)  # ASCII: no per-string decode
+                else:
+                    out[path] = np.char.decode(column, "utf-8")
+            else:
+                out[path] = self.arrays.get(path, np.zeros(self.n, dtype=_TYPES[field.type][1]))
+        return out
+
+
+def _decode(wire: _Wire, plan, start: np.ndarray, end: np.ndarray, rows: np.ndarray, columns: _Columns):
+    """
+    Walk all messages in lockstep, one field per step: every pass reads the next
+    tag of each message still unfinished, then handles the messages grouped by tag
+    (serializers write fields in number order, so usually a single group).
+    """
+    keep = start < end  # empty messages (e.g. a nested message with every field default) have no tags
+    pos, end, rows = (start, end, rows) if keep.all() else (start[keep], end[keep], rows[keep])
+    while len(pos):
+        key, pos = _varints(wire, pos)
+        after = np.empty_like(pos)
+        first = key[0]
+        groups = [(first, None)] if (key == first).all() else [(k, key == k) for k in np.unique(key)]
+        for k, mask in groups:
+            number, wire_type = int(k >> np.uint64(3)), int(k & np.uint64(7))
+            p = pos if mask is None else pos[mask]
+            entry = plan.get(number)
+            field, target = entry if entry is not None else (None, None)
+            if field is not None and field.type != F.TYPE_MESSAGE and _TYPES[field.type][0] != wire_type:
+                raise ValueError(f"Field {field.full_name} has wire type {wire_type}, expected {_TYPES[field.type][0]}")
+            if wire_type == 0:
+                value, nxt = _varints(wire, p)
+                if field is not None:
+                    columns.put(field, target, rows if mask is None else rows[mask], _from_varint(field, value))
+            elif wire_type in _FIXED:
+                nxt = p + (8 if wire_type == 1 else 4)
+                if field is not None:
+                    values = wire.view(_FIXED[wire_type][_FIXED_KIND[field.type]])[p]
+                    columns.put(field, target, rows if mask is None else rows[mask], values)
+            elif wire_type == 2:
+                length, body = _varints(wire, p)
+                length = length.astype(np.int64)
+                nxt = body + length
+                if field is not None:
+                    sub_rows = rows if mask is None else rows[mask]
+                    if field.type == F.TYPE_MESSAGE:
+                        _decode(wire, target, body, nxt, sub_rows, columns)
+                    else:
+                        columns.put_bytes(target, sub_rows, wire, body, length)
+            else:
+                raise ValueError(f"Unsupported wire type {wire_type} for field {number}")
+            if mask is None:
+                after = nxt
+            else:
+                after[mask] = nxt
+        if (after > end).any():
+            raise ValueError("Truncated message")
+        unfinished = after < end
+        if unfinished.all():
+            pos = after
+        else:
+            pos, end, rows = after[unfinished], end[unfinished], rows[unfinished]
+
+
+def _leaves(plan) -> List[Tuple[Any, str]]:
+    out = []
+    for field, target in plan.values():
+        out.extend(_leaves(target) if isinstance(target, dict) else [(field, target)])
+    return out
+
+
+def decode_columns(raws: Sequence[bytes], message_class=None, fields: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+    """
+    Decode a batch of serialized messages straight into one NumPy array per field,
+    without building message objects. Field numbers and types come from the
+    message DESCRIPTOR; fields are dotted paths such as "timestamp.seconds"
+    (default: every singular scalar field, nested messages included). Unset
+    fields decode to their proto3 default (0, "", ...), as attribute access would.
+    Numeric columns keep the proto type (float fields are float32), strings are
+    str arrays and bytes are object arrays of bytes. Repeated fields are not
+    supported.
+
+    Example:
+      columns = decode_columns(archive.block_messages(entry), fields=["timestamp.seconds", "gyro.yaw"])
+    """
+    descriptor = (message_class or _default_message_class()).DESCRIPTOR
+    paths = list(fields) if fields is not None else scalar_paths(descriptor)
+    plan = _plan(descriptor, paths)
+    n = len(raws)
+    lengths = np.fromiter(map(len, raws), dtype=np.int64, count=n)
+    end = np.cumsum(lengths)
+    start = end - lengths
+    columns = _Columns(n)
+    _decode(_Wire(raws, int(end[-1]) if n else 0), plan, start, end, np.arange(n), columns)
+    decoded = columns.finish(_leaves(plan))
+    return {path: decoded[path] for path in paths}
+
+
+def processed_point_columns(raws: Sequence[bytes], message_class=None) -> Dict[str, np.ndarray]:
+    """
+    decode_columns() of serialized ProcessedPoints, keyed by TELEMETRY_COLUMNS.
+    """
+    columns = decode_columns(raws, message_class, PROTO_FIELDS.values())
+    return {column: columns[path] for column, path in PROTO_FIELDS.items()}
+
+
+def processed_point_frame(raws: Sequence[bytes], message_class=None):
+    """
+    DataFrame of serialized ProcessedPoints with the values and dtypes a DataFrame
+    of processed_point_to_row rows has (float64, int64), so CSV output is unchanged.
+    """
+    import pandas as pd
+
+    columns = processed_point_columns(raws, message_class)
+    return pd.DataFrame({
+        name: values.astype(np.float64) if values.dtype.kind == "f" else values.astype(np.int64) if values.dtype.kind == "i" else values
+        for name, values in columns.items()
+    })
+
+
+def processed_point_table(raws: Sequence[bytes], message_class=None):
+    """
+    pyarrow Table of serialized ProcessedPoints (float fields stay float32).
+    Requires pyarrow.
+    """
+    import pyarrow as pa
+
+    return pa.table(processed_point_columns(raws, message_class))